@@ -1,3 +1,19 @@
+from django.core import mail
 from django.test import TestCase
+from django.urls import reverse
+
+from outbox.models import OutboxEmail
 
 # Create your tests here.
+
+class RegisterViewTests(TestCase):
+    def test_welcome_email_is_queued_not_sent(self):
+        response = self.client.post(reverse('register'), {
+            'username': 'sita', 'first_name': 'Sita', 'last_name': 'Sharma', 'email': 'sita@example.com',
+            'mobile_number': '9800000000', 'password1': 'a-long-Passw0rd', 'password2': 'a-long-Passw0rd',
+        })
+        self.assertRedirects(response, reverse('login'), fetch_redirect_response=False)
+        email = OutboxEmail.objects.get()
+        self.assertEqual((email.to, email.status), (['sita@example.com'], 'pending'))
+        self.assertIn('Hi Sita', email.body)
+        self.assertEqual(mail.outbox, [])
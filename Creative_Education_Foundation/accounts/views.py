@@ -9,6 +9,8 @@ from django.contrib.auth.views import LogoutView
 from django.contrib.auth import authenticate, login
 from django.contrib import messages
 from django.shortcuts import redirect
+from django.db import transaction
+from outbox.queue import queue_template_email
 
 # Create your views here.
 
@@ -82,7 +84,14 @@ class RegisterView(CreateView):
         # The form's save() method handles:
         # - Saves first_name, last_name, email to User
         # - Creates UserProfile with mobile_number
-        response = super().form_valid(form)
+        with transaction.atomic():
+            response = super().form_valid(form)
+            user = self.object
+            if user.email:
+                queue_template_email(
+                    user.email, 'Welcome to Creative Education Foundation', 'welcome', {'user': user},
+                    dedup_key=f'welcome:{user.pk}',
+                )
         
         # Add success message
         messages.success(self.request, 'Registration successful! Please log in.')
@@ -0,0 +1,19 @@
+from django.contrib import admin
+
+from .models import StoredBlob
+
+
+@admin.register(StoredBlob)
+class StoredBlobAdmin(admin.ModelAdmin):
+    list_display = ['name', 'size', 'refcount', 'created_at', 'released_at']
+    list_filter = ['created_at']
+    search_fields = ['name', 'sha256']
+    readonly_fields = ['name', 'sha256', 'size', 'refcount', 'created_at', 'released_at']
+
+    def has_add_permission(self, request):
+        # Blobs come from ContentAddressedStorage.save()
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        # Referenced files would be lost: collect_blobs deletes unreferenced ones
+        return False
@@ -0,0 +1,109 @@
+from collections import Counter
+import posixpath
+import queue
+import threading
+import time
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from blobs.signals import blob_fields
+from blobs.storage import BLOB_NAME, release
+
+
+class Command(BaseCommand):
+    help = (
+        'Move the files of rows written before their FileField used ContentAddressedStorage into it: each file '
+        'is stored under its hash (duplicates once), the row repointed and the old file deleted. Safe to stop '
+        'and run again; rows already moved are skipped.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('fields', nargs='*', metavar='app_label.Model.field',
+                            help='Fields to migrate (default: every field stored by hash)')
+        parser.add_argument('--workers', type=int, default=8, help='Files moved in parallel')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the files to move')
+
+    def handle(self, *args, **options):
+        fields = self.get_fields(options['fields'])
+        self.outcomes = Counter()
+        self.lock = threading.Lock()
+        # Bounded, so the rows waiting for a worker don't pile up in memory
+        work = queue.Queue(maxsize=options['workers'] * 4)
+        workers = [] if options['dry_run'] else [
+            threading.Thread(target=self.work, args=(work,)) for _ in range(options['workers'])
+        ]
+        for worker in workers:
+            worker.start()
+
+        started = time.perf_counter()
+        try:
+            for model, attname in fields:
+                rows = model._base_manager.exclude(**{attname: ''}).order_by('pk').values_list('pk', attname)
+                for pk, name in rows.iterator(chunk_size=2000):
+                    if BLOB_NAME.search(name):
+                        continue
+                    if options['dry_run']:
+                        self.outcomes['to move'] += 1
+                    else:
+                        work.put((model, attname, pk, name))
+        finally:
+            for _ in workers:
+                work.put(None)
+            for worker in workers:
+                worker.join()
+
+        outcomes = ', '.join(f'{count} {outcome}' for outcome, count in sorted(self.outcomes.items()))
+        self.stdout.write(self.style.SUCCESS(
+            f'Blobs: {outcomes or "nothing to move"} in {time.perf_counter() - started:.1f}s.'
+        ))
+
+    def get_fields(self, labels):
+        if not labels:
+            return [(model, attname) for model in apps.get_models() for attname in blob_fields(model)]
+        fields = []
+        for label in labels:
+            try:
+                model_label, attname = label.rsplit('.', 1)
+                model = apps.get_model(model_label)
+            except (ValueError, LookupError):
+                raise CommandError(f'Unknown field {label}, expected app_label.Model.field')
+            if attname not in blob_fields(model):
+                raise CommandError(f'{label} is not stored in a ContentAddressedStorage')
+            fields.append((model, attname))
+        return fields
+
+    def work(self, work):
+        try:
+            while (item := work.get()) is not None:
+                try:
+                    outcome = self.move(*item)
+                except Exception as exc:
+                    model, attname, pk, name = item
+                    self.stderr.write(f'{model._meta.label} {pk} {name}: {type(exc).__name__}: {exc}')
+                    outcome = 'failed'
+                with self.lock:
+                    self.outcomes[outcome] += 1
+        finally:
+            # Each worker thread has its own connection
+            connection.close()
+
+    def move(self, model, attname, pk, old):
+        field = model._meta.get_field(attname)
+        storage = field.storage
+        try:
+            with storage.open(old, 'rb') as file:
+                # Into the field's upload_to as it is now (a callable one gets no instance). Takes
+                # a reference for the row, writing the file unless it's a duplicate
+                new = storage.save(field.generate_filename(None, posixpath.basename(old)), file)
+        except FileNotFoundError:
+            return 'missing'
+        rows = model._base_manager.filter(**{attname: old})
+        if not rows.filter(pk=pk).update(**{attname: new}):
+            # Changed since we read it: the row no longer needs the reference
+            release(new)
+            return 'changed'
+        if not rows.exists():
+            storage.delete(old)
+        return 'moved'
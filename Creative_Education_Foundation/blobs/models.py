@@ -0,0 +1,22 @@
+from django.db import models
+
+
+class StoredBlob(models.Model):
+    """A file of a ContentAddressedStorage, shared by every row that stored the same content"""
+    # Path in the storage, e.g. "applications/cvs/9f/86/9f86d0...pdf"
+    name = models.CharField(max_length=255, unique=True)
+    sha256 = models.CharField(max_length=64)
+    size = models.PositiveBigIntegerField(default=0)
+    # Rows referencing the file; at 0 it's deleted BLOBS_GC_GRACE seconds after released_at
+    refcount = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    released_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ['-id']
+        indexes = [
+            models.Index(fields=['refcount', 'released_at'], name='blob_garbage_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.name} ({self.refcount} references)'
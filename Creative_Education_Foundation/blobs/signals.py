@@ -0,0 +1,59 @@
+"""
+Reference counting for the FileFields stored in a ContentAddressedStorage.
+
+A row holds one reference to the blob its field names. Saving a new file
+takes one (in the storage's save()); these receivers drop the old file's
+reference once the row points elsewhere or is deleted, and take one for a
+file assigned by name, e.g. copied from another row. QuerySet.update()
+bypasses them: whoever updates file names that way keeps the counts
+(see migrate_blobs).
+"""
+from django.apps import apps
+from django.db.models import FileField
+from django.db.models.signals import post_delete, post_save, pre_save
+
+from .storage import ContentAddressedStorage, add_reference, release
+
+
+def blob_fields(model):
+    return [
+        field.attname for field in model._meta.concrete_fields
+        if isinstance(field, FileField) and isinstance(field.storage, ContentAddressedStorage)
+    ]
+
+
+def file_saving(sender, instance, raw, **kwargs):
+    """Note each field's name in the database and whether a new file is about to be stored"""
+    if raw:
+        return
+    fields = blob_fields(sender)
+    stored = {}
+    if not instance._state.adding:
+        stored = sender._base_manager.filter(pk=instance.pk).values(*fields).first() or {}
+    instance._blob_changes = {}
+    for attname in fields:
+        file = getattr(instance, attname)
+        instance._blob_changes[attname] = (stored.get(attname) or '', bool(file) and not file._committed)
+
+
+def file_saved(sender, instance, raw, **kwargs):
+    for attname, (old, uploaded) in instance.__dict__.pop('_blob_changes', {}).items():
+        new = getattr(instance, attname).name or ''
+        if new and new != old and not uploaded:
+            add_reference(new)
+        if old and (new != old or uploaded):
+            release(old)
+
+
+def file_deleted(sender, instance, **kwargs):
+    for attname in blob_fields(sender):
+        if name := getattr(instance, attname).name:
+            release(name)
+
+
+def connect():
+    for model in apps.get_models():
+        if blob_fields(model):
+            pre_save.connect(file_saving, sender=model, dispatch_uid=f'blobs-saving-{model._meta.label}')
+            post_save.connect(file_saved, sender=model, dispatch_uid=f'blobs-saved-{model._meta.label}')
+            post_delete.connect(file_deleted, sender=model, dispatch_uid=f'blobs-deleted-{model._meta.label}')
@@ -0,0 +1,195 @@
+"""
+Content-addressed file storage.
+
+ContentAddressedStorage keeps each file under its SHA-256, sharded two
+levels deep below the directory of the field's upload_to, so no directory
+holds more than 256 entries before the files themselves:
+
+    applications/cvs/9f/86/9f86d081884c7d65...pdf
+
+Identical files are stored once. Saving content that's already there writes
+nothing; it adds a reference to the file's StoredBlob row instead. Rows
+hold references through their FileFields: blobs.signals drops one when a
+row is deleted or its file replaced, and delete() does nothing, since other
+rows may share the file. collect_garbage() deletes files that have had no
+references for BLOBS_GC_GRACE seconds.
+
+That is safe against a concurrent upload of the same content because the
+upload takes its reference (updating or creating the row) before it looks
+for the file, and collect_garbage() deletes a file while holding its row
+lock and only when refcount is still 0. Files left without a row, by an
+upload whose transaction rolled back, are adopted by sweep_orphans() and
+collected the same way.
+"""
+from datetime import timedelta
+import hashlib
+import os
+import posixpath
+import re
+import tempfile
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+from django.core.files.utils import validate_file_name
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.deconstruct import deconstructible
+
+from jobs.queue import skip_locked
+
+from .models import StoredBlob
+
+
+BLOB_NAME = re.compile(r'(?:^|/)([0-9a-f]{2})/([0-9a-f]{2})/(\1\2[0-9a-f]{60})(?:\.\w+)?$')
+
+# Prefix of the temporary files blobs are written to before being renamed into place
+TEMP_PREFIX = '.upload-'
+
+
+def file_sha256(content):
+    sha256 = hashlib.sha256()
+    for chunk in content.chunks():
+        sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def acquire(name, sha256, size):
+    """Add a reference to blob `name`, creating its row; returns whether it was created"""
+    if StoredBlob.objects.filter(name=name).update(refcount=F('refcount') + 1):
+        return False
+    try:
+        with transaction.atomic():
+            StoredBlob.objects.create(name=name, sha256=sha256, size=size, refcount=1)
+        return True
+    except IntegrityError:
+        # Created meanwhile by an upload of the same content
+        return acquire(name, sha256, size)
+
+
+def add_reference(name):
+    """Add a reference to an already stored blob (a no-op for other files)"""
+    StoredBlob.objects.filter(name=name).update(refcount=F('refcount') + 1)
+
+
+def release(name):
+    """Drop a reference to blob `name` (a no-op for other files)"""
+    StoredBlob.objects.filter(name=name, refcount__gt=0).update(
+        refcount=F('refcount') - 1, released_at=timezone.now(),
+    )
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    def blob_name(self, name, sha256):
+        directory, file_name = posixpath.split(name)
+        extension = os.path.splitext(file_name)[1].lower()
+        return posixpath.join(directory, sha256[:2], sha256[2:4], sha256 + extension)
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        # Uploads through pages.uploads.CVUploadHandler come hashed already
+        sha256 = getattr(content, 'sha256', None) or file_sha256(content)
+        name = self.blob_name(name, sha256)
+        validate_file_name(name, allow_relative_path=True)
+        # The reference first: from here on collect_garbage() leaves the file alone
+        if acquire(name, sha256, content.size) or not self.exists(name):
+            # A new row may have found the file of a rolled back upload:
+            # write it again all the same, so sweep_orphans() sees it as new
+            self.write(name, content)
+        return name
+
+    def write(self, name, content):
+        """Write `content` to a temporary file next to `name` and rename it into place"""
+        path = self.path(name)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=TEMP_PREFIX)
+        try:
+            if hasattr(content, 'temporary_file_path'):
+                # Already on disk: move it rather than copy it
+                os.close(fd)
+                file_move_safe(content.temporary_file_path(), temp_path, allow_overwrite=True)
+            else:
+                with os.fdopen(fd, 'wb') as temp:
+                    for chunk in content.chunks():
+                        temp.write(chunk)
+            if self.file_permissions_mode is not None:
+                os.chmod(temp_path, self.file_permissions_mode)
+            # Atomic: readers see the whole file or none, and two uploads of
+            # the same content writing at once both leave the same file
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def delete(self, name):
+        if not BLOB_NAME.search(name):
+            super().delete(name)
+        # Blobs may be shared: collect_garbage() deletes them once unreferenced
+
+    def delete_blob(self, name):
+        super().delete(name)
+
+
+def collect_garbage(storage=None, now=None, batch_size=100):
+    """Delete the blobs without references for BLOBS_GC_GRACE seconds; returns how many"""
+    storage = storage or ContentAddressedStorage()
+    cutoff = (now or timezone.now()) - timedelta(seconds=settings.BLOBS_GC_GRACE)
+    collected = 0
+    while True:
+        with transaction.atomic():
+            # Locked, and refcount checked under the lock: an upload taking a
+            # reference now waits for us, then finds no row and writes the file again
+            garbage = list(skip_locked(
+                StoredBlob.objects.filter(refcount=0, released_at__lt=cutoff).order_by('id')
+            )[:batch_size])
+            for blob in garbage:
+                storage.delete_blob(blob.name)
+            StoredBlob.objects.filter(id__in=[blob.id for blob in garbage]).delete()
+        collected += len(garbage)
+        if len(garbage) < batch_size:
+            return collected
+
+
+def sweep_orphans(storage=None, now=None):
+    """
+    Walk the storage for blob files without a row, older than BLOBS_GC_GRACE,
+    and give them one with no references for collect_garbage(). Also removes
+    temporary files left by crashed writes. Returns how many were found.
+    """
+    storage = storage or ContentAddressedStorage()
+    cutoff = (now or timezone.now()) - timedelta(seconds=settings.BLOBS_GC_GRACE)
+    found = 0
+    for directory, _, file_names in os.walk(storage.location):
+        candidates = {}
+        for file_name in file_names:
+            name = os.path.relpath(os.path.join(directory, file_name), storage.location).replace(os.sep, '/')
+            if file_name.startswith(TEMP_PREFIX):
+                if storage.get_modified_time(name) < cutoff:
+                    storage.delete_blob(name)
+                    found += 1
+            elif match := BLOB_NAME.search(name):
+                candidates[name] = match[3]
+        if not candidates:
+            continue
+        # One query per leaf directory
+        known = set(StoredBlob.objects.filter(name__in=candidates).values_list('name', flat=True))
+        for name, sha256 in candidates.items():
+            modified = storage.get_modified_time(name)
+            if name in known or modified >= cutoff:
+                continue
+            try:
+                with transaction.atomic():
+                    StoredBlob.objects.create(name=name, sha256=sha256, size=storage.size(name), released_at=modified)
+            except IntegrityError:
+                # An upload of the same content just took it
+                continue
+            found += 1
+    return found
@@ -0,0 +1,15 @@
+from jobs.queue import task
+
+from .storage import collect_garbage, sweep_orphans
+
+
+@task
+def collect_blobs():
+    """Delete the stored files no row has referenced for BLOBS_GC_GRACE seconds"""
+    return collect_garbage()
+
+
+@task
+def sweep_blobs():
+    """Find stored files without a row (their upload rolled back), for collect_blobs"""
+    return sweep_orphans()
@@ -0,0 +1,134 @@
+from datetime import timedelta
+import hashlib
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from pages.models import Vacancy, VacancyApplication
+
+from .models import StoredBlob
+from .storage import ContentAddressedStorage, collect_garbage, sweep_orphans
+
+
+CV = b'%PDF-1.4 the same CV for every vacancy'
+CV_SHA256 = hashlib.sha256(CV).hexdigest()
+CV_NAME = f'applications/cvs/{CV_SHA256[:2]}/{CV_SHA256[2:4]}/{CV_SHA256}.pdf'
+
+
+class MediaRootMixin:
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root, BLOBS_GC_GRACE=60))
+        self.storage = ContentAddressedStorage()
+
+    def make_vacancies(self, count):
+        today = timezone.now().date()
+        return [
+            Vacancy.objects.create(
+                title=f'Vacancy {i}', salary=10000, start_date=today, deadline=today + timedelta(days=30),
+                description='Description', requirements='Requirements', responsibilities='Responsibilities',
+            )
+            for i in range(count)
+        ]
+
+    def apply(self, vacancy, content=CV, email='sita@example.com'):
+        return VacancyApplication.objects.create(
+            vacancy=vacancy, full_name='Sita Sharma', email=email, phone='9800000000',
+            cv=SimpleUploadedFile('my cv.PDF', content),
+        )
+
+    def files(self):
+        return sorted(
+            os.path.relpath(os.path.join(directory, name), self.storage.location)
+            for directory, _, names in os.walk(self.storage.location) for name in names
+        )
+
+
+class ContentAddressedStorageTests(MediaRootMixin, TestCase):
+    def test_identical_files_share_one_blob(self):
+        applications = [self.apply(vacancy) for vacancy in self.make_vacancies(3)]
+        self.assertEqual({application.cv.name for application in applications}, {CV_NAME})
+        self.assertEqual(self.files(), [CV_NAME])
+        blob = StoredBlob.objects.get()
+        self.assertEqual((blob.refcount, blob.size), (3, len(CV)))
+        with applications[0].cv.open('rb') as stored:
+            self.assertEqual(stored.read(), CV)
+
+    def test_references_follow_the_rows(self):
+        first, second = [self.apply(vacancy) for vacancy in self.make_vacancies(2)]
+        # A new CV for one application: the old file keeps its other reference
+        first.cv = SimpleUploadedFile('new.pdf', b'%PDF-1.4 another CV')
+        first.save()
+        self.assertEqual(StoredBlob.objects.get(name=CV_NAME).refcount, 1)
+        self.assertEqual(StoredBlob.objects.get(name=first.cv.name).refcount, 1)
+        # Other saves leave the references alone
+        second.status = 'shortlisted'
+        second.save()
+        self.assertEqual(StoredBlob.objects.get(name=CV_NAME).refcount, 1)
+
+        second.cv.delete()
+        first.vacancy.delete()
+        self.assertEqual(list(StoredBlob.objects.values_list('refcount', flat=True)), [0, 0])
+
+    def test_garbage_is_collected_after_the_grace_period(self):
+        application = self.apply(self.make_vacancies(1)[0])
+        now = timezone.now()
+        self.assertEqual(collect_garbage(now=now + timedelta(days=1)), 0)
+
+        application.delete()
+        self.assertEqual(collect_garbage(now=now + timedelta(seconds=30)), 0)
+        self.assertEqual(self.files(), [CV_NAME])
+        # The same CV uploaded again within the grace period takes the blob back
+        application = self.apply(application.vacancy)
+        self.assertEqual(collect_garbage(now=now + timedelta(days=1)), 0)
+
+        application.delete()
+        self.assertEqual(collect_garbage(now=now + timedelta(days=1)), 1)
+        self.assertEqual(self.files(), [])
+        self.assertFalse(StoredBlob.objects.exists())
+
+    def test_orphans_are_swept_then_collected(self):
+        # As left by an upload whose transaction rolled back
+        self.storage.write(CV_NAME, ContentFile(CV))
+        self.storage.write('applications/cvs/2025/01/legacy.pdf', ContentFile(CV))
+        now = timezone.now()
+        self.assertEqual(sweep_orphans(now=now), 0)
+        self.assertEqual(sweep_orphans(now=now + timedelta(days=1)), 1)
+        self.assertEqual(collect_garbage(now=now + timedelta(days=1)), 1)
+        self.assertEqual(self.files(), ['applications/cvs/2025/01/legacy.pdf'])
+
+
+class MigrateBlobsTests(MediaRootMixin, TransactionTestCase):
+    def test_moves_legacy_files_in_parallel(self):
+        legacy = FileSystemStorage()
+        for number, vacancy in enumerate(self.make_vacancies(4)):
+            content = ContentFile(CV if number < 3 else b'%PDF-1.4 another CV')
+            name = legacy.save(f'applications/cvs/2025/01/cv_{number}.pdf', content)
+            VacancyApplication.objects.create(
+                vacancy=vacancy, full_name='Sita Sharma', email='sita@example.com', phone='9800000000', cv=name,
+            )
+        self.assertFalse(StoredBlob.objects.exists())
+
+        output = StringIO()
+        call_command('migrate_blobs', '--workers', '3', stdout=output)
+        self.assertIn('4 moved', output.getvalue())
+        self.assertEqual(StoredBlob.objects.get(name=CV_NAME).refcount, 3)
+        self.assertEqual(len(self.files()), 2)
+        self.assertFalse([name for name in self.files() if name.startswith('applications/cvs/2025/')])
+        for application in VacancyApplication.objects.all():
+            with application.cv.open('rb') as stored:
+                self.assertTrue(stored.read().startswith(b'%PDF-1.4'))
+
+        # Nothing left to move the second time
+        call_command('migrate_blobs', stdout=output)
+        self.assertIn('nothing to move', output.getvalue())
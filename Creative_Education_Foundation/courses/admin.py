@@ -4,19 +4,42 @@ from django.contrib import admin
 # Add to pages/admin.py
 
 from django.contrib import admin
+from django.db.models import Case, Count, F, FloatField, Q, Value, When
+from django.db.models.functions import Cast
 from django.utils.html import format_html
-from .models import Course, CourseEnrollment, CoursePaymentLog, UserProfile, CourseReview
+from .models import Course, CourseEnrollment, CoursePaymentLog, UserProfile, CourseReview, ClassSession, ClassAttendance
+from . import timetable
+from .catalog import refresh_catalog_entries
+from .search import index_courses
+from .sessions import generate_sessions
+from .forms import CourseAdminForm
+from .enrollment_cache import invalidate_course_enrollment_summaries, invalidate_enrollment_summaries
+
+
+class ScheduleDayFilter(admin.SimpleListFilter):
+    """Filter by weekday through the indexed schedule_mask column"""
+    title = 'schedule day'
+    parameter_name = 'schedule_day'
+
+    def lookups(self, request, model_admin):
+        return Course.DAYS_OF_WEEK
+
+    def queryset(self, request, queryset):
+        if self.value() in timetable.DAY_MASKS:
+            return queryset.scheduled_on(self.value())
+        return queryset
 
 
 @admin.register(Course)
 class CourseAdmin(admin.ModelAdmin):
+    form = CourseAdminForm
     list_display = ['title', 'course_type', 'price', 'discount_percentage',  'schedule_display',   'is_active', 'enrollment_count',
         'get_average_rating', 
         'get_total_reviews', 
         'is_active', 
         'created_at']
     
-    list_filter = ['course_type', 'is_active', 'created_at','schedule_days']
+    list_filter = ['course_type', 'is_active', 'created_at', ScheduleDayFilter]
     search_fields = ['title', 'description', 'instructor_name']
     readonly_fields = ['created_at', 'updated_at']
     
@@ -28,7 +51,10 @@ class CourseAdmin(admin.ModelAdmin):
             'fields': ('price', 'discount_percentage')
         }),
         ('Schedule', {
-            'fields': ('schedule_time', 'session_details', 'duration')
+            'fields': (
+                'schedule_days', ('start_time', 'end_time'), ('class_start_date', 'class_end_date'),
+                'meeting_link', 'schedule_time', 'session_details', 'duration',
+            )
         }),
         ('Instructor', {
             'fields': ('instructor_name', )
@@ -42,21 +68,45 @@ class CourseAdmin(admin.ModelAdmin):
         }),
     )
     
+    def get_queryset(self, request):
+        # Per-row columns come from annotations, not one query per course
+        return super().get_queryset(request).annotate(
+            _enrollment_count=Count('enrollments', filter=Q(enrollments__payment_status='completed')),
+            _average_rating=Case(
+                When(rating_count=0, then=Value(5.0)),
+                default=Cast(F('rating_sum'), FloatField()) / F('rating_count'),
+                output_field=FloatField(),
+            ),
+        )
+    
     def enrollment_count(self, obj):
-        count = obj.enrollments.filter(payment_status='completed').count()
-        return format_html('<strong>{}</strong> students', count)
+        return format_html('<strong>{}</strong> students', obj._enrollment_count)
     enrollment_count.short_description = 'Enrollments'
+    enrollment_count.admin_order_field = '_enrollment_count'
     
     actions = ['activate_courses', 'deactivate_courses']
     
+    def update_courses(self, queryset, **values):
+        """Bulk update courses and refresh what update() doesn't (post_save); returns the course ids"""
+        # Read the ids first: with a changelist filter on a field being
+        # updated, the queryset matches nothing afterwards
+        course_ids = list(queryset.values_list('id', flat=True))
+        queryset.update(**values)
+        timetable.bump_version()
+        invalidate_course_enrollment_summaries(course_ids)
+        refresh_catalog_entries(course_ids)
+        index_courses(course_ids)
+        generate_sessions(course_ids)
+        return course_ids
+    
     def activate_courses(self, request, queryset):
-        updated = queryset.update(is_active=True)
-        self.message_user(request, f'{updated} courses activated.')
+        course_ids = self.update_courses(queryset, is_active=True)
+        self.message_user(request, f'{len(course_ids)} courses activated.')
     activate_courses.short_description = 'Activate selected courses'
     
     def deactivate_courses(self, request, queryset):
-        updated = queryset.update(is_active=False)
-        self.message_user(request, f'{updated} courses deactivated.')
+        course_ids = self.update_courses(queryset, is_active=False)
+        self.message_user(request, f'{len(course_ids)} courses deactivated.')
     deactivate_courses.short_description = 'Deactivate selected courses'
 
     def schedule_display(self, obj):
@@ -79,12 +129,13 @@ class CourseAdmin(admin.ModelAdmin):
         if obj.course_type != 'live':
             return 'This is a recorded course'
         
-        status = obj.get_class_status()
-        next_class = obj.get_next_class_datetime()
+        schedule = timetable.snapshot()
+        status = schedule.status(obj)
+        next_class = schedule.next_class(obj.id)
         
         status_text = {
             'live_now': '🔴 Class is LIVE NOW!',
-            'starting_soon': f'⏰ Starting in {obj.minutes_until_class()} minutes',
+            'starting_soon': f'⏰ Starting in {schedule.minutes_until_class(obj.id)} minutes',
             'scheduled': '📅 Scheduled'
         }.get(status, 'Not scheduled')
         
@@ -98,10 +149,12 @@ class CourseAdmin(admin.ModelAdmin):
     def get_average_rating(self, obj):
         return f"{obj.get_average_rating()}⭐"
     get_average_rating.short_description = 'Avg Rating'
+    get_average_rating.admin_order_field = '_average_rating'
     
     def get_total_reviews(self, obj):
         return obj.get_total_reviews()
     get_total_reviews.short_description = 'Reviews'
+    get_total_reviews.admin_order_field = 'rating_count'
     
     class Media:
         js = ('admin/js/course_schedule.js',)  # Optional: for better UX
@@ -134,6 +187,7 @@ class CourseEnrollmentAdmin(admin.ModelAdmin):
     readonly_fields = ['user', 'course', 'amount_paid', 'transaction_id', 
     'enrolled_at', 'payment_date', 'last_notification_date']
     
+    list_select_related = ['user', 'course']
     date_hierarchy = 'enrolled_at'
     inlines = [CoursePaymentLogInline]
     
@@ -174,21 +228,31 @@ class CourseEnrollmentAdmin(admin.ModelAdmin):
             '<span style="color: red; font-weight: bold;">✗ Expired</span>'
         )
     access_status.short_description = 'Access'
+    access_status.admin_order_field = 'access_expiry'
     
     actions = ['mark_completed', 'mark_active', 'mark_inactive']
     
+    def update_enrollments(self, queryset, **values):
+        """update() bypasses post_save, so drop the cached summaries here"""
+        # Read the users first: with a changelist filter on a field being
+        # updated, the queryset matches nothing afterwards
+        user_ids = list(queryset.values_list('user_id', flat=True))
+        updated = queryset.update(**values)
+        invalidate_enrollment_summaries(user_ids)
+        return updated
+    
     def mark_completed(self, request, queryset):
-        updated = queryset.update(payment_status='completed')
+        updated = self.update_enrollments(queryset, payment_status='completed')
         self.message_user(request, f'{updated} enrollments marked as completed.')
     mark_completed.short_description = 'Mark payment as completed'
     
     def mark_active(self, request, queryset):
-        updated = queryset.update(is_active=True)
+        updated = self.update_enrollments(queryset, is_active=True)
         self.message_user(request, f'{updated} enrollments activated.')
     mark_active.short_description = 'Activate enrollments'
     
     def mark_inactive(self, request, queryset):
-        updated = queryset.update(is_active=False)
+        updated = self.update_enrollments(queryset, is_active=False)
         self.message_user(request, f'{updated} enrollments deactivated.')
     mark_inactive.short_description = 'Deactivate enrollments'
     
@@ -229,11 +293,13 @@ class CoursePaymentLogAdmin(admin.ModelAdmin):
     search_fields = ['transaction_id', 'enrollment__user__username']
     readonly_fields = ['enrollment', 'transaction_id', 'amount', 'payment_method', 
                        'status', 'response_data', 'created_at']
+    list_select_related = ['enrollment__user']
     date_hierarchy = 'created_at'
     
     def enrollment_user(self, obj):
         return obj.enrollment.user.username
     enrollment_user.short_description = 'User'
+    enrollment_user.admin_order_field = 'enrollment__user__username'
     
     def has_add_permission(self, request):
         return False
@@ -247,6 +313,7 @@ class CourseReviewAdmin(admin.ModelAdmin):
     list_filter = ['rating', 'created_at']
     search_fields = ['user__username', 'course__title', 'comment']
     readonly_fields = ['created_at', 'updated_at']
+    list_select_related = ['user', 'course']
     
     fieldsets = (
         ('Review Details', {
@@ -268,11 +335,50 @@ class UserProfileAdmin(admin.ModelAdmin):
     list_display = ['user', 'mobile_number', 'enrolled_courses_count']
     search_fields = ['user__username', 'user__email', 'mobile_number']
     readonly_fields = ['user']
+    list_select_related = ['user']
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(
+            _enrolled_courses_count=Count(
+                'user__course_enrollments',
+                filter=Q(user__course_enrollments__payment_status='completed'),
+            ),
+        )
     
     def enrolled_courses_count(self, obj):
-        count = CourseEnrollment.objects.filter(
-            user=obj.user, 
-            payment_status='completed'
-        ).count()
-        return format_html('<strong>{}</strong> courses', count)
-    enrolled_courses_count.short_description = 'Enrolled Courses'
\ No newline at end of file
+        return format_html('<strong>{}</strong> courses', obj._enrolled_courses_count)
+    enrolled_courses_count.short_description = 'Enrolled Courses'
+    enrolled_courses_count.admin_order_field = '_enrolled_courses_count'
+
+class ClassAttendanceInline(admin.TabularInline):
+    model = ClassAttendance
+    extra = 0
+    fields = ['user', 'joined_at']
+    readonly_fields = ['user', 'joined_at']
+    can_delete = False
+    
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ClassSession)
+class ClassSessionAdmin(admin.ModelAdmin):
+    """Generated by courses.sessions; read-only apart from attendance review"""
+    list_display = ['course', 'starts_at', 'ends_at', 'attendance_count']
+    list_filter = ['course']
+    search_fields = ['course__title']
+    readonly_fields = ['course', 'starts_at', 'ends_at']
+    list_select_related = ['course']
+    date_hierarchy = 'starts_at'
+    inlines = [ClassAttendanceInline]
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(_attendance_count=Count('attendance'))
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def attendance_count(self, obj):
+        return obj._attendance_count
+    attendance_count.short_description = 'Joined'
+    attendance_count.admin_order_field = '_attendance_count'
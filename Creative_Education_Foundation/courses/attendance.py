@@ -0,0 +1,87 @@
+"""
+Buffered attendance recording for the class join endpoint.
+
+When a class starts every enrolled student clicks "Join" within a minute or
+two. Instead of one INSERT per click, record_join() adds the join to a
+per-process buffer, which is written with a single bulk_create once
+ATTENDANCE_BATCH_SIZE joins are pending or the oldest is
+ATTENDANCE_FLUSH_SECONDS old; a timer thread flushes a buffer that stops
+filling up, and whatever is left is flushed when the process exits.
+
+Repeated clicks are dropped in memory, and across processes by the
+(session, user) unique constraint (ignore_conflicts), so the first join is
+the one that is kept. Joins still buffered when a worker is killed are lost:
+attendance is a best-effort record.
+"""
+import atexit
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+from .models import ClassAttendance
+
+
+_lock = threading.Lock()
+_pending = {}  # (session_id, user_id) -> joined_at
+_oldest = None  # time.monotonic() of the first pending join
+_timer = None
+
+
+def record_join(session_id, user_id, joined_at=None):
+    """Buffer one join; flushes the buffer when it is full or old enough"""
+    global _oldest, _timer
+    joined_at = joined_at or timezone.now()
+    with _lock:
+        _pending.setdefault((session_id, user_id), joined_at)
+        if _oldest is None:
+            _oldest = time.monotonic()
+        due = (
+            len(_pending) >= settings.ATTENDANCE_BATCH_SIZE
+            or time.monotonic() - _oldest >= settings.ATTENDANCE_FLUSH_SECONDS
+        )
+        if not due and _timer is None:
+            _timer = threading.Timer(settings.ATTENDANCE_FLUSH_SECONDS, _flush_in_background)
+            _timer.daemon = True
+            _timer.start()
+    if due:
+        flush()
+
+
+def _take_pending():
+    global _pending, _oldest, _timer
+    with _lock:
+        batch, _pending, _oldest = _pending, {}, None
+        if _timer is not None:
+            _timer.cancel()
+            _timer = None
+    return batch
+
+
+def flush():
+    """Write every buffered join in one batch, return how many were written"""
+    batch = _take_pending()
+    if not batch:
+        return 0
+    ClassAttendance.objects.bulk_create(
+        [
+            ClassAttendance(session_id=session_id, user_id=user_id, joined_at=joined_at)
+            for (session_id, user_id), joined_at in batch.items()
+        ],
+        batch_size=500,
+        ignore_conflicts=True,
+    )
+    return len(batch)
+
+
+def _flush_in_background():
+    try:
+        flush()
+    finally:
+        # The timer thread's own database connection
+        connections.close_all()
+
+
+atexit.register(flush)
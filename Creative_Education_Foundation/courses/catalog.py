@@ -0,0 +1,73 @@
+"""
+Maintenance of the CourseCatalogEntry read model.
+
+Catalog pages (home, online classes, all courses, related courses) read
+precomputed card rows instead of annotating Avg/Count over reviews and
+recomputing discounts on every request. Rows are refreshed whenever a Course
+or CourseReview is written (see courses.signals); ratings come from the
+course's rating counters (courses.ratings), so a refresh never scans reviews.
+"""
+from .models import Course, CourseCatalogEntry
+from .ratings import bayesian_rating
+
+
+def schedule_summary(course):
+    """Short human readable schedule, e.g. "Mon, Wed · 08:00 AM - 09:00 AM" """
+    if not course.start_time or not course.schedule_days:
+        return course.schedule_time or ''
+    days = ', '.join(day.capitalize()[:3] for day in course.schedule_days)
+    time = course.start_time.strftime('%I:%M %p')
+    if course.end_time:
+        time += f" - {course.end_time.strftime('%I:%M %p')}"
+    return f'{days} · {time}'
+
+
+def entry_values(course):
+    """Field values of the catalog row for one course"""
+    avg_rating = course.rating_sum / course.rating_count if course.rating_count else None
+    return {
+        'title': course.title,
+        'image': course.image.name if course.image else None,
+        'course_type': course.course_type,
+        'price': course.price,
+        'discount_percentage': course.discount_percentage,
+        'instructor_name': course.instructor_name,
+        'duration': course.duration,
+        'schedule_time': course.schedule_time,
+        'schedule_days': course.schedule_days,
+        'start_time': course.start_time,
+        'end_time': course.end_time,
+        'is_active': course.is_active,
+        'created_at': course.created_at,
+        'discounted_price': course.get_discounted_price(),
+        'avg_rating': avg_rating,
+        'total_reviews': course.rating_count,
+        'bayesian_rating': bayesian_rating(course.rating_sum, course.rating_count),
+        'schedule_summary': schedule_summary(course),
+    }
+
+
+def refresh_catalog_entries(course_ids=None):
+    """Rebuild the catalog rows of the given courses (all courses when None)"""
+    courses = Course.objects.all()
+    if course_ids is not None:
+        courses = courses.filter(id__in=course_ids)
+
+    refreshed = 0
+    for course in courses:
+        CourseCatalogEntry.objects.update_or_create(
+            course=course,
+            defaults=entry_values(course),
+        )
+        refreshed += 1
+    return refreshed
+
+
+def catalog_entries():
+    """Active catalog rows, newest first"""
+    return CourseCatalogEntry.objects.filter(is_active=True).order_by('-created_at')
+
+
+def top_rated_entries():
+    """Active catalog rows by Bayesian rating (served from catalog_top_rated_idx)"""
+    return CourseCatalogEntry.objects.filter(is_active=True).order_by('-bayesian_rating')
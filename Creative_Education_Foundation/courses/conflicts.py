@@ -0,0 +1,165 @@
+"""
+Schedule clash detection for live courses.
+
+Every active live course with a start and end time is split into weekly
+slots (minutes since Monday 00:00, half-open [start, end), one per scheduled
+day) and kept in static interval trees: one over all courses, for checking a
+student's enrollments, and one per instructor, for double-booking. A check
+walks the tree in O(log n + matches) instead of comparing against every
+course. Classes that merely touch (one ends at 9:00, the next starts at 9:00)
+don't clash, and neither do courses whose class_start_date..class_end_date
+ranges don't overlap.
+
+The index is kept per process and rebuilt only when the timetable version
+moves (any Course save or delete, see courses.timetable).
+"""
+import threading
+
+from . import timetable
+
+
+_lock = threading.Lock()
+_compiled = None
+
+
+class IntervalTree:
+    """
+    Static interval tree: (start, end, value) intervals sorted by start and
+    laid out as an implicit balanced BST, each node knowing the largest end
+    in its subtree
+    """
+
+    def __init__(self, intervals):
+        intervals = sorted(intervals, key=lambda interval: (interval[0], interval[1]))
+        self.starts = [interval[0] for interval in intervals]
+        self.ends = [interval[1] for interval in intervals]
+        self.values = [interval[2] for interval in intervals]
+        self.max_ends = list(self.ends)
+        self._build(0, len(intervals))
+
+    def __len__(self):
+        return len(self.starts)
+
+    def _build(self, lo, hi):
+        if lo >= hi:
+            return float('-inf')
+        mid = (lo + hi) // 2
+        self.max_ends[mid] = max(self.ends[mid], self._build(lo, mid), self._build(mid + 1, hi))
+        return self.max_ends[mid]
+
+    def overlapping(self, start, end):
+        """Values of every interval overlapping [start, end)"""
+        found = []
+        pending = [(0, len(self.starts))]
+        while pending:
+            lo, hi = pending.pop()
+            if lo >= hi:
+                continue
+            mid = (lo + hi) // 2
+            if self.max_ends[mid] <= start:
+                continue  # everything under this node ends before the query
+            pending.append((lo, mid))
+            if self.starts[mid] < end:
+                if self.ends[mid] > start:
+                    found.append(self.values[mid])
+                pending.append((mid + 1, hi))
+        return found
+
+
+def instructor_key(name):
+    """Instructor names compared case- and whitespace-insensitively"""
+    return ' '.join((name or '').split()).casefold()
+
+
+def weekly_slots(schedule_days, start_time, end_time):
+    """[start, end) minute-of-week slots of a schedule; none without a (later) end time"""
+    if not start_time or not end_time or end_time <= start_time:
+        return []
+    start = timetable.time_to_minutes(start_time)
+    end = timetable.time_to_minutes(end_time)
+    slots = []
+    for day_name in schedule_days or ():
+        day = timetable.DAY_INDEX.get(day_name)
+        if day is not None:
+            offset = day * timetable.MINUTES_PER_DAY
+            slots.append((offset + start, offset + end))
+    return sorted(set(slots))
+
+
+def _dates_overlap(first, second):
+    (first_start, first_end), (second_start, second_end) = first, second
+    return (
+        (first_start is None or second_end is None or first_start <= second_end)
+        and (second_start is None or first_end is None or second_start <= first_end)
+    )
+
+
+class ScheduleIndex:
+    """Weekly slots of all active live courses, overall and per instructor"""
+
+    def __init__(self, courses, version=None):
+        self.version = version
+        self.slots = {}
+        self.dates = {}
+        everyone = []
+        by_instructor = {}
+        for course in courses:
+            if course.course_type != 'live' or not course.is_active:
+                continue
+            slots = weekly_slots(course.schedule_days, course.start_time, course.end_time)
+            if not slots:
+                continue
+            self.slots[course.id] = slots
+            self.dates[course.id] = (course.class_start_date, course.class_end_date)
+            key = instructor_key(course.instructor_name)
+            for start, end in slots:
+                everyone.append((start, end, course.id))
+                if key:
+                    by_instructor.setdefault(key, []).append((start, end, course.id))
+        self.tree = IntervalTree(everyone)
+        self.instructor_trees = {key: IntervalTree(slots) for key, slots in by_instructor.items()}
+
+    def _clashes(self, tree, slots, dates, exclude=None, among=None):
+        clashing = set()
+        for start, end in slots:
+            for course_id in tree.overlapping(start, end):
+                if course_id == exclude or (among is not None and course_id not in among):
+                    continue
+                if _dates_overlap(dates, self.dates[course_id]):
+                    clashing.add(course_id)
+        return sorted(clashing)
+
+    def instructor_conflicts(self, instructor_name, slots, dates=(None, None), exclude=None):
+        """Ids of the instructor's other courses that overlap the slots"""
+        tree = self.instructor_trees.get(instructor_key(instructor_name))
+        if tree is None:
+            return []
+        return self._clashes(tree, slots, dates, exclude=exclude)
+
+    def course_conflicts(self, course_id, among):
+        """Ids of the courses in `among` (e.g. a student's enrollments) that clash with a course"""
+        if course_id not in self.slots:
+            return []
+        return self._clashes(
+            self.tree, self.slots[course_id], self.dates[course_id], exclude=course_id, among=set(among),
+        )
+
+
+def get_schedule_index():
+    """Return the compiled schedule index, rebuilding it only if a Course changed"""
+    global _compiled
+    version = timetable.get_version()
+    compiled = _compiled
+    if compiled is not None and compiled.version == version:
+        return compiled
+
+    with _lock:
+        if _compiled is not None and _compiled.version == version:
+            return _compiled
+        from .models import Course
+        courses = Course.objects.filter(is_active=True, course_type='live').scheduled().only(
+            'id', 'course_type', 'is_active', 'schedule_days', 'start_time', 'end_time',
+            'class_start_date', 'class_end_date', 'instructor_name',
+        )
+        _compiled = ScheduleIndex(courses, version=version)
+        return _compiled
@@ -0,0 +1,119 @@
+"""
+Per-user enrollment summary shared by the context processor and the views.
+
+The summary (completed/active course ids, the live-class flag and access
+expiry dates) is loaded with one query, memoised on the request and cached
+across requests, so a typical page needs no enrollment queries at all.
+
+It is dropped when one of the user's enrollments is saved or deleted
+(courses.signals) or bulk updated in the admin, when a course the user is
+enrolled in changes (the live-class flag depends on its type and
+is_active) and when the earliest access expiry passes.
+"""
+from django.core.cache import cache
+from django.utils import timezone
+
+
+SUMMARY_CACHE_KEY = 'courses:enrollments:{user_id}'
+SUMMARY_TIMEOUT = 60 * 60
+
+
+class EnrollmentSummary:
+    """Enrollment state of one user"""
+
+    def __init__(self, completed_course_ids=(), active_course_ids=(), live_course_ids=(), expiries=None):
+        # payment completed, regardless of is_active
+        self.completed_course_ids = frozenset(completed_course_ids)
+        # payment completed and enrollment active
+        self.active_course_ids = frozenset(active_course_ids)
+        # active enrollments in active live courses
+        self.live_course_ids = frozenset(live_course_ids)
+        self.expiries = expiries or {}
+
+    @property
+    def has_active_live_class_enrollment(self):
+        return bool(self.live_course_ids)
+
+    def is_enrolled(self, course_id):
+        return course_id in self.completed_course_ids
+
+    def has_access(self, course_id, now=None):
+        """Same rules as CourseEnrollment.has_access()"""
+        if course_id not in self.active_course_ids:
+            return False
+        expiry = self.expiries.get(course_id)
+        return not expiry or (now or timezone.now()) <= expiry
+
+    def next_expiry(self, now=None):
+        now = now or timezone.now()
+        upcoming = [expiry for expiry in self.expiries.values() if expiry and expiry > now]
+        return min(upcoming) if upcoming else None
+
+
+EMPTY_SUMMARY = EnrollmentSummary()
+
+
+def _cache_key(user_id):
+    return SUMMARY_CACHE_KEY.format(user_id=user_id)
+
+
+def load_enrollment_summary(user_id):
+    """Build a user's summary from the database (one query)"""
+    from .models import CourseEnrollment
+
+    rows = CourseEnrollment.objects.filter(
+        user_id=user_id,
+        payment_status='completed',
+    ).values_list('course_id', 'is_active', 'access_expiry', 'course__course_type', 'course__is_active')
+
+    completed, active, live, expiries = [], [], [], {}
+    for course_id, is_active, access_expiry, course_type, course_is_active in rows:
+        completed.append(course_id)
+        expiries[course_id] = access_expiry
+        if is_active:
+            active.append(course_id)
+            if course_type == 'live' and course_is_active:
+                live.append(course_id)
+    return EnrollmentSummary(completed, active, live, expiries)
+
+
+def get_user_enrollment_summary(user):
+    """Cached summary for a user (empty for anonymous users)"""
+    if not user.is_authenticated:
+        return EMPTY_SUMMARY
+
+    key = _cache_key(user.pk)
+    summary = cache.get(key)
+    if summary is None:
+        summary = load_enrollment_summary(user.pk)
+        timeout = SUMMARY_TIMEOUT
+        next_expiry = summary.next_expiry()
+        if next_expiry:
+            # Drop the summary as soon as one of the enrollments expires
+            seconds = int((next_expiry - timezone.now()).total_seconds()) + 1
+            timeout = max(1, min(timeout, seconds))
+        cache.set(key, summary, timeout=timeout)
+    return summary
+
+
+def get_enrollment_summary(request):
+    """Summary for the current request's user, loaded at most once per request"""
+    summary = getattr(request, '_enrollment_summary', None)
+    if summary is None:
+        summary = get_user_enrollment_summary(request.user)
+        request._enrollment_summary = summary
+    return summary
+
+
+def invalidate_enrollment_summaries(user_ids):
+    """Forget the cached summaries of the given users"""
+    cache.delete_many([_cache_key(user_id) for user_id in set(user_ids)])
+
+
+def invalidate_course_enrollment_summaries(course_ids):
+    """Forget the cached summaries of the users enrolled in the given courses"""
+    from .models import CourseEnrollment
+
+    invalidate_enrollment_summaries(
+        CourseEnrollment.objects.filter(course_id__in=course_ids).values_list('user_id', flat=True)
+    )
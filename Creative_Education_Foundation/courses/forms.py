@@ -0,0 +1,46 @@
+from django import forms
+from django.core.exceptions import ValidationError
+
+from .conflicts import get_schedule_index, weekly_slots
+from .models import Course
+
+
+class CourseAdminForm(forms.ModelForm):
+    """Course form for the admin; rejects double-booking the instructor"""
+    schedule_days = forms.MultipleChoiceField(
+        choices=Course.DAYS_OF_WEEK,
+        required=False,
+        widget=forms.CheckboxSelectMultiple,
+    )
+    
+    class Meta:
+        model = Course
+        fields = '__all__'
+    
+    def _value(self, field):
+        return self.cleaned_data.get(field, getattr(self.instance, field))
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        if self._value('course_type') != 'live' or not self._value('is_active'):
+            return cleaned_data
+        
+        instructor_name = self._value('instructor_name')
+        slots = weekly_slots(self._value('schedule_days'), self._value('start_time'), self._value('end_time'))
+        if not instructor_name or not slots:
+            return cleaned_data
+        
+        clashing_ids = get_schedule_index().instructor_conflicts(
+            instructor_name,
+            slots,
+            dates=(self._value('class_start_date'), self._value('class_end_date')),
+            exclude=self.instance.pk,
+        )
+        if clashing_ids:
+            titles = ', '.join(
+                f'"{title}"' for title in Course.objects.filter(id__in=clashing_ids).values_list('title', flat=True)
+            )
+            raise ValidationError(
+                f'{instructor_name} already teaches {titles} at an overlapping time.'
+            )
+        return cleaned_data
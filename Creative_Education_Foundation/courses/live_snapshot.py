@@ -0,0 +1,117 @@
+"""
+Shared, time-bucketed snapshot of the live-classes page.
+
+The anonymous part of live_classes_view (which courses are live now, starting
+soon, later today or upcoming) is the same for every visitor within a minute,
+so it is built once per minute and shared through the cache. When a snapshot
+expires only one worker rebuilds it (a cache.add() lock); everyone else keeps
+serving the previous minute's snapshot until the new one is stored, so the
+class-start refresh spike never turns into one classification query per
+request. An older snapshot is never served: when the lock holder died without
+storing one, each worker builds its own until the lock expires.
+
+Per-user data (enrollment flags) is layered on top by the caller and never
+stored in the snapshot.
+"""
+import copy
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from . import timetable
+from .sessions import next_session_starts
+
+
+SNAPSHOT_CACHE_KEY = 'courses:live_classes:snapshot'
+REBUILD_LOCK_KEY = 'courses:live_classes:rebuild'
+BUCKET_SECONDS = 60
+REBUILD_LOCK_TIMEOUT = 30
+
+BUCKETS = ('live_now', 'starting_soon', 'today_classes', 'upcoming_classes')
+
+
+def _bucket(now):
+    return int(now.timestamp() // BUCKET_SECONDS)
+
+
+def build_live_snapshot(now=None):
+    """Query and classify all active live classes at one instant"""
+    from .models import Course
+
+    schedule = timetable.snapshot(now)
+    snapshot = {bucket: [] for bucket in BUCKETS}
+    snapshot['bucket'] = _bucket(schedule.now)
+    snapshot['version'] = schedule.timetable.version
+    snapshot['built_at'] = schedule.now
+
+    # Only courses with a weekday and a start time can appear in any bucket
+    all_live_classes = Course.objects.filter(
+        is_active=True,
+        course_type='live'
+    ).scheduled().order_by('start_time')
+    all_live_classes = [course for course in all_live_classes if course.id in schedule.timetable]
+    # From the generated sessions, so a course past its class_end_date has none
+    next_starts = next_session_starts([course.id for course in all_live_classes], schedule.now)
+
+    for course in all_live_classes:
+        course.minutes_left = schedule.minutes_until_class(course.id)
+        course.next_class = next_starts.get(course.id)
+
+        status = schedule.status(course)
+        if status == 'live_now':
+            snapshot['live_now'].append(course)
+        elif status == 'starting_soon':
+            snapshot['starting_soon'].append(course)
+        elif schedule.is_today(course.id):
+            snapshot['today_classes'].append(course)
+        else:
+            snapshot['upcoming_classes'].append(course)
+
+    return snapshot
+
+
+def get_live_snapshot(now=None):
+    """
+    Return the current minute's snapshot, rebuilding it at most once per minute.
+    Only the worker holding the rebuild lock queries the database; the others
+    serve the previous minute's snapshot while the rebuild is in flight.
+    """
+    now = now or timezone.now()
+    bucket = _bucket(now)
+    version = timetable.get_version()
+
+    snapshot = cache.get(SNAPSHOT_CACHE_KEY)
+    if snapshot is not None and snapshot['bucket'] == bucket and snapshot['version'] == version:
+        return snapshot
+
+    if cache.add(REBUILD_LOCK_KEY, bucket, timeout=REBUILD_LOCK_TIMEOUT):
+        try:
+            snapshot = build_live_snapshot(now)
+            cache.set(SNAPSHOT_CACHE_KEY, snapshot, timeout=None)
+        finally:
+            cache.delete(REBUILD_LOCK_KEY)
+        return snapshot
+
+    if snapshot is not None and snapshot['bucket'] >= bucket - 1:
+        return snapshot
+
+    # Cold start, or a snapshot too old to serve (the lock holder may have
+    # died): build one for this request only
+    return build_live_snapshot(now)
+
+
+def personalize(snapshot, enrolled_course_ids):
+    """
+    Copy the shared buckets and flag the courses the user is enrolled in.
+    The snapshot itself is never mutated.
+    """
+    enrolled_course_ids = set(enrolled_course_ids)
+    buckets = {}
+    for name in BUCKETS:
+        courses = []
+        for course in snapshot[name]:
+            course = copy.copy(course)
+            course.is_user_enrolled = course.id in enrolled_course_ids
+            courses.append(course)
+        buckets[name] = courses
+    return buckets
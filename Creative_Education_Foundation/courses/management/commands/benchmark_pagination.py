@@ -0,0 +1,83 @@
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from courses.catalog import catalog_entries
+from courses.models import Course, CourseCatalogEntry
+from courses.pagination import PER_PAGE, KeysetPaginator, encode_cursor
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare OFFSET and keyset page latency on the course catalog at growing sizes. '
+        'Synthetic rows are inserted inside a transaction that is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 50000],
+                            help='Catalog sizes to measure')
+        parser.add_argument('--repeat', type=int, default=20,
+                            help='Runs per measurement')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(sorted(options['sizes']), options['repeat'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def time(self, run, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            run()
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
+
+    def run(self, sizes, repeat):
+        now = timezone.now()
+        created = CourseCatalogEntry.objects.count()
+        for size in sizes:
+            self.grow(size - created, created, now)
+            created = max(created, size)
+
+            queryset = catalog_entries()
+            depth = created * 9 // 10  # page near the end of the listing
+            boundary = queryset.order_by('-created_at', '-pk')[depth]
+            cursor = encode_cursor(boundary.created_at, boundary.pk, 'next')
+            paginator = KeysetPaginator(queryset)
+
+            offset_ms = self.time(lambda: list(queryset.order_by('-created_at', '-pk')[depth:depth + PER_PAGE]), repeat)
+            keyset_ms = self.time(lambda: paginator.page(cursor).object_list, repeat)
+            first_ms = self.time(lambda: paginator.page().object_list, repeat)
+            self.stdout.write(
+                f'{created:>8} rows  page {depth // PER_PAGE + 1:>6}: '
+                f'offset {offset_ms:8.2f}ms  keyset {keyset_ms:6.2f}ms  (first page {first_ms:.2f}ms)'
+            )
+
+    def grow(self, count, start, now):
+        """Insert count synthetic courses with catalog rows (no signals)"""
+        for batch_start in range(start, start + max(count, 0), 1000):
+            numbers = range(batch_start, min(batch_start + 1000, start + count))
+            Course.objects.bulk_create([
+                Course(title=f'Benchmark course {n}', description='', price=1000, course_type='recorded')
+                for n in numbers
+            ])
+            # MySQL doesn't return the new ids from bulk_create
+            course_ids = sorted(Course.objects.order_by('-pk').values_list('pk', flat=True)[:len(numbers)])
+            CourseCatalogEntry.objects.bulk_create([
+                CourseCatalogEntry(
+                    course_id=course_id, title=f'Benchmark course {n}', price=1000, discounted_price=1000,
+                    course_type='recorded', created_at=now - timedelta(minutes=n),
+                )
+                for n, course_id in zip(numbers, course_ids)
+            ])
@@ -0,0 +1,81 @@
+import random
+import time
+from datetime import time as clock_time
+
+from django.core.management.base import BaseCommand
+
+from courses.conflicts import ScheduleIndex, _dates_overlap, instructor_key, weekly_slots
+from courses.models import Course
+from courses.timetable import DAYS_ORDER
+
+
+class Command(BaseCommand):
+    help = (
+        'Time instructor double-booking checks with the interval index against comparing '
+        'every course pair, on synthetic in-memory schedules (nothing is written)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--courses', type=int, nargs='+', default=[1000, 5000, 20000],
+                            help='Numbers of courses to measure')
+        parser.add_argument('--instructors', type=int, default=200,
+                            help='Distinct instructors the courses are spread over')
+        parser.add_argument('--checks', type=int, default=1000,
+                            help='Checks per measurement')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        for size in sorted(options['courses']):
+            courses = [self.course(rng, course_id, options['instructors']) for course_id in range(1, size + 1)]
+            candidates = [self.course(rng, 0, options['instructors']) for _ in range(options['checks'])]
+
+            started = time.perf_counter()
+            index = ScheduleIndex(courses)
+            build_ms = (time.perf_counter() - started) * 1000
+
+            started = time.perf_counter()
+            indexed = [self.check_indexed(index, candidate) for candidate in candidates]
+            indexed_us = (time.perf_counter() - started) * 1e6 / len(candidates)
+
+            started = time.perf_counter()
+            naive = [self.check_naive(courses, candidate) for candidate in candidates]
+            naive_us = (time.perf_counter() - started) * 1e6 / len(candidates)
+
+            if indexed != naive:
+                self.stderr.write(self.style.ERROR(f'{size} courses: index and pairwise results differ'))
+            self.stdout.write(
+                f'{size:>7} courses: build {build_ms:7.1f}ms  '
+                f'index {indexed_us:8.1f}us/check  pairwise {naive_us:10.1f}us/check  '
+                f'({sum(map(bool, indexed))}/{len(candidates)} clash)'
+            )
+
+    def course(self, rng, course_id, instructors):
+        start = rng.randrange(6 * 60, 20 * 60, 15)
+        return Course(
+            id=course_id,
+            title=f'Course {course_id}',
+            course_type='live',
+            is_active=True,
+            instructor_name=f'Instructor {rng.randrange(instructors)}',
+            schedule_days=rng.sample(DAYS_ORDER, rng.randint(1, 3)),
+            start_time=clock_time(start // 60, start % 60),
+            end_time=clock_time((start + 60) // 60, (start + 60) % 60),
+        )
+
+    def check_indexed(self, index, candidate):
+        slots = weekly_slots(candidate.schedule_days, candidate.start_time, candidate.end_time)
+        return index.instructor_conflicts(candidate.instructor_name, slots)
+
+    def check_naive(self, courses, candidate):
+        slots = weekly_slots(candidate.schedule_days, candidate.start_time, candidate.end_time)
+        key = instructor_key(candidate.instructor_name)
+        clashing = set()
+        for course in courses:
+            if instructor_key(course.instructor_name) != key:
+                continue
+            other = weekly_slots(course.schedule_days, course.start_time, course.end_time)
+            if any(start < other_end and other_start < end for start, end in slots for other_start, other_end in other):
+                if _dates_overlap((None, None), (course.class_start_date, course.class_end_date)):
+                    clashing.add(course.id)
+        return sorted(clashing)
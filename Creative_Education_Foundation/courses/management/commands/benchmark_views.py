@@ -0,0 +1,242 @@
+import json
+import platform
+import statistics
+import time
+import tracemalloc
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.core.signals import request_finished, request_started
+from django.db import close_old_connections, connection, connections, transaction
+from django.test import Client, RequestFactory
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from courses.models import Course
+from courses.views import all_courses_view
+from my_project.metrics import RequestStats
+from my_project.seeding import seed
+
+
+class Rollback(Exception):
+    pass
+
+
+def percentile(values, share):
+    """Nearest-rank percentile of a list of numbers"""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(share * len(ordered)) - 1))]
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed realistic volumes and measure p50/p95 latency, queries and peak memory of the hot views. '
+        'The data is rolled back afterwards unless --keep-data. '
+        'Results can be saved as JSON (--output) and compared with an earlier run (--compare).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=5000)
+        parser.add_argument('--courses', type=int, default=300)
+        parser.add_argument('--enrollments', type=int, default=3, help='Average enrollments per user')
+        parser.add_argument('--review-rate', type=float, default=0.3, help='Share of paid enrollments reviewed')
+        parser.add_argument('--vacancies', type=int, default=100)
+        parser.add_argument('--applications', type=int, default=20, help='Average applications per vacancy')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--repeat', type=int, default=30, help='Timed requests per view')
+        parser.add_argument('--cold', action='store_true',
+                            help='Clear the cache before every request instead of measuring warm caches')
+        parser.add_argument('--keep-data', action='store_true', help="Don't roll the seeded rows back")
+        parser.add_argument('--output', help='Write the results to this JSON file')
+        parser.add_argument('--compare', nargs='+', metavar='RESULTS',
+                            help='Compare with an earlier results file; with two files, compare those without running')
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help='Allowed relative p50/p95 slowdown before a view counts as a regression')
+        parser.add_argument('--min-delta', type=float, default=1.0,
+                            help='Slowdowns of fewer milliseconds than this are noise, whatever the ratio')
+
+    def handle(self, *args, **options):
+        compare = options['compare'] or []
+        if len(compare) > 2:
+            raise CommandError('--compare takes one or two results files')
+        if len(compare) == 2:
+            return self.compare(self.load(compare[0]), self.load(compare[1]), options['tolerance'], options['min_delta'])
+
+        # Requests would close the connection, and with it the transaction the
+        # seeded rows live in (the test runner does the same)
+        request_started.disconnect(close_old_connections)
+        request_finished.disconnect(close_old_connections)
+        try:
+            # DEBUG would keep every query in memory and log N+1 warnings on each request
+            with override_settings(DEBUG=False):
+                if options['keep_data']:
+                    results = self.run(options)
+                else:
+                    try:
+                        with transaction.atomic():
+                            results = self.run(options)
+                            raise Rollback
+                    except Rollback:
+                        pass
+        finally:
+            request_started.connect(close_old_connections)
+            request_finished.connect(close_old_connections)
+            cache.clear()
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(results, output, indent=2)
+            self.stdout.write(self.style.SUCCESS(f'Results written to {options["output"]}'))
+        if compare:
+            self.compare(self.load(compare[0]), results, options['tolerance'], options['min_delta'])
+
+    def run(self, options):
+        volumes = {
+            name: options[name]
+            for name in ('users', 'courses', 'enrollments', 'review_rate', 'vacancies', 'applications')
+        }
+        # Seed a rush of classes starting this minute, so the live page is measured at a class start
+        class_start = timezone.now().replace(second=0, microsecond=0)
+        started = time.perf_counter()
+        written = seed(**volumes, rush_at=class_start, seed=options['seed'], log=self.stdout.write)
+        self.stdout.write(f'Seeded in {time.perf_counter() - started:.1f}s')
+        cache.clear()
+
+        student = User.objects.filter(course_enrollments__payment_status='completed').order_by('pk').first()
+        admin = (
+            User.objects.filter(username='benchmark-admin').first()
+            or User.objects.create_superuser('benchmark-admin', 'benchmark-admin@example.com', None)
+        )
+        course = Course.objects.filter(is_active=True).order_by('pk').first()
+        search = course.title.split()[-2]  # the subject, e.g. "Mathematics"
+
+        scenarios = [
+            ('home', student, reverse('home')),
+            ('online_classes', student, reverse('online_classes')),
+            ('all_courses_search', student, all_courses_view, {'q': search}),
+            ('live_classes_at_class_start', student, reverse('current_live_classes')),
+            ('course_detail', student, reverse('course_detail', args=[course.pk])),
+            ('vacancies', student, reverse('vacancies')),
+        ] + [
+            (f'admin_{name}', admin, reverse(f'admin:{name}_changelist'))
+            for name in (
+                'courses_course', 'courses_courseenrollment', 'courses_coursereview', 'courses_coursepaymentlog',
+                'accounts_userprofile', 'pages_vacancy', 'pages_vacancyapplication',
+            )
+        ]
+
+        results = {
+            'meta': {
+                'created': timezone.now().isoformat(),
+                'database': connection.vendor,
+                'python': platform.python_version(),
+                'volumes': volumes,
+                'rows': written,
+                'seed': options['seed'],
+                'repeat': options['repeat'],
+                'cache': 'cold' if options['cold'] else 'warm',
+            },
+            'views': {},
+        }
+        self.stdout.write(f'{"view":<34}{"p50 ms":>9}{"p95 ms":>9}{"queries":>9}{"peak KiB":>10}')
+        for name, user, target, *params in scenarios:
+            stats = self.measure(user, target, params[0] if params else {}, options['repeat'], options['cold'])
+            results['views'][name] = stats
+            self.stdout.write(
+                f'{name:<34}{stats["p50_ms"]:>9.2f}{stats["p95_ms"]:>9.2f}'
+                f'{stats["queries"]:>9}{stats["peak_kib"]:>10.0f}'
+            )
+        return results
+
+    def measure(self, user, target, params, repeat, cold):
+        """
+        target is a URL, requested through the full middleware stack, or a view
+        function called with a RequestFactory request (all_courses_view: its
+        URL is shadowed by CoursesView at the same path)
+        """
+        client = Client()
+        client.force_login(user)
+
+        def request():
+            if cold:
+                cache.clear()
+            if isinstance(target, str):
+                response = client.get(target, params)
+            else:
+                get = RequestFactory().get('/', params)
+                get.user = user
+                response = target(get)
+            if response.status_code != 200:
+                raise CommandError(f'{target} answered {response.status_code}')
+            return response
+
+        request()  # warm up
+        timings, queries = [], []
+        for _ in range(repeat):
+            stats = RequestStats()
+            with connections['default'].execute_wrapper(stats):
+                started = time.perf_counter()
+                request()
+                timings.append((time.perf_counter() - started) * 1000)
+            queries.append(stats.queries)
+
+        # Memory separately, tracemalloc slows everything down
+        tracemalloc.start()
+        try:
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+            request()
+            peak = tracemalloc.get_traced_memory()[1] - baseline
+        finally:
+            tracemalloc.stop()
+
+        return {
+            'p50_ms': round(statistics.median(timings), 3),
+            'p95_ms': round(percentile(timings, 0.95), 3),
+            'mean_ms': round(statistics.fmean(timings), 3),
+            'queries': max(queries),
+            'peak_kib': round(peak / 1024, 1),
+        }
+
+    def load(self, path):
+        try:
+            with open(path) as results:
+                return json.load(results)
+        except (OSError, ValueError) as error:
+            raise CommandError(f'Cannot read {path}: {error}')
+
+    def compare(self, before, after, tolerance, min_delta):
+        """Print the change per view; fail on slower p50/p95 beyond tolerance or more queries"""
+        if before['meta'].get('volumes') != after['meta'].get('volumes'):
+            self.stdout.write(self.style.WARNING('The runs seeded different volumes'))
+
+        regressions = []
+        self.stdout.write(f'{"view":<34}{"p50 ms":>18}{"p95 ms":>18}{"queries":>10}')
+        for name, new in after['views'].items():
+            old = before['views'].get(name)
+            if old is None:
+                self.stdout.write(f'{name:<34} (new)')
+                continue
+            slower = [
+                key for key in ('p50_ms', 'p95_ms')
+                if new[key] > old[key] * (1 + tolerance) and new[key] - old[key] >= min_delta
+            ]
+            if new['queries'] > old['queries']:
+                slower.append('queries')
+            line = (
+                f'{name:<34}'
+                f'{old["p50_ms"]:>8.2f} ->{new["p50_ms"]:>8.2f}'
+                f'{old["p95_ms"]:>8.2f} ->{new["p95_ms"]:>8.2f}'
+                f'{old["queries"]:>4} ->{new["queries"]:>4}'
+            )
+            if slower:
+                regressions.append(f'{name} ({", ".join(slower)})')
+                self.stdout.write(self.style.ERROR(line))
+            else:
+                self.stdout.write(line)
+
+        if regressions:
+            raise CommandError(f'{len(regressions)} regression(s): {"; ".join(regressions)}')
+        self.stdout.write(self.style.SUCCESS('No regressions'))
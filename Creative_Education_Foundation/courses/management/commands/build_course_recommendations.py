@@ -0,0 +1,50 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from courses.recommendations import TOP_K, build_recommendations, cosine_neighbours
+
+
+class Command(BaseCommand):
+    help = 'Precompute co-enrollment based related courses (run nightly)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=TOP_K,
+                            help='Neighbours to store per course')
+        parser.add_argument('--benchmark', type=int, nargs='?', const=100000, metavar='ENROLLMENTS',
+                            help='Time the similarity step on synthetic data instead of building '
+                                 '(default: 100000 enrollments)')
+        parser.add_argument('--courses', type=int, default=300,
+                            help='Number of synthetic courses for --benchmark')
+        parser.add_argument('--users', type=int, default=40000,
+                            help='Number of synthetic users for --benchmark')
+
+    def handle(self, *args, **options):
+        if options['benchmark']:
+            return self.benchmark(options['benchmark'], options['users'], options['courses'], options['top_k'])
+
+        started = time.perf_counter()
+        rows = build_recommendations(top_k=options['top_k'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Stored {rows} recommendations in {time.perf_counter() - started:.2f}s.'
+        ))
+
+    def benchmark(self, enrollments, users, courses, top_k):
+        rng = np.random.default_rng(42)
+        # Popularity follows a power law, like real course catalogs
+        popularity = 1.0 / np.arange(1, courses + 1) ** 0.8
+        user_index = rng.integers(0, users, size=enrollments)
+        course_index = rng.choice(courses, size=enrollments, p=popularity / popularity.sum())
+        # One enrollment per (user, course)
+        pairs = np.unique(np.stack([user_index, course_index], axis=1), axis=0)
+
+        started = time.perf_counter()
+        neighbours, scores = cosine_neighbours(pairs[:, 0], pairs[:, 1], users, courses, top_k)
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(pairs)} enrollments, {users} users, {courses} courses: '
+            f'top-{top_k} neighbours in {elapsed:.2f}s '
+            f'({int((neighbours >= 0).sum())} neighbour rows).'
+        ))
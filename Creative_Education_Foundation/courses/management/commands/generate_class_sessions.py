@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from courses.sessions import generate_sessions
+
+
+class Command(BaseCommand):
+    help = 'Generate upcoming class sessions from the live course schedules (run daily)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--courses', type=int, nargs='+',
+                            help='Only these course ids (default: every live course)')
+
+    def handle(self, *args, **options):
+        created, updated, deleted = generate_sessions(options['courses'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {created}, updated {updated} and deleted {deleted} class session(s).'
+        ))
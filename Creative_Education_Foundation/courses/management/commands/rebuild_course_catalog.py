@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from courses.catalog import refresh_catalog_entries
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the denormalized course catalog rows from Course and CourseReview'
+
+    def handle(self, *args, **kwargs):
+        refreshed = refresh_catalog_entries()
+        self.stdout.write(self.style.SUCCESS(f'Refreshed {refreshed} catalog entries.'))
@@ -0,0 +1,65 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Q
+
+from courses.catalog import catalog_entries
+from courses.models import CourseSearchPosting
+from courses.search import index_courses, search_courses
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the course search index, or benchmark search against the old icontains query'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--benchmark', action='store_true',
+                            help='Time search_courses() against the icontains filter instead of rebuilding')
+        parser.add_argument('--query', action='append', dest='queries',
+                            help='Query to benchmark (repeatable); defaults to the most common index terms')
+        parser.add_argument('--repeat', type=int, default=50,
+                            help='Runs per query for --benchmark')
+
+    def handle(self, *args, **options):
+        if options['benchmark']:
+            return self.benchmark(options['queries'], options['repeat'])
+
+        started = time.perf_counter()
+        indexed = index_courses()
+        self.stdout.write(self.style.SUCCESS(
+            f'Indexed {indexed} courses in {time.perf_counter() - started:.2f}s.'
+        ))
+
+    def benchmark(self, queries, repeat):
+        if not queries:
+            queries = list(
+                CourseSearchPosting.objects.values('term').annotate(documents=Count('id'))
+                .order_by('-documents').values_list('term', flat=True)[:5]
+            )
+        if not queries:
+            self.stdout.write(self.style.WARNING('The search index is empty, nothing to benchmark.'))
+            return
+
+        def icontains(query):
+            return list(catalog_entries().filter(
+                Q(title__icontains=query) |
+                Q(course__description__icontains=query) |
+                Q(instructor_name__icontains=query)
+            ))
+
+        def indexed(query):
+            return search_courses(query).object_list
+
+        for query in queries:
+            for name, run in (('icontains', icontains), ('search', indexed)):
+                timings = []
+                for _ in range(repeat):
+                    started = time.perf_counter()
+                    results = run(query)
+                    timings.append((time.perf_counter() - started) * 1000)
+                timings.sort()
+                p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+                self.stdout.write(
+                    f'{query!r:20} {name:10} p50 {statistics.median(timings):7.2f}ms  '
+                    f'p95 {p95:7.2f}ms  {len(results)} results'
+                )
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from courses.catalog import refresh_catalog_entries
+from courses.ratings import reconcile_course_ratings
+
+
+class Command(BaseCommand):
+    help = 'Rebuild course rating counters from CourseReview (run nightly)'
+
+    def handle(self, *args, **kwargs):
+        drifted = reconcile_course_ratings()
+        # Ranking weights may have changed too, so refresh every catalog row
+        refresh_catalog_entries()
+        self.stdout.write(self.style.SUCCESS(
+            f'Reconciled ratings, {len(drifted)} course(s) had drifted.'
+        ))
@@ -0,0 +1,54 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from my_project.seeding import CHUNK_SIZE, seed
+
+
+class Command(BaseCommand):
+    help = (
+        'Add coherent synthetic data at production volumes: users with profiles, scheduled courses, '
+        'enrollments with payment logs and reviews, vacancies with applications and FAQ questions. '
+        'The defaults come to about a million enrollments. The same --seed gives the same data.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=350000)
+        parser.add_argument('--courses', type=int, default=2000)
+        parser.add_argument('--enrollments', type=int, default=3, help='Average enrollments per user')
+        parser.add_argument('--review-rate', type=float, default=0.3, help='Share of paid enrollments reviewed')
+        parser.add_argument('--vacancies', type=int, default=2000)
+        parser.add_argument('--applications', type=int, default=25, help='Average applications per vacancy')
+        parser.add_argument('--questions', type=int, default=20000)
+        parser.add_argument('--password', help='Password of every seeded user; without one they cannot log in')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='Users (and rows) per bulk insert')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        volumes = {
+            name: options[name]
+            for name in ('users', 'courses', 'enrollments', 'vacancies', 'applications', 'questions', 'chunk_size')
+        }
+        if any(value < 0 for value in volumes.values()) or options['chunk_size'] < 1:
+            raise CommandError('Volumes must not be negative and --chunk-size must be positive')
+        if options['users'] and not options['courses']:
+            raise CommandError('Users need at least one course to enroll in')
+
+        started = time.perf_counter()
+
+        def log(message):
+            self.stdout.write(f'[{time.perf_counter() - started:7.1f}s] {message}')
+
+        # DEBUG would format and keep every INSERT
+        with override_settings(DEBUG=False):
+            written = seed(
+                **volumes, review_rate=options['review_rate'], password=options['password'],
+                seed=options['seed'], log=log,
+            )
+        elapsed = time.perf_counter() - started
+        total = sum(written.values())
+        self.stdout.write(self.style.SUCCESS(
+            f'{total} rows in {elapsed:.1f}s ({total / max(elapsed, 0.001):.0f} rows/s): '
+            + ', '.join(f'{count} {name}' for name, count in written.items())
+        ))
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from courses.reminders import queue_due_reminders
+from courses.timetable import STARTING_SOON_MINUTES
+
+
+class Command(BaseCommand):
+    help = 'Queue "starting soon" reminders for live classes in the outbox (run every minute, or with --loop)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--minutes', type=int, default=STARTING_SOON_MINUTES,
+                            help='Remind students whose class starts within this many minutes')
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep running instead of exiting after one pass')
+        parser.add_argument('--interval', type=int, default=60,
+                            help='Seconds between passes with --loop')
+
+    def handle(self, *args, **options):
+        while True:
+            claimed, queued = queue_due_reminders(minutes=options['minutes'])
+            self.stdout.write(self.style.SUCCESS(
+                f'Claimed {claimed} reminder(s), queued {queued}.'
+            ))
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,83 @@
+# Generated by Django 5.2.7 on 2026-10-18 09:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Avg, Count
+
+
+def backfill_catalog(apps, schema_editor):
+    Course = apps.get_model('courses', 'Course')
+    CourseCatalogEntry = apps.get_model('courses', 'CourseCatalogEntry')
+
+    courses = Course.objects.annotate(review_avg=Avg('reviews__rating'), review_count=Count('reviews'))
+    entries = []
+    for course in courses:
+        discounted = course.price
+        if course.discount_percentage > 0:
+            discounted = course.price - (course.price * course.discount_percentage) / 100
+        summary = course.schedule_time or ''
+        if course.start_time and course.schedule_days:
+            summary = ', '.join(day.capitalize()[:3] for day in course.schedule_days)
+            summary += ' · ' + course.start_time.strftime('%I:%M %p')
+            if course.end_time:
+                summary += ' - ' + course.end_time.strftime('%I:%M %p')
+        entries.append(CourseCatalogEntry(
+            course=course,
+            title=course.title,
+            image=course.image.name if course.image else None,
+            course_type=course.course_type,
+            price=course.price,
+            discount_percentage=course.discount_percentage,
+            instructor_name=course.instructor_name,
+            duration=course.duration,
+            schedule_time=course.schedule_time,
+            schedule_days=course.schedule_days,
+            start_time=course.start_time,
+            end_time=course.end_time,
+            is_active=course.is_active,
+            created_at=course.created_at,
+            discounted_price=discounted,
+            avg_rating=course.review_avg,
+            total_reviews=course.review_count,
+            schedule_summary=summary,
+        ))
+    CourseCatalogEntry.objects.bulk_create(entries, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0003_course_class_end_date_course_class_start_date_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseCatalogEntry',
+            fields=[
+                ('course', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='catalog_entry', serialize=False, to='courses.course')),
+                ('title', models.CharField(max_length=200)),
+                ('image', models.ImageField(blank=True, null=True, upload_to='courses/images/')),
+                ('course_type', models.CharField(choices=[('live', 'Live Class'), ('recorded', 'Recorded Course'), ('hybrid', 'Hybrid')], default='live', max_length=20)),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('discount_percentage', models.DecimalField(decimal_places=2, default=0, max_digits=5)),
+                ('instructor_name', models.CharField(blank=True, max_length=200)),
+                ('duration', models.CharField(blank=True, max_length=100)),
+                ('schedule_time', models.CharField(blank=True, max_length=100)),
+                ('schedule_days', models.JSONField(blank=True, default=list)),
+                ('start_time', models.TimeField(blank=True, null=True)),
+                ('end_time', models.TimeField(blank=True, null=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField()),
+                ('discounted_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('avg_rating', models.FloatField(blank=True, null=True)),
+                ('total_reviews', models.PositiveIntegerField(default=0)),
+                ('schedule_summary', models.CharField(blank=True, max_length=200)),
+                ('refreshed_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['is_active', '-created_at'], name='catalog_active_created_idx'), models.Index(fields=['is_active', 'course_type', '-created_at'], name='catalog_type_created_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_catalog, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,80 @@
+# Generated by Django 5.2.7 on 2026-10-18 09:56
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def backfill_rating_counters(apps, schema_editor):
+    Course = apps.get_model('courses', 'Course')
+    CourseReview = apps.get_model('courses', 'CourseReview')
+    CourseCatalogEntry = apps.get_model('courses', 'CourseCatalogEntry')
+
+    aggregates = {'rating_count': Count('id'), 'rating_sum': Sum('rating')}
+    for stars in range(1, 6):
+        aggregates[f'rating_{stars}_count'] = Count('id', filter=Q(rating=stars))
+
+    weight = settings.COURSE_RATING_PRIOR_WEIGHT
+    prior = settings.COURSE_RATING_PRIOR_MEAN
+    for row in CourseReview.objects.values('course_id').annotate(**aggregates).order_by():
+        course_id = row.pop('course_id')
+        Course.objects.filter(id=course_id).update(**row)
+
+    for course in Course.objects.all():
+        score = (weight * prior + course.rating_sum) / (weight + course.rating_count)
+        CourseCatalogEntry.objects.filter(course_id=course.id).update(bayesian_rating=score)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0004_coursecatalogentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='rating_1_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='rating_2_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='rating_3_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='rating_4_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='rating_5_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='coursecatalogentry',
+            name='bayesian_rating',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='coursecatalogentry',
+            index=models.Index(fields=['is_active', '-bayesian_rating'], name='catalog_top_rated_idx'),
+        ),
+        migrations.RunPython(backfill_rating_counters, migrations.RunPython.noop),
+    ]
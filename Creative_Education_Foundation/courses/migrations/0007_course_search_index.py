@@ -0,0 +1,52 @@
+# Generated by Django 5.2.7 on 2026-10-18 10:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_search_index(apps, schema_editor):
+    from courses.search import document_terms
+
+    Course = apps.get_model('courses', 'Course')
+    CourseSearchDocument = apps.get_model('courses', 'CourseSearchDocument')
+    CourseSearchPosting = apps.get_model('courses', 'CourseSearchPosting')
+
+    for course in Course.objects.filter(is_active=True):
+        weights, length = document_terms(course)
+        document = CourseSearchDocument.objects.create(course=course, course_type=course.course_type, length=length)
+        CourseSearchPosting.objects.bulk_create([
+            CourseSearchPosting(document=document, term=term, weight=weight)
+            for term, weight in weights.items()
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0006_courserecommendation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseSearchDocument',
+            fields=[
+                ('course', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='courses.course')),
+                ('course_type', models.CharField(choices=[('live', 'Live Class'), ('recorded', 'Recorded Course'), ('hybrid', 'Hybrid')], default='live', max_length=20)),
+                ('length', models.FloatField(default=0)),
+                ('indexed_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CourseSearchPosting',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+                ('weight', models.FloatField()),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='postings', to='courses.coursesearchdocument')),
+            ],
+            options={
+                'unique_together': {('term', 'document')},
+            },
+        ),
+        migrations.RunPython(backfill_search_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.7 on 2026-10-18 10:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0007_course_search_index'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='coursecatalogentry',
+            name='catalog_active_created_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='coursecatalogentry',
+            name='catalog_type_created_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='coursecatalogentry',
+            name='catalog_top_rated_idx',
+        ),
+        migrations.AddIndex(
+            model_name='coursecatalogentry',
+            index=models.Index(fields=['-created_at', '-course', 'is_active'], name='catalog_active_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='coursecatalogentry',
+            index=models.Index(fields=['course_type', '-created_at', '-course', 'is_active'], name='catalog_type_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='coursecatalogentry',
+            index=models.Index(fields=['-bayesian_rating', '-course', 'is_active'], name='catalog_top_rated_idx'),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.7 on 2026-10-18 10:16
+
+from django.db import migrations, models
+
+
+# As courses.timetable computes them in Course.save() today, frozen here
+DAYS_ORDER = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+
+
+def schedule_mask(schedule_days):
+    return sum(1 << DAYS_ORDER.index(day) for day in set(schedule_days or ()) if day in DAYS_ORDER)
+
+
+def minute_of_day(value):
+    return None if value is None else value.hour * 60 + value.minute
+
+
+def backfill_schedule_columns(apps, schema_editor):
+    Course = apps.get_model('courses', 'Course')
+    courses = list(Course.objects.only('id', 'schedule_days', 'start_time', 'end_time'))
+    for course in courses:
+        course.schedule_mask = schedule_mask(course.schedule_days)
+        course.start_minute = minute_of_day(course.start_time)
+        course.end_minute = minute_of_day(course.end_time)
+    Course.objects.bulk_update(courses, ['schedule_mask', 'start_minute', 'end_minute'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0008_catalog_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='end_minute',
+            field=models.PositiveSmallIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='schedule_mask',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='start_minute',
+            field=models.PositiveSmallIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['schedule_mask', 'start_minute', 'end_minute'], name='course_schedule_idx'),
+        ),
+        migrations.RunPython(backfill_schedule_columns, migrations.RunPython.noop),
+    ]
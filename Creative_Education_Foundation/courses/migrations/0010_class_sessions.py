@@ -0,0 +1,80 @@
+# Generated by Django 5.2.7 on 2026-10-18 10:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_class_sessions(apps, schema_editor):
+    from datetime import timedelta
+
+    from django.conf import settings
+    from django.utils import timezone
+
+    from courses.sessions import MAX_SESSION_DAYS, session_times
+
+    Course = apps.get_model('courses', 'Course')
+    ClassSession = apps.get_model('courses', 'ClassSession')
+    now = timezone.now()
+    today = timezone.localtime(now).date()
+    sessions = []
+    for course in Course.objects.filter(is_active=True, course_type='live', schedule_mask__gt=0):
+        first_date = max(today, course.class_start_date) if course.class_start_date else today
+        last_date = course.class_end_date or today + timedelta(days=settings.CLASS_SESSION_HORIZON_DAYS)
+        last_date = min(last_date, today + timedelta(days=MAX_SESSION_DAYS))
+        sessions.extend(
+            ClassSession(course_id=course.id, starts_at=starts_at, ends_at=ends_at)
+            for starts_at, ends_at in session_times(
+                course.schedule_mask, course.start_time, course.end_time, first_date, last_date
+            )
+            if starts_at >= now
+        )
+    ClassSession.objects.bulk_create(sessions, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0009_course_schedule_mask'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClassSession',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('starts_at', models.DateTimeField()),
+                ('ends_at', models.DateTimeField(blank=True, null=True)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sessions', to='courses.course')),
+            ],
+            options={
+                'ordering': ['starts_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ClassAttendance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('joined_at', models.DateTimeField()),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='class_attendance', to=settings.AUTH_USER_MODEL)),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendance', to='courses.classsession')),
+            ],
+            options={
+                'ordering': ['joined_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='classsession',
+            index=models.Index(fields=['starts_at', 'course'], name='class_session_start_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='classsession',
+            constraint=models.UniqueConstraint(fields=('course', 'starts_at'), name='class_session_unique_start'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='classattendance',
+            unique_together={('session', 'user')},
+        ),
+        migrations.RunPython(backfill_class_sessions, migrations.RunPython.noop),
+    ]
@@ -4,6 +4,20 @@ from django.utils import timezone
 from django.db.models import Avg
 from datetime import datetime, timedelta
 from accounts.models import UserProfile
+from . import timetable
+
+
+class CourseQuerySet(models.QuerySet):
+    """Schedule lookups on the derived schedule_mask/start_minute/end_minute columns"""
+
+    def scheduled(self):
+        """Courses that meet on at least one weekday at a set time"""
+        return self.filter(schedule_mask__gt=0, start_minute__isnull=False)
+
+    def scheduled_on(self, day):
+        """Courses that meet on the given weekday ('monday'...)"""
+        return self.filter(schedule_mask__in=timetable.DAY_MASKS[day])
+
 
 class Course(models.Model):
     """Model for online courses/live classes"""
@@ -36,6 +50,12 @@ class Course(models.Model):
     end_time = models.TimeField(blank=True, null=True)  # e.g., 09:00:00
     session_details = models.TextField(blank=True)
     
+    # Derived from schedule_days/start_time/end_time in save(), for indexed
+    # schedule queries (see CourseQuerySet)
+    schedule_mask = models.PositiveSmallIntegerField(default=0, editable=False)
+    start_minute = models.PositiveSmallIntegerField(blank=True, null=True, editable=False)
+    end_minute = models.PositiveSmallIntegerField(blank=True, null=True, editable=False)
+    
     # For display purposes (backward compatibility)
     schedule_time = models.CharField(max_length=100, blank=True)  # e.g., "8:00 AM - 9:00 AM"
     
@@ -52,12 +72,54 @@ class Course(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    # Rating counters, maintained by courses.ratings with every CourseReview write
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    rating_1_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_2_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_3_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_4_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_5_count = models.PositiveIntegerField(default=0, editable=False)
+    
+    RATING_COUNTER_FIELDS = (
+        'rating_count', 'rating_sum',
+        'rating_1_count', 'rating_2_count', 'rating_3_count', 'rating_4_count', 'rating_5_count',
+    )
+    SCHEDULE_FIELDS = ('schedule_days', 'start_time', 'end_time')
+    SCHEDULE_DERIVED_FIELDS = ('schedule_mask', 'start_minute', 'end_minute')
+    
+    objects = CourseQuerySet.as_manager()
+    
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['schedule_mask', 'start_minute', 'end_minute'], name='course_schedule_idx'),
+        ]
     
     def __str__(self):
         return self.title
     
+    def sync_schedule_fields(self):
+        """Recompute the derived schedule columns from schedule_days and the times"""
+        self.schedule_mask = timetable.schedule_mask(self.schedule_days)
+        self.start_minute = timetable.minute_of_day(self._meta.get_field('start_time').to_python(self.start_time))
+        self.end_minute = timetable.minute_of_day(self._meta.get_field('end_time').to_python(self.end_time))
+    
+    def save(self, *args, **kwargs):
+        self.sync_schedule_fields()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and set(update_fields) & set(self.SCHEDULE_FIELDS):
+            kwargs['update_fields'] = set(update_fields) | set(self.SCHEDULE_DERIVED_FIELDS)
+        
+        # Never write back (possibly stale) rating counters from a full save;
+        # they are only changed with F() updates in courses.ratings
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.RATING_COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
+    
     def get_discounted_price(self):
         """Calculate price after discount"""
         if self.discount_percentage > 0:
@@ -66,13 +128,18 @@ class Course(models.Model):
         return self.price
     
     def get_average_rating(self):
-        """Get average rating from reviews"""
-        avg = self.reviews.aggregate(Avg('rating'))['rating__avg']
-        return round(avg, 1) if avg else 5.0
+        """Get average rating from the rating counters"""
+        if not self.rating_count:
+            return 5.0
+        return round(self.rating_sum / self.rating_count, 1)
     
     def get_total_reviews(self):
         """Get total number of reviews"""
-        return self.reviews.count()
+        return self.rating_count
+    
+    def get_rating_histogram(self):
+        """Number of 1..5 star reviews, in that order"""
+        return [getattr(self, f'rating_{stars}_count') for stars in range(1, 6)]
     
     def get_full_stars(self):
         """Get number of full stars for display"""
@@ -278,4 +345,154 @@ class CoursePaymentLog(models.Model):
         ordering = ['-created_at']
     
     def __str__(self):
-        return f"{self.transaction_id} - {self.status}"
\ No newline at end of file
+        return f"{self.transaction_id} - {self.status}"
+
+class CourseCatalogEntry(models.Model):
+    """
+    Denormalized read model for catalog pages: one row per Course holding
+    everything a course card shows, so listings are one join-free query.
+    Kept up to date by courses.catalog from Course/CourseReview signals.
+    """
+    course = models.OneToOneField(Course, on_delete=models.CASCADE, primary_key=True, related_name='catalog_entry')
+    
+    # Card fields copied from Course
+    title = models.CharField(max_length=200)
+    image = models.ImageField(upload_to='courses/images/', blank=True, null=True)
+    course_type = models.CharField(max_length=20, choices=Course.COURSE_TYPE_CHOICES, default='live')
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    discount_percentage = models.DecimalField(max_digits=5, decimal_places=2, default=0)
+    instructor_name = models.CharField(max_length=200, blank=True)
+    duration = models.CharField(max_length=100, blank=True)
+    schedule_time = models.CharField(max_length=100, blank=True)
+    schedule_days = models.JSONField(default=list, blank=True)
+    start_time = models.TimeField(blank=True, null=True)
+    end_time = models.TimeField(blank=True, null=True)
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField()
+    
+    # Precomputed values
+    discounted_price = models.DecimalField(max_digits=10, decimal_places=2)
+    avg_rating = models.FloatField(blank=True, null=True)  # None until the first review
+    total_reviews = models.PositiveIntegerField(default=0)
+    bayesian_rating = models.FloatField(default=0)  # "top rated" sort key, see courses.ratings
+    schedule_summary = models.CharField(max_length=200, blank=True)  # e.g., "Mon, Wed · 08:00 AM - 09:00 AM"
+    
+    refreshed_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            # Sort key + pk match the keyset ordering of courses.pagination; is_active
+            # trails because filter(is_active=True) compiles to a bare "WHERE is_active",
+            # which can't use a leading index column
+            models.Index(fields=['-created_at', '-course', 'is_active'], name='catalog_active_created_idx'),
+            models.Index(fields=['course_type', '-created_at', '-course', 'is_active'], name='catalog_type_created_idx'),
+            models.Index(fields=['-bayesian_rating', '-course', 'is_active'], name='catalog_top_rated_idx'),
+        ]
+    
+    def __str__(self):
+        return self.title
+    
+    @property
+    def id(self):
+        """Course id, so entries can be used wherever a Course card is rendered"""
+        return self.course_id
+    
+    def get_discounted_price(self):
+        return self.discounted_price
+    
+    def get_average_rating(self):
+        return round(self.avg_rating, 1) if self.avg_rating else 5.0
+    
+    def get_total_reviews(self):
+        return self.total_reviews
+    
+    def get_full_stars(self):
+        return int(self.get_average_rating())
+    
+    def has_half_star(self):
+        rating = self.get_average_rating()
+        return (rating - int(rating)) >= 0.5
+    
+    def get_next_class_datetime(self):
+        """Next class from the compiled timetable (no query)"""
+        from . import timetable
+        return timetable.snapshot().next_class(self.course_id)
+
+
+class CourseRecommendation(models.Model):
+    """Precomputed "students also enrolled in" neighbours of a course"""
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='recommendations')
+    recommended = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='recommended_for')
+    score = models.FloatField()  # cosine similarity of the two courses' enrollments
+    rank = models.PositiveSmallIntegerField()  # 1 = most similar
+    
+    class Meta:
+        ordering = ['course', 'rank']
+        unique_together = ['course', 'rank']
+    
+    def __str__(self):
+        return f"{self.course_id} -> {self.recommended_id} ({self.score:.2f})"
+
+
+class CourseSearchDocument(models.Model):
+    """
+    One indexed (active) course in the course search index, see courses.search.
+    Holds the document length and type used for BM25 ranking and filtering.
+    """
+    course = models.OneToOneField(Course, on_delete=models.CASCADE, primary_key=True, related_name='search_document')
+    course_type = models.CharField(max_length=20, choices=Course.COURSE_TYPE_CHOICES, default='live')
+    length = models.FloatField(default=0)  # field-weighted token count
+    indexed_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"Search document {self.course_id}"
+
+
+class CourseSearchPosting(models.Model):
+    """Inverted index entry: a term and its field-weighted frequency in one course"""
+    document = models.ForeignKey(CourseSearchDocument, on_delete=models.CASCADE, related_name='postings')
+    term = models.CharField(max_length=64)
+    weight = models.FloatField()
+    
+    class Meta:
+        unique_together = ['term', 'document']
+    
+    def __str__(self):
+        return f"{self.term} -> {self.document_id}"
+
+
+class ClassSession(models.Model):
+    """
+    One concrete occurrence of a live course, generated from its schedule and
+    date range by courses.sessions
+    """
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='sessions')
+    starts_at = models.DateTimeField()
+    ends_at = models.DateTimeField(blank=True, null=True)  # no end time set on the course
+    
+    class Meta:
+        ordering = ['starts_at']
+        indexes = [
+            models.Index(fields=['starts_at', 'course'], name='class_session_start_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['course', 'starts_at'], name='class_session_unique_start'),
+        ]
+    
+    def __str__(self):
+        return f"{self.course_id} @ {self.starts_at:%Y-%m-%d %H:%M}"
+
+
+class ClassAttendance(models.Model):
+    """A student's (first) join of a class session, see courses.attendance"""
+    session = models.ForeignKey(ClassSession, on_delete=models.CASCADE, related_name='attendance')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='class_attendance')
+    joined_at = models.DateTimeField()
+    
+    class Meta:
+        ordering = ['joined_at']
+        unique_together = ['session', 'user']
+    
+    def __str__(self):
+        return f"{self.user_id} joined {self.session_id}"
@@ -0,0 +1,145 @@
+"""
+Keyset (cursor) pagination for listings.
+
+OFFSET pagination reads and throws away every row before the requested page,
+so deep pages get slower as a table grows. Keyset pagination remembers the
+sort key of the last (or first) row shown and asks for the rows after (or
+before) it instead, which is one index range scan whatever the depth:
+
+    WHERE (created_at, id) < (:created_at, :id) ORDER BY created_at DESC, id DESC
+
+Pages link to each other with opaque cursors (base64 JSON of the boundary
+row's key); a missing, stale or tampered cursor just shows the first page.
+Used by the course listings and the vacancy list.
+"""
+import base64
+import binascii
+from datetime import datetime
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+PER_PAGE = 12
+
+
+def encode_cursor(value, pk, direction):
+    if isinstance(value, datetime):
+        value = {'dt': value.isoformat()}
+    payload = json.dumps([value, pk, direction], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """(value, pk, direction) of a cursor, or None if it is not valid"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        value, pk, direction = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if isinstance(value, dict):
+            value = datetime.fromisoformat(value['dt'])
+    except (binascii.Error, ValueError, TypeError, KeyError, UnicodeDecodeError):
+        return None
+    if direction not in ('next', 'prev') or not isinstance(pk, int):
+        return None
+    return value, pk, direction
+
+
+class KeysetPage:
+    """One page of a keyset listing; iterate it like a Paginator page"""
+
+    def __init__(self, object_list, has_next, has_previous, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.has_next = has_next
+        self.has_previous = has_previous
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+
+class KeysetPaginator:
+    """
+    Pages a queryset in descending (field, pk) order. The queryset's own
+    ordering is replaced; for flat latency there should be an index on
+    (<equality filters>, -field, -pk[, other filtered columns]), e.g.
+    catalog_active_created_idx.
+    """
+
+    def __init__(self, queryset, field='created_at', per_page=PER_PAGE):
+        self.queryset = queryset
+        self.field = field
+        self.per_page = per_page
+
+    def _cursor(self, obj, direction):
+        return encode_cursor(getattr(obj, self.field), obj.pk, direction)
+
+    def decode(self, cursor):
+        """decode_cursor(), with the value checked against the ordering field"""
+        decoded = decode_cursor(cursor) if cursor else None
+        if decoded is None:
+            return None
+        value, pk, direction = decoded
+        try:
+            # A tampered cursor can carry any JSON value: 'abc', 3.5, null, [1]...
+            value = self.queryset.model._meta.get_field(self.field).to_python(value)
+        except (ValueError, TypeError, ValidationError):
+            return None
+        if value is None:
+            return None
+        return value, pk, direction
+
+    def page(self, cursor=None):
+        decoded = self.decode(cursor)
+        field = self.field
+
+        if decoded is None:
+            rows = list(self.queryset.order_by(f'-{field}', '-pk')[:self.per_page + 1])
+            has_next, has_previous = len(rows) > self.per_page, False
+            rows = rows[:self.per_page]
+        else:
+            value, pk, direction = decoded
+            if direction == 'next':
+                # The redundant <= bound lets the database range-scan the index
+                after = Q(**{f'{field}__lt': value}) | Q(**{field: value, 'pk__lt': pk})
+                rows = list(
+                    self.queryset.filter(after, **{f'{field}__lte': value})
+                    .order_by(f'-{field}', '-pk')[:self.per_page + 1]
+                )
+                has_next, has_previous = len(rows) > self.per_page, True
+                rows = rows[:self.per_page]
+            else:
+                before = Q(**{f'{field}__gt': value}) | Q(**{field: value, 'pk__gt': pk})
+                rows = list(
+                    self.queryset.filter(before, **{f'{field}__gte': value})
+                    .order_by(field, 'pk')[:self.per_page + 1]
+                )
+                has_next, has_previous = True, len(rows) > self.per_page
+                rows = rows[:self.per_page][::-1]
+
+        if decoded is not None and not rows:
+            # The rows around the cursor are gone (deleted or deactivated)
+            return self.page(None)
+
+        return KeysetPage(
+            rows,
+            has_next=has_next and bool(rows),
+            has_previous=has_previous and bool(rows),
+            next_cursor=self._cursor(rows[-1], 'next') if rows else None,
+            previous_cursor=self._cursor(rows[0], 'prev') if rows else None,
+        )
+
+
+def paginate_keyset(request, queryset, field='created_at', per_page=PER_PAGE):
+    """The page of queryset selected by the request's ?cursor= parameter"""
+    return KeysetPaginator(queryset, field, per_page).page(request.GET.get('cursor'))
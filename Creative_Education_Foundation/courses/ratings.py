@@ -0,0 +1,62 @@
+"""
+Incrementally maintained course rating counters.
+
+Every CourseReview create/update/delete adjusts the course's rating_sum,
+rating_count and 1-5 star histogram with a single F() UPDATE, in the same
+transaction as the review write (see courses.signals). Averages, star
+counts and the Bayesian "top rated" score are then read from the counters
+instead of aggregating CourseReview. reconcile_course_ratings() rebuilds
+the counters from the reviews and is run nightly to repair any drift.
+"""
+from django.conf import settings
+from django.db.models import Count, F, Q, Sum
+
+from .models import Course, CourseReview
+
+
+STAR_FIELDS = {stars: f'rating_{stars}_count' for stars in range(1, 6)}
+
+
+def bayesian_rating(rating_sum, rating_count):
+    """Average rating pulled towards the prior mean for courses with few reviews"""
+    weight = settings.COURSE_RATING_PRIOR_WEIGHT
+    prior = settings.COURSE_RATING_PRIOR_MEAN
+    return (weight * prior + rating_sum) / (weight + rating_count)
+
+
+def apply_rating_delta(course_id, rating, sign):
+    """Add (sign=1) or remove (sign=-1) one review of `rating` stars"""
+    star_field = STAR_FIELDS[rating]
+    Course.objects.filter(id=course_id).update(**{
+        'rating_count': F('rating_count') + sign,
+        'rating_sum': F('rating_sum') + sign * rating,
+        star_field: F(star_field) + sign,
+    })
+
+
+def reconcile_course_ratings():
+    """
+    Recompute every course's counters from CourseReview in one grouped query.
+    Returns the ids of courses whose counters had drifted.
+    """
+    aggregates = {
+        'rating_count': Count('id'),
+        'rating_sum': Sum('rating'),
+    }
+    for stars, field in STAR_FIELDS.items():
+        aggregates[field] = Count('id', filter=Q(rating=stars))
+
+    actual = {
+        row.pop('course_id'): row
+        for row in CourseReview.objects.values('course_id').annotate(**aggregates).order_by()
+    }
+
+    empty = {field: 0 for field in Course.RATING_COUNTER_FIELDS}
+    drifted = []
+    for course in Course.objects.only('id', *Course.RATING_COUNTER_FIELDS):
+        counters = actual.get(course.id, empty)
+        stored = {field: getattr(course, field) for field in Course.RATING_COUNTER_FIELDS}
+        if stored != counters:
+            Course.objects.filter(id=course.id).update(**counters)
+            drifted.append(course.id)
+    return drifted
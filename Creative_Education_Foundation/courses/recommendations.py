@@ -0,0 +1,117 @@
+"""
+Co-enrollment based related-course recommendations.
+
+build_recommendations() turns completed CourseEnrollment rows into a sparse
+user x course matrix, computes item-item cosine similarity with NumPy and
+stores the top-k neighbours of every course in CourseRecommendation. It runs
+offline (build_course_recommendations command); the detail pages only read
+the stored neighbours with one indexed lookup via related_courses(), falling
+back to the top-rated catalog rows for courses without enough neighbours
+(new courses, or courses nobody has co-enrolled in yet).
+"""
+import numpy as np
+from django.db import transaction
+
+from .catalog import top_rated_entries
+from .models import CourseCatalogEntry, CourseEnrollment, CourseRecommendation
+
+
+TOP_K = 10
+USER_CHUNK_SIZE = 4096
+
+
+def cosine_neighbours(user_index, course_index, n_users, n_courses, top_k=TOP_K, chunk_size=USER_CHUNK_SIZE):
+    """
+    Item-item cosine similarity over a binary user x course matrix given as
+    COO coordinates. Co-occurrences are counted sparsely, as (course, course)
+    pairs of courses taken by the same user, so memory follows the number of
+    co-enrolled pairs rather than n_courses ** 2. Users are processed in
+    chunks of chunk_size, which bounds the pairs expanded at once.
+
+    Returns (neighbours, scores): two n_courses x top_k arrays, best first,
+    with -1 / 0.0 padding where a course has fewer than top_k neighbours.
+    """
+    # One entry per (user, course), sorted by user
+    codes = np.unique(np.asarray(user_index, dtype=np.int64) * n_courses + np.asarray(course_index, dtype=np.int64))
+    user_index, course_index = np.divmod(codes, n_courses)
+    enrolled = np.bincount(course_index, minlength=n_courses)
+
+    chunk_codes, chunk_counts = [], []
+    for chunk_start in range(0, n_users, chunk_size):
+        lo, hi = np.searchsorted(user_index, [chunk_start, chunk_start + chunk_size])
+        if lo == hi:
+            continue
+        users, courses = user_index[lo:hi], course_index[lo:hi]
+        # Every entry paired with each entry of the same user
+        group_starts = np.flatnonzero(np.r_[True, users[1:] != users[:-1]])
+        group_sizes = np.diff(np.r_[group_starts, len(users)])
+        sizes = np.repeat(group_sizes, group_sizes)
+        first = np.repeat(np.arange(len(users)), sizes)
+        offsets = np.arange(len(first)) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+        second = np.repeat(np.repeat(group_starts, group_sizes), sizes) + offsets
+        distinct = first != second
+        pairs, counts = np.unique(courses[first[distinct]] * n_courses + courses[second[distinct]], return_counts=True)
+        chunk_codes.append(pairs)
+        chunk_counts.append(counts)
+
+    # Sum the chunks' counts of each pair
+    empty = np.zeros(0, dtype=np.int64)
+    pair_codes, inverse = np.unique(np.concatenate([empty, *chunk_codes]), return_inverse=True)
+    pair_counts = np.bincount(inverse, weights=np.concatenate([empty, *chunk_counts]))
+    rows, columns = np.divmod(pair_codes, n_courses)
+    similarity = pair_counts / np.sqrt(enrolled[rows] * enrolled[columns])
+
+    # Best first within each course, then the first top_k of each
+    order = np.lexsort((columns, -similarity, rows))
+    rows, columns, similarity = rows[order], columns[order], similarity[order]
+    row_starts = np.searchsorted(rows, np.arange(n_courses))
+    rank = np.arange(len(rows)) - row_starts[rows]
+    kept = rank < top_k
+
+    neighbours = np.full((n_courses, top_k), -1, dtype=np.int64)
+    scores = np.zeros((n_courses, top_k), dtype=np.float64)
+    neighbours[rows[kept], rank[kept]] = columns[kept]
+    scores[rows[kept], rank[kept]] = similarity[kept]
+    return neighbours, scores
+
+
+def build_recommendations(top_k=TOP_K):
+    """Recompute and store the neighbours of every course, return the row count"""
+    pairs = np.array(
+        list(CourseEnrollment.objects.filter(payment_status='completed').values_list('user_id', 'course_id')),
+        dtype=np.int64,
+    ).reshape(-1, 2)
+
+    rows = []
+    if len(pairs):
+        user_ids, user_index = np.unique(pairs[:, 0], return_inverse=True)
+        course_ids, course_index = np.unique(pairs[:, 1], return_inverse=True)
+        neighbours, scores = cosine_neighbours(user_index, course_index, len(user_ids), len(course_ids), top_k)
+
+        for i, course_id in enumerate(course_ids.tolist()):
+            for rank, (j, score) in enumerate(zip(neighbours[i].tolist(), scores[i].tolist()), start=1):
+                if j < 0:
+                    break
+                rows.append(CourseRecommendation(
+                    course_id=course_id, recommended_id=int(course_ids[j]), score=score, rank=rank,
+                ))
+
+    with transaction.atomic():
+        CourseRecommendation.objects.all().delete()
+        CourseRecommendation.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def related_courses(course_id, limit=3):
+    """Catalog rows of the course's nearest neighbours, topped up with top-rated courses"""
+    related = list(
+        CourseCatalogEntry.objects.filter(
+            is_active=True,
+            course__recommended_for__course_id=course_id,
+        ).order_by('course__recommended_for__rank')[:limit]
+    )
+    if len(related) < limit:
+        # Cold start: not enough co-enrollments yet
+        exclude_ids = [course_id] + [entry.course_id for entry in related]
+        related += list(top_rated_entries().exclude(course_id__in=exclude_ids)[:limit - len(related)])
+    return related
@@ -0,0 +1,94 @@
+"""
+10-minute class reminders, queued in batches outside the request path.
+
+claim_due_reminders() finds every enrollment whose course starts within the
+reminder window, locks them and claims them with one set-based UPDATE of
+notified_10min/last_notification_date, so each student is reminded at most
+once per day no matter how many notifier runs overlap. queue_due_reminders()
+claims them and queues their emails in the outbox in the same transaction:
+send_outbox delivers them, retrying on SMTP failures, and a run that fails
+leaves its reminders unclaimed for the next one. The dedup key
+reminder:<enrollment id>:<date> keeps a reminder from being queued twice.
+"""
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from outbox.queue import build_email, queue_emails
+
+from . import timetable
+from .models import CourseEnrollment
+
+
+REMINDER_DEDUP_KEY = 'reminder:{enrollment_id}:{date}'
+
+
+def claim_due_reminders(now=None, minutes=timetable.STARTING_SOON_MINUTES):
+    """Claim every unnotified enrollment whose class starts within `minutes`"""
+    now = now or timezone.now()
+    schedule = timetable.get_timetable().at(now, soon_minutes=minutes)
+    course_ids = schedule.starting_soon
+    if not course_ids:
+        return []
+
+    today = schedule.now.date()
+    due = CourseEnrollment.objects.filter(
+        course_id__in=course_ids,
+        course__is_active=True,
+        payment_status='completed',
+        is_active=True,
+    ).filter(
+        Q(access_expiry__isnull=True) | Q(access_expiry__gt=schedule.now)
+    ).exclude(
+        notified_10min=True,
+        last_notification_date=today,
+    )
+
+    with transaction.atomic():
+        # Locked until the claim commits: a concurrent notifier skips these rows
+        # (or, without SKIP LOCKED, waits and finds them claimed)
+        due = due.select_for_update(skip_locked=connection.features.has_select_for_update_skip_locked)
+        claimed_ids = list(due.values_list('id', flat=True))
+        if claimed_ids:
+            CourseEnrollment.objects.filter(id__in=claimed_ids).update(
+                notified_10min=True,
+                last_notification_date=today,
+            )
+
+    return list(
+        CourseEnrollment.objects.filter(id__in=claimed_ids).select_related('user', 'course')
+    )
+
+
+def build_reminder(enrollment, schedule):
+    """The outbox email reminding one claimed enrollment"""
+    course = enrollment.course
+    user = enrollment.user
+    minutes = schedule.minutes_until_class(course.id)
+    starts = f'starts in {minutes} minutes' if minutes else 'is starting now'
+
+    body = (
+        f'Hi {user.first_name or user.username},\n\n'
+        f'Your live class "{course.title}" {starts}.\n'
+    )
+    if course.meeting_link:
+        body += f'Join here: {course.meeting_link}\n'
+
+    return build_email(
+        user.email,
+        f'⏰ Starting Soon: {course.title}',
+        body,
+        dedup_key=REMINDER_DEDUP_KEY.format(enrollment_id=enrollment.id, date=enrollment.last_notification_date),
+    )
+
+
+def queue_due_reminders(now=None, minutes=timetable.STARTING_SOON_MINUTES):
+    """Claim the due reminders and queue their emails in one transaction; returns (claimed, queued)"""
+    # One instant for the claim and the emails' "starts in" minutes
+    now = now or timezone.now()
+    with transaction.atomic():
+        enrollments = claim_due_reminders(now, minutes)
+        schedule = timetable.get_timetable().at(now, soon_minutes=minutes)
+        reminders = [build_reminder(enrollment, schedule) for enrollment in enrollments if enrollment.user.email]
+        queue_emails(reminders)
+    return len(enrollments), len(reminders)
@@ -0,0 +1,217 @@
+"""
+Ranked full-text search over courses.
+
+Every active course is tokenized into an inverted index (CourseSearchPosting:
+term -> course, field-weighted term frequency) covering its title,
+instructor, description and session details. A query looks its terms up
+through the (term, document) unique index, so it never scans course text, and
+ranks the matches with BM25. The index is plain tables and works the same on
+MySQL and SQLite.
+
+Courses are re-indexed one at a time when they are saved (courses.signals);
+rebuild_search_index rebuilds everything.
+"""
+from collections import Counter, defaultdict
+import math
+import re
+import unicodedata
+
+from django.core.paginator import Paginator
+from django.db import transaction
+from django.db.models import Avg, Count, Q
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Course, CourseCatalogEntry, CourseSearchDocument, CourseSearchPosting
+
+
+# Matches in the title count three times as much as in the description
+FIELD_WEIGHTS = {
+    'title': 3.0,
+    'instructor_name': 2.0,
+    'description': 1.0,
+    'session_details': 1.0,
+}
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+# Query terms at least this long also match longer index terms ("pyth" -> "python")
+PREFIX_MIN_LENGTH = 3
+MAX_TERM_LENGTH = 64
+MAX_QUERY_TERMS = 10
+SNIPPET_LENGTH = 160
+RESULTS_PER_PAGE = 12
+
+STOPWORDS = frozenset(
+    'a an and are as at be by for from how in into is it of on or the this to with'.split()
+)
+
+WORD_RE = re.compile(r'[^\W_]+', re.UNICODE)
+
+
+def normalize(word):
+    """Lowercase and strip accents"""
+    word = unicodedata.normalize('NFKD', word.lower())
+    return ''.join(char for char in word if not unicodedata.combining(char))[:MAX_TERM_LENGTH]
+
+
+def tokenize(text):
+    """Index/query terms of a text, in order"""
+    terms = []
+    for match in WORD_RE.finditer(text or ''):
+        term = normalize(match.group())
+        if term and term not in STOPWORDS:
+            terms.append(term)
+    return terms
+
+
+def document_terms(course):
+    """Field-weighted term frequencies and document length of a course"""
+    weights = Counter()
+    for field, field_weight in FIELD_WEIGHTS.items():
+        for term in tokenize(getattr(course, field)):
+            weights[term] += field_weight
+    return weights, sum(weights.values())
+
+
+def index_courses(course_ids=None):
+    """(Re)index the given courses (all courses when None); inactive ones are dropped"""
+    courses = Course.objects.only('id', 'is_active', 'course_type', *FIELD_WEIGHTS)
+    if course_ids is not None:
+        courses = courses.filter(id__in=course_ids)
+
+    indexed = 0
+    for course in courses:
+        with transaction.atomic():
+            CourseSearchDocument.objects.filter(course_id=course.id).delete()
+            if not course.is_active:
+                continue
+            weights, length = document_terms(course)
+            document = CourseSearchDocument.objects.create(
+                course_id=course.id, course_type=course.course_type, length=length,
+            )
+            CourseSearchPosting.objects.bulk_create([
+                CourseSearchPosting(document=document, term=term, weight=weight)
+                for term, weight in weights.items()
+            ])
+            indexed += 1
+    return indexed
+
+
+def _bm25(postings, query_terms, stats):
+    """Score documents; each query term counts once, through its best-matching index term"""
+    document_frequency = Counter(term for term, _, _, _, _ in postings)
+    total = stats['documents'] or 1
+    average_length = stats['average_length'] or 1.0
+
+    best = defaultdict(dict)  # course_id -> {query term: score}
+    course_types = {}
+    for term, course_id, weight, length, course_type in postings:
+        course_types[course_id] = course_type
+        df = document_frequency[term]
+        idf = math.log(1 + (total - df + 0.5) / (df + 0.5))
+        score = idf * weight * (K1 + 1) / (weight + K1 * (1 - B + B * length / average_length))
+        for query_term in query_terms:
+            if term == query_term or (len(query_term) >= PREFIX_MIN_LENGTH and term.startswith(query_term)):
+                if score > best[course_id].get(query_term, 0):
+                    best[course_id][query_term] = score
+    return {course_id: sum(scores.values()) for course_id, scores in best.items()}, course_types
+
+
+def rank_courses(query, course_type=None):
+    """Course ids matching the query, best first, with their scores"""
+    query_terms = list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+    if not query_terms:
+        return []
+
+    lookup = Q()
+    for term in query_terms:
+        if len(term) >= PREFIX_MIN_LENGTH:
+            lookup |= Q(term__startswith=term)
+        else:
+            lookup |= Q(term=term)
+    postings = list(
+        CourseSearchPosting.objects.filter(lookup).values_list(
+            'term', 'document_id', 'weight', 'document__length', 'document__course_type'
+        )
+    )
+    if not postings:
+        return []
+
+    stats = CourseSearchDocument.objects.aggregate(documents=Count('pk'), average_length=Avg('length'))
+    scores, course_types = _bm25(postings, query_terms, stats)
+    if course_type:
+        scores = {course_id: score for course_id, score in scores.items() if course_types[course_id] == course_type}
+    return sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+
+
+def _matches(text, query_terms):
+    """Word matches of the query terms in a text (same prefix rule as the lookup)"""
+    matches = []
+    for match in WORD_RE.finditer(text or ''):
+        word = normalize(match.group())
+        for term in query_terms:
+            if word == term or (len(term) >= PREFIX_MIN_LENGTH and word.startswith(term)):
+                matches.append(match)
+                break
+    return matches
+
+
+def highlight(text, query_terms, length=None):
+    """
+    Escape text and wrap matched words in <mark>. With a length, cut a snippet
+    of about that many characters around the first match.
+    """
+    text = text or ''
+    matches = _matches(text, query_terms)
+
+    start, end = 0, len(text)
+    if length and len(text) > length:
+        first, first_end = (matches[0].start(), matches[0].end()) if matches else (0, 0)
+        start = max(0, min(first - length // 4, len(text) - length))
+        # Don't start or end in the middle of a word
+        if start:
+            space = text.find(' ', start)
+            start = space + 1 if 0 <= space < first else start
+        end = start + length
+        space = text.rfind(' ', start, end)
+        end = space if space >= max(first_end, start + 1) else end
+
+    parts = ['…' if start else '']
+    position = start
+    for match in matches:
+        if match.start() < start or match.end() > end:
+            continue
+        parts.append(escape(text[position:match.start()]))
+        parts.append(f'<mark>{escape(match.group())}</mark>')
+        position = match.end()
+    parts.append(escape(text[position:end]))
+    parts.append('…' if end < len(text) else '')
+    return mark_safe(''.join(parts))
+
+
+def search_courses(query, course_type=None, page=1, per_page=RESULTS_PER_PAGE):
+    """
+    One page of search results as catalog rows, best match first. Every row
+    gets search_score, highlighted_title and snippet (safe HTML).
+    """
+    ranked = rank_courses(query, course_type)
+    page_obj = Paginator(ranked, per_page).get_page(page)
+
+    scores = dict(page_obj.object_list)
+    entries = CourseCatalogEntry.objects.filter(course_id__in=scores).select_related('course')
+    entries = sorted(entries, key=lambda entry: (-scores[entry.course_id], entry.course_id))
+
+    query_terms = tokenize(query)
+    for entry in entries:
+        entry.search_score = scores[entry.course_id]
+        entry.highlighted_title = highlight(entry.title, query_terms)
+        # Snippet from the description, unless only the session details match
+        text = entry.course.description
+        if not _matches(text, query_terms) and _matches(entry.course.session_details, query_terms):
+            text = entry.course.session_details
+        entry.snippet = highlight(text, query_terms, SNIPPET_LENGTH)
+    page_obj.object_list = entries
+    return page_obj
@@ -0,0 +1,136 @@
+"""
+Concrete class sessions of live courses.
+
+A live course only describes its schedule (weekdays, start/end time and the
+class_start_date..class_end_date range). generate_sessions() materializes
+every occurrence in that range as a ClassSession row, so "when is the next
+class" and "which class is this join for" are index lookups on
+(course, starts_at) instead of recomputing the schedule every time.
+
+Generation is incremental and only touches sessions that haven't started
+yet: occurrences that left the schedule are deleted, new ones are inserted
+and changed end times are updated, while past sessions (and their
+attendance) are kept. It runs for a course whenever the course is saved
+(courses.signals), and daily for every course (generate_class_sessions) to
+roll the horizon forward for courses without a class_end_date.
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Min, Q
+from django.utils import timezone
+
+from .models import ClassSession, Course
+from .timetable import STARTING_SOON_MINUTES
+
+
+# Never generate more than a year ahead, whatever class_end_date says
+MAX_SESSION_DAYS = 366
+
+
+def session_times(schedule_mask, start_time, end_time, first_date, last_date):
+    """(starts_at, ends_at) of every scheduled day from first_date to last_date"""
+    if not schedule_mask or start_time is None:
+        return []
+    times = []
+    day = first_date
+    while day <= last_date:
+        if schedule_mask & (1 << day.weekday()):
+            starts_at = timezone.make_aware(datetime.combine(day, start_time))
+            ends_at = None
+            # An end before the start never makes a class live (see is_live_now)
+            if end_time is not None and end_time > start_time:
+                ends_at = timezone.make_aware(datetime.combine(day, end_time))
+            times.append((starts_at, ends_at))
+        day += timedelta(days=1)
+    return times
+
+
+def scheduled_sessions(course, now):
+    """{starts_at: ends_at} of the course's sessions that start at or after now"""
+    if not course.is_active or course.course_type != 'live':
+        return {}
+    today = timezone.localtime(now).date()
+    first_date = max(today, course.class_start_date) if course.class_start_date else today
+    last_date = course.class_end_date or today + timedelta(days=settings.CLASS_SESSION_HORIZON_DAYS)
+    last_date = min(last_date, today + timedelta(days=MAX_SESSION_DAYS))
+    return {
+        starts_at: ends_at
+        for starts_at, ends_at in session_times(
+            course.schedule_mask, course.start_time, course.end_time, first_date, last_date
+        )
+        if starts_at >= now
+    }
+
+
+def generate_sessions(course_ids=None, now=None):
+    """
+    Bring the future sessions of the given courses (all live courses, and any
+    course that still has future sessions, when None) in line with their
+    schedules. Returns (created, updated, deleted).
+    """
+    now = now or timezone.now()
+    courses = Course.objects.only(
+        'id', 'is_active', 'course_type', 'schedule_mask', 'start_time', 'end_time',
+        'class_start_date', 'class_end_date',
+    )
+    if course_ids is not None:
+        courses = courses.filter(id__in=course_ids)
+    else:
+        courses = courses.filter(Q(course_type='live') | Q(sessions__starts_at__gte=now)).distinct()
+    courses = list(courses)
+
+    existing = defaultdict(dict)
+    for session in ClassSession.objects.filter(course__in=courses, starts_at__gte=now):
+        existing[session.course_id][session.starts_at] = session
+
+    created, updated, deleted = [], [], []
+    for course in courses:
+        wanted = scheduled_sessions(course, now)
+        current = existing[course.id]
+        for starts_at, session in current.items():
+            if starts_at not in wanted:
+                deleted.append(session.pk)
+            elif session.ends_at != wanted[starts_at]:
+                session.ends_at = wanted[starts_at]
+                updated.append(session)
+        created.extend(
+            ClassSession(course_id=course.id, starts_at=starts_at, ends_at=ends_at)
+            for starts_at, ends_at in wanted.items()
+            if starts_at not in current
+        )
+
+    with transaction.atomic():
+        if deleted:
+            ClassSession.objects.filter(pk__in=deleted).delete()
+        # A concurrent run may have inserted the same sessions already
+        ClassSession.objects.bulk_create(created, batch_size=500, ignore_conflicts=True)
+        ClassSession.objects.bulk_update(updated, ['ends_at'], batch_size=500)
+    return len(created), len(updated), len(deleted)
+
+
+def next_session_starts(course_ids, now=None):
+    """{course_id: start of its next session after now} in one query"""
+    now = now or timezone.now()
+    return dict(
+        ClassSession.objects.filter(course_id__in=course_ids, starts_at__gt=now)
+        .values('course_id').annotate(next_start=Min('starts_at'))
+        .values_list('course_id', 'next_start')
+    )
+
+
+def joinable_session(course_id, now=None, early_minutes=STARTING_SOON_MINUTES):
+    """
+    The session a join at now belongs to: in progress, or starting within
+    early_minutes. None between sessions.
+    """
+    now = now or timezone.now()
+    session = (
+        ClassSession.objects.filter(course_id=course_id, starts_at__lte=now + timedelta(minutes=early_minutes))
+        .order_by('-starts_at').first()
+    )
+    if session is None or now > (session.ends_at or session.starts_at):
+        return None
+    return session
@@ -0,0 +1,84 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import timetable
+from .catalog import refresh_catalog_entries
+from .enrollment_cache import invalidate_course_enrollment_summaries, invalidate_enrollment_summaries
+from .ratings import apply_rating_delta
+from .search import index_courses
+from .sessions import generate_sessions
+from .models import Course, CourseEnrollment, CourseReview
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+def course_changed(sender, instance, **kwargs):
+    """Recompile the live-class timetable after any schedule change"""
+    timetable.bump_version()
+
+
+@receiver(post_save, sender=Course)
+def drop_course_enrollment_summaries(sender, instance, raw=False, **kwargs):
+    """The summaries of the course's students depend on its type and is_active"""
+    if not raw:
+        invalidate_course_enrollment_summaries([instance.id])
+
+
+@receiver(post_save, sender=Course)
+def refresh_course_catalog_entry(sender, instance, raw=False, **kwargs):
+    """Keep the course's catalog row in sync with the course"""
+    if not raw:
+        refresh_catalog_entries([instance.id])
+
+
+@receiver(post_save, sender=Course)
+def reindex_course(sender, instance, raw=False, **kwargs):
+    """Keep the course's search index entry in sync with the course"""
+    if not raw:
+        index_courses([instance.id])
+
+
+@receiver(post_save, sender=Course)
+def regenerate_class_sessions(sender, instance, raw=False, **kwargs):
+    """Keep the course's upcoming class sessions in line with its schedule"""
+    if not raw:
+        generate_sessions([instance.id])
+
+
+@receiver(pre_save, sender=CourseReview)
+def remember_previous_rating(sender, instance, raw=False, **kwargs):
+    """Keep the stored rating/course so an edit can move the counters"""
+    instance._previous_rating = None
+    if instance.pk and not raw:
+        instance._previous_rating = (
+            CourseReview.objects.filter(pk=instance.pk).values_list('course_id', 'rating').first()
+        )
+
+
+@receiver(post_save, sender=CourseReview)
+def review_saved(sender, instance, created, raw=False, **kwargs):
+    """Update the course's rating counters and catalog row"""
+    previous = getattr(instance, '_previous_rating', None)
+    if previous != (instance.course_id, instance.rating):
+        if previous is not None:
+            apply_rating_delta(previous[0], previous[1], -1)
+        apply_rating_delta(instance.course_id, instance.rating, 1)
+        refresh_catalog_entries({instance.course_id, previous[0] if previous else instance.course_id})
+
+
+@receiver(post_delete, sender=CourseReview)
+def review_deleted(sender, instance, origin=None, **kwargs):
+    """Remove the review from the course's rating counters"""
+    if isinstance(origin, Course) or getattr(origin, 'model', None) is Course:
+        # Deleted with its course: the course's catalog row goes too, and
+        # refreshing it would create it again
+        return
+    apply_rating_delta(instance.course_id, instance.rating, -1)
+    refresh_catalog_entries([instance.course_id])
+
+
+@receiver(post_save, sender=CourseEnrollment)
+@receiver(post_delete, sender=CourseEnrollment)
+def enrollment_changed(sender, instance, **kwargs):
+    """Drop the user's cached enrollment summary"""
+    invalidate_enrollment_summaries([instance.user_id])
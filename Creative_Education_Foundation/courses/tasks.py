@@ -0,0 +1,36 @@
+"""
+Background jobs of the courses app (see jobs.queue). The periodic ones are
+scheduled in settings.JOBS_PERIODIC and do what the management commands of
+the same names do.
+"""
+from jobs.queue import task
+
+from .catalog import refresh_catalog_entries
+from .ratings import reconcile_course_ratings
+from .recommendations import build_recommendations
+from .reminders import queue_due_reminders
+from .sessions import generate_sessions
+
+
+@task
+def send_class_reminders():
+    claimed, queued = queue_due_reminders()
+    return queued
+
+
+@task
+def generate_class_sessions():
+    return generate_sessions()
+
+
+@task
+def reconcile_ratings():
+    drifted = reconcile_course_ratings()
+    # Ranking weights may have changed too, so refresh every catalog row
+    refresh_catalog_entries()
+    return drifted
+
+
+@task
+def build_course_recommendations():
+    return build_recommendations()
@@ -0,0 +1,12 @@
+from django import template
+
+from courses.enrollment_cache import get_enrollment_summary
+
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def is_enrolled(context, course_id):
+    """Whether the current user has a completed enrollment in the course (cached, no query)"""
+    return get_enrollment_summary(context['request']).is_enrolled(course_id)
@@ -1,3 +1,769 @@
-from django.test import TestCase
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+import itertools
+import random
+from unittest.mock import patch
+import zoneinfo
+
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+import numpy as np
+
+from accounts.models import UserProfile
+from my_project.testing import GIF, URLQueryBudgetMixin
+from outbox.models import OutboxEmail
+from . import attendance
+from .catalog import catalog_entries, top_rated_entries
+from .conflicts import IntervalTree, ScheduleIndex, weekly_slots
+from .enrollment_cache import get_user_enrollment_summary
+from .forms import CourseAdminForm
+from .live_snapshot import BUCKETS, REBUILD_LOCK_KEY, get_live_snapshot, personalize
+from .models import (
+    ClassAttendance, ClassSession, Course, CourseCatalogEntry, CourseEnrollment, CoursePaymentLog, CourseReview,
+)
+from .pagination import KeysetPaginator, encode_cursor
+from .ratings import reconcile_course_ratings
+from .recommendations import build_recommendations, cosine_neighbours, related_courses
+from .reminders import queue_due_reminders
+from .search import highlight, rank_courses, search_courses, tokenize
+from .sessions import generate_sessions, joinable_session, next_session_starts
+from .timetable import Timetable, get_timetable
+from .urls import urlpatterns
+from .week_grid import IDLE, LIVE, STARTING_SOON, build_week_grid, parse_week
+
 
 # Create your tests here.
+
+class TimetableTests(TestCase):
+    def course(self, course_id, days, start, end=None, course_type='live'):
+        return Course(id=course_id, course_type=course_type, schedule_days=days, start_time=start, end_time=end)
+
+    def test_snapshot(self):
+        courses = [
+            self.course(1, ['monday', 'wednesday'], time(8), time(9)),
+            self.course(2, ['monday'], time(8, 35), time(9, 30)),
+            self.course(3, ['monday'], time(7)),
+            self.course(4, ['sunday'], time(10), time(11)),
+            self.course(5, ['monday'], time(8), time(9), course_type='recorded'),
+        ]
+        # A Monday, 08:30 (TIME_ZONE is UTC)
+        now = datetime(2025, 1, 6, 8, 30, tzinfo=dt_timezone.utc)
+        snapshot = Timetable(courses).at(now)
+        self.assertEqual(
+            [snapshot.status(course) for course in courses],
+            ['live_now', 'starting_soon', 'scheduled', 'scheduled', 'recorded'],
+        )
+        self.assertEqual(snapshot.today, {1, 2, 3})
+        self.assertEqual((snapshot.minutes_until_class(1), snapshot.minutes_until_class(2)), (None, 5))
+        self.assertEqual(snapshot.next_class(1), datetime(2025, 1, 8, 8, tzinfo=dt_timezone.utc))
+        self.assertEqual(snapshot.next_class(4), datetime(2025, 1, 12, 10, tzinfo=dt_timezone.utc))
+        # Course 1's 08:00 start is the last one before now
+        self.assertEqual(Timetable(courses).last_start_before(now), datetime(2025, 1, 6, 8, tzinfo=dt_timezone.utc))
+
+    def test_saving_a_course_rebuilds_the_timetable(self):
+        cache.clear()
+        compiled = get_timetable()
+        self.assertIs(get_timetable(), compiled)
+        course = Course.objects.create(
+            title='Physics', description='Description', price=1000, course_type='live',
+            schedule_days=['friday'], start_time=time(8), end_time=time(9),
+        )
+        self.assertIn(course.id, get_timetable())
+
+
+class LiveSnapshotTests(TestCase):
+    # A Monday, 08:30 (TIME_ZONE is UTC)
+    NOW = datetime(2025, 1, 6, 8, 30, tzinfo=dt_timezone.utc)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.courses = {
+            title: Course.objects.create(
+                title=title, description='Description', price=1000, course_type='live',
+                schedule_days=[day], start_time=start, end_time=end,
+            )
+            for title, day, start, end in [
+                ('Live', 'monday', time(8), time(9)),
+                ('Soon', 'monday', time(8, 35), time(9, 30)),
+                ('Evening', 'monday', time(18), time(19)),
+                ('Wednesday', 'wednesday', time(8), time(9)),
+            ]
+        }
+
+    def setUp(self):
+        cache.clear()
+
+    def titles(self, snapshot):
+        return {bucket: [course.title for course in snapshot[bucket]] for bucket in BUCKETS}
+
+    def test_buckets(self):
+        self.assertEqual(self.titles(get_live_snapshot(self.NOW)), {
+            'live_now': ['Live'],
+            'starting_soon': ['Soon'],
+            'today_classes': ['Evening'],
+            'upcoming_classes': ['Wednesday'],
+        })
+
+    def test_rebuilt_once_per_minute(self):
+        snapshot = get_live_snapshot(self.NOW)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_live_snapshot(self.NOW + timedelta(seconds=20))['built_at'], self.NOW)
+        self.assertEqual(get_live_snapshot(self.NOW + timedelta(minutes=1))['bucket'], snapshot['bucket'] + 1)
+
+    def test_previous_snapshot_served_during_a_rebuild(self):
+        snapshot = get_live_snapshot(self.NOW)
+        # Another worker is rebuilding
+        cache.add(REBUILD_LOCK_KEY, 0)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_live_snapshot(self.NOW + timedelta(minutes=1))['bucket'], snapshot['bucket'])
+        # Not once it's older than the previous minute's: that rebuild isn't coming
+        self.assertEqual(get_live_snapshot(self.NOW + timedelta(minutes=10))['bucket'], snapshot['bucket'] + 10)
+
+    def test_course_change_rebuilds(self):
+        get_live_snapshot(self.NOW)
+        course = self.courses['Wednesday']
+        course.schedule_days = ['monday']
+        course.save()
+        self.assertEqual(self.titles(get_live_snapshot(self.NOW))['live_now'], ['Live', 'Wednesday'])
+
+    def test_personalize_copies(self):
+        snapshot = get_live_snapshot(self.NOW)
+        buckets = personalize(snapshot, [self.courses['Live'].id])
+        self.assertTrue(buckets['live_now'][0].is_user_enrolled)
+        self.assertFalse(buckets['starting_soon'][0].is_user_enrolled)
+        self.assertFalse(hasattr(snapshot['live_now'][0], 'is_user_enrolled'))
+
+
+class EnrollmentSummaryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.student = User.objects.create_user('student', 'student@example.com', 'password')
+        cls.live, cls.recorded = [
+            Course.objects.create(title=title, description='Description', price=1000, course_type=course_type)
+            for title, course_type in [('Live', 'live'), ('Recorded', 'recorded')]
+        ]
+        cls.enrollment = CourseEnrollment.objects.create(
+            user=cls.student, course=cls.live, amount_paid=900, payment_status='completed',
+            access_expiry=timezone.now() + timedelta(days=30),
+        )
+        CourseEnrollment.objects.create(user=cls.student, course=cls.recorded, amount_paid=900)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_summary(self):
+        summary = get_user_enrollment_summary(self.student)
+        self.assertEqual(summary.completed_course_ids, {self.live.id})
+        self.assertTrue(summary.has_active_live_class_enrollment)
+        self.assertTrue(summary.has_access(self.live.id))
+        self.assertFalse(summary.has_access(self.recorded.id))
+        self.assertFalse(summary.has_access(self.live.id, now=timezone.now() + timedelta(days=31)))
+        # Cached: no query the second time
+        with self.assertNumQueries(0):
+            get_user_enrollment_summary(self.student)
+
+    def test_saving_an_enrollment_drops_the_summary(self):
+        get_user_enrollment_summary(self.student)
+        self.enrollment.is_active = False
+        self.enrollment.save()
+        self.assertFalse(get_user_enrollment_summary(self.student).has_access(self.live.id))
+
+    def test_filtered_bulk_update_drops_the_summary(self):
+        self.assertTrue(get_user_enrollment_summary(self.student).has_access(self.live.id))
+        # As the admin actions do it: the filter no longer matches the rows once updated
+        admin.site._registry[CourseEnrollment].update_enrollments(
+            CourseEnrollment.objects.filter(is_active=True), is_active=False,
+        )
+        self.assertFalse(get_user_enrollment_summary(self.student).has_access(self.live.id))
+
+    def test_only_the_students_courses_drop_the_summary(self):
+        get_user_enrollment_summary(self.student)
+        Course.objects.create(title='Other', description='Description', price=1000)
+        with self.assertNumQueries(0):
+            get_user_enrollment_summary(self.student)
+
+        self.live.is_active = False
+        self.live.save()
+        self.assertFalse(get_user_enrollment_summary(self.student).has_active_live_class_enrollment)
+
+
+class CatalogEntryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin_user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        cls.course = Course.objects.create(
+            title='Physics', description='Description', price=1000, discount_percentage=10,
+            schedule_days=['monday', 'wednesday'], start_time=time(8), end_time=time(9),
+        )
+
+    def test_entry_follows_the_course(self):
+        entry = CourseCatalogEntry.objects.get(course=self.course)
+        self.assertEqual((entry.title, entry.discounted_price), ('Physics', 900))
+        self.assertEqual(entry.schedule_summary, 'Mon, Wed · 08:00 AM - 09:00 AM')
+
+        self.course.title = 'Advanced Physics'
+        self.course.save()
+        self.assertEqual(CourseCatalogEntry.objects.get(course=self.course).title, 'Advanced Physics')
+        self.assertEqual(list(catalog_entries().values_list('course_id', flat=True)), [self.course.id])
+
+    def test_filtered_admin_deactivation_reaches_the_catalog(self):
+        self.client.force_login(self.admin_user)
+        # The changelist filter no longer matches the course once updated
+        self.client.post(reverse('admin:courses_course_changelist') + '?is_active__exact=1', {
+            'action': 'deactivate_courses', '_selected_action': [self.course.id],
+        })
+        self.assertFalse(CourseCatalogEntry.objects.get(course=self.course).is_active)
+        self.assertFalse(catalog_entries().exists())
+
+    def test_deleting_a_course_with_reviews(self):
+        enrollment = CourseEnrollment.objects.create(user=self.admin_user, course=self.course, amount_paid=900)
+        CourseReview.objects.create(course=self.course, user=self.admin_user, enrollment=enrollment, rating=4)
+        self.course.delete()
+        self.assertFalse(CourseCatalogEntry.objects.exists())
+
+
+@override_settings(COURSE_RATING_PRIOR_MEAN=3.5, COURSE_RATING_PRIOR_WEIGHT=5)
+class RatingCounterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.course, cls.other = [
+            Course.objects.create(title=title, description='Description', price=1000)
+            for title in ['Physics', 'Chemistry']
+        ]
+        cls.reviews = []
+        for number, rating in enumerate([5, 4, 4]):
+            user = User.objects.create(username=f'reviewer{number}')
+            enrollment = CourseEnrollment.objects.create(user=user, course=cls.course, amount_paid=900)
+            cls.reviews.append(
+                CourseReview.objects.create(course=cls.course, user=user, enrollment=enrollment, rating=rating)
+            )
+
+    def reload(self):
+        return Course.objects.get(id=self.course.id)
+
+    def test_counters_follow_the_reviews(self):
+        course = self.reload()
+        self.assertEqual((course.rating_count, course.rating_sum), (3, 13))
+        self.assertEqual(course.get_rating_histogram(), [0, 0, 0, 2, 1])
+        self.assertEqual(
+            (course.get_average_rating(), course.get_full_stars(), course.has_half_star()), (4.3, 4, False),
+        )
+
+        self.reviews[0].rating = 1
+        self.reviews[0].save()
+        self.reviews[1].delete()
+        course = self.reload()
+        self.assertEqual(course.get_rating_histogram(), [1, 0, 0, 1, 0])
+        self.assertEqual(course.get_average_rating(), 2.5)
+        self.assertTrue(course.has_half_star())
+
+    def test_saving_a_stale_course_keeps_the_counters(self):
+        stale = Course.objects.get(id=self.course.id)
+        self.reviews[2].delete()
+        stale.title = 'Advanced Physics'
+        stale.save()
+        self.assertEqual(self.reload().rating_count, 2)
+
+    def test_bayesian_rating(self):
+        # (5 * 3.5 + 13) / (5 + 3)
+        self.assertAlmostEqual(CourseCatalogEntry.objects.get(course=self.course).bayesian_rating, 3.8125)
+        self.assertEqual(CourseCatalogEntry.objects.get(course=self.other).bayesian_rating, 3.5)
+        self.assertEqual(list(top_rated_entries().values_list('course_id', flat=True)), [self.course.id, self.other.id])
+
+    def test_reconcile(self):
+        Course.objects.filter(id=self.course.id).update(rating_count=7, rating_5_count=0)
+        self.assertEqual(reconcile_course_ratings(), [self.course.id])
+        course = self.reload()
+        self.assertEqual((course.rating_count, course.get_rating_histogram()), (3, [0, 0, 0, 2, 1]))
+        self.assertEqual(reconcile_course_ratings(), [])
+
+    def test_deleting_courses_with_reviews(self):
+        with patch('courses.signals.apply_rating_delta') as apply_rating_delta:
+            Course.objects.filter(id=self.course.id).delete()
+        apply_rating_delta.assert_not_called()
+        self.assertFalse(CourseReview.objects.exists())
+
+
+class AdminChangelistQueryTests(TestCase):
+    """Changelists must run a fixed number of queries, however many rows they show"""
+    MAX_QUERIES = 12
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin_user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+
+    def setUp(self):
+        self.client.force_login(self.admin_user)
+
+    def add_rows(self, count):
+        start = Course.objects.count()
+        for i in range(start, start + count):
+            course = Course.objects.create(
+                title=f'Course {i}', description='Description', price=1000, discount_percentage=10,
+                schedule_days=['monday'], start_time=time(8), end_time=time(9),
+            )
+            user = User.objects.create(username=f'student{i}', email=f'student{i}@example.com')
+            UserProfile.objects.create(user=user, mobile_number='9800000000')
+            enrollment = CourseEnrollment.objects.create(
+                user=user, course=course, amount_paid=900, payment_status='completed',
+                access_expiry=timezone.now() + timedelta(days=30),
+            )
+            CourseReview.objects.create(course=course, user=user, enrollment=enrollment, rating=4)
+            CoursePaymentLog.objects.create(
+                enrollment=enrollment, transaction_id=f'TX{i}', amount=900,
+                payment_method='manual', status='completed',
+            )
+
+    def count_queries(self, url):
+        self.client.get(url)  # warm the per-user caches the admin header reads
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+    def assert_constant_queries(self, url_name):
+        url = reverse(url_name)
+        self.add_rows(2)
+        few = self.count_queries(url)
+        self.add_rows(20)
+        many = self.count_queries(url)
+        self.assertEqual(few, many, f'{url} runs queries per row')
+        self.assertLessEqual(many, self.MAX_QUERIES)
+
+    def test_course_changelist(self):
+        self.assert_constant_queries('admin:courses_course_changelist')
+
+    def test_enrollment_changelist(self):
+        self.assert_constant_queries('admin:courses_courseenrollment_changelist')
+
+    def test_payment_log_changelist(self):
+        self.assert_constant_queries('admin:courses_coursepaymentlog_changelist')
+
+    def test_review_changelist(self):
+        self.assert_constant_queries('admin:courses_coursereview_changelist')
+
+    def test_user_profile_changelist(self):
+        self.assert_constant_queries('admin:accounts_userprofile_changelist')
+
+    def test_annotated_columns_are_sortable(self):
+        self.add_rows(3)
+        for url_name, column in [
+            ('admin:courses_course_changelist', 6),
+            ('admin:courses_course_changelist', 7),
+            ('admin:courses_course_changelist', 8),
+            ('admin:accounts_userprofile_changelist', 3),
+        ]:
+            response = self.client.get(reverse(url_name), {'o': column})
+            self.assertEqual(response.status_code, 200)
+
+
+class RecommendationTests(TestCase):
+    def dense_neighbours(self, user_index, course_index, n_users, n_courses, top_k):
+        matrix = np.zeros((n_users, n_courses))
+        matrix[user_index, course_index] = 1
+        co_occurrence = matrix.T @ matrix
+        norms = np.sqrt(np.diag(co_occurrence))
+        similarity = co_occurrence / np.outer(norms, norms)
+        np.fill_diagonal(similarity, 0)
+        return [sorted((-row[other], other) for other in np.flatnonzero(row))[:top_k] for row in similarity]
+
+    def test_matches_dense_similarity(self):
+        rng = np.random.default_rng(3)
+        n_users, n_courses = 200, 30
+        user_index = rng.integers(0, n_users, size=600)
+        course_index = rng.integers(0, n_courses, size=600)
+        neighbours, scores = cosine_neighbours(user_index, course_index, n_users, n_courses, top_k=5, chunk_size=16)
+        for course, expected in enumerate(self.dense_neighbours(user_index, course_index, n_users, n_courses, 5)):
+            found = [(-score, other) for other, score in zip(neighbours[course], scores[course]) if other >= 0]
+            self.assertEqual([other for _, other in found], [other for _, other in expected])
+            np.testing.assert_allclose([score for score, _ in found], [score for score, _ in expected])
+
+    def test_build_and_related_courses(self):
+        physics, chemistry, biology, history = [
+            Course.objects.create(title=title, description='Description', price=1000)
+            for title in ['Physics', 'Chemistry', 'Biology', 'History']
+        ]
+        for number, courses in enumerate([[physics, chemistry], [physics, chemistry], [physics, biology], [history]]):
+            user = User.objects.create(username=f'student{number}')
+            for course in courses:
+                CourseEnrollment.objects.create(user=user, course=course, amount_paid=900, payment_status='completed')
+        self.assertEqual(build_recommendations(), 4)
+        self.assertEqual(
+            [entry.course_id for entry in related_courses(physics.id, limit=2)], [chemistry.id, biology.id],
+        )
+        # Nobody took History with anything else: top-rated courses instead
+        self.assertEqual(len(related_courses(history.id, limit=2)), 2)
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin_user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        cls.physics, cls.chemistry, cls.history = [
+            Course.objects.create(title=title, description=description, price=1000, instructor_name=instructor)
+            for title, description, instructor in [
+                ('Physics', 'Mechanics and waves, with a little chemistry.', 'Ram Thapa'),
+                ('Chemistry', 'Organic chemistry from the basics.', 'Sita Sharma'),
+                ('History of Nepal', 'From the Licchavi period to the republic.', 'Hari Karki'),
+            ]
+        ]
+
+    def ranked_ids(self, query, course_type=None):
+        return [course_id for course_id, _ in rank_courses(query, course_type)]
+
+    def test_tokenize(self):
+        self.assertEqual(tokenize('The Physics of Café-Music!'), ['physics', 'cafe', 'music'])
+
+    def test_title_matches_rank_first(self):
+        # Both mention chemistry; the title counts three times the description
+        self.assertEqual(self.ranked_ids('chemistry'), [self.chemistry.id, self.physics.id])
+        self.assertEqual(self.ranked_ids('sharma'), [self.chemistry.id])
+        # Each query term counts once, through its best index term
+        self.assertEqual(self.ranked_ids('chem'), [self.chemistry.id, self.physics.id])
+        self.assertEqual(self.ranked_ids('the of'), [])
+
+    def test_highlight(self):
+        self.assertEqual(highlight('Physics <b>waves</b>', ['wave']), 'Physics &lt;b&gt;<mark>waves</mark>&lt;/b&gt;')
+        page = search_courses('licchavi')
+        self.assertEqual([entry.course_id for entry in page.object_list], [self.history.id])
+        self.assertIn('<mark>Licchavi</mark>', page.object_list[0].snippet)
+
+    def test_index_follows_the_course(self):
+        self.history.title = 'Ancient History'
+        self.history.save()
+        self.assertEqual(self.ranked_ids('ancient'), [self.history.id])
+
+        self.client.force_login(self.admin_user)
+        # The changelist filter no longer matches the course once updated
+        self.client.post(reverse('admin:courses_course_changelist') + '?is_active__exact=1', {
+            'action': 'deactivate_courses', '_selected_action': [self.history.id],
+        })
+        self.assertEqual(self.ranked_ids('ancient'), [])
+
+
+@override_settings(MEDIA_ROOT='/tmp/test_media')
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for i in range(7):
+            Course.objects.create(
+                title=f'Course {i}', description='Description', price=1000,
+                image=SimpleUploadedFile('course.gif', GIF, content_type='image/gif'),
+            )
+        # Ties on created_at are broken by id
+        CourseCatalogEntry.objects.filter(course__title__in=['Course 2', 'Course 3', 'Course 4']).update(
+            created_at=timezone.now() - timedelta(days=1),
+        )
+        cls.expected = list(
+            CourseCatalogEntry.objects.order_by('-created_at', '-pk').values_list('course__title', flat=True)
+        )
+
+    def titles(self, page):
+        return [entry.title for entry in page]
+
+    def test_pages_forward_and_back(self):
+        paginator = KeysetPaginator(catalog_entries(), per_page=3)
+        first = paginator.page()
+        second = paginator.page(first.next_cursor)
+        third = paginator.page(second.next_cursor)
+        self.assertEqual(self.titles(first) + self.titles(second) + self.titles(third), self.expected)
+        self.assertEqual((first.has_previous, third.has_next, len(third)), (False, False, 1))
+        self.assertEqual(self.titles(paginator.page(third.previous_cursor)), self.titles(second))
+
+    def test_bad_cursors_show_the_first_page(self):
+        paginator = KeysetPaginator(catalog_entries(), per_page=3)
+        first = self.titles(paginator.page())
+        for value in ['abc', 3.5, None, [1], {'dt': 'x'}]:
+            with self.subTest(value=value):
+                cursor = encode_cursor(value, 1, 'next')
+                self.assertEqual(self.titles(paginator.page(cursor)), first)
+                self.assertEqual(self.client.get(reverse('online_classes'), {'cursor': cursor}).status_code, 200)
+        self.assertEqual(self.titles(paginator.page('not base64!')), first)
+        self.assertEqual(self.titles(paginator.page(encode_cursor(timezone.now(), 'x', 'next'))), first)
+
+
+class ClassSessionTests(TestCase):
+    def at(self, day, hour=0, minute=0):
+        return datetime(2025, 1, day, hour, minute, tzinfo=dt_timezone.utc)
+
+    @classmethod
+    def setUpTestData(cls):
+        # Saving generates sessions from today on: none in January 2025
+        cls.course = Course.objects.create(
+            title='Physics', description='Description', price=1000, course_type='live',
+            schedule_days=['monday', 'wednesday'], start_time=time(8), end_time=time(9),
+            class_start_date=date(2025, 1, 1), class_end_date=date(2025, 1, 19),
+        )
+
+    def starts(self):
+        return list(ClassSession.objects.values_list('starts_at', flat=True))
+
+    def test_generation_keeps_past_sessions(self):
+        self.assertEqual(generate_sessions(now=self.at(6)), (4, 0, 0))
+        self.assertEqual(self.starts(), [self.at(6, 8), self.at(8, 8), self.at(13, 8), self.at(15, 8)])
+        self.assertEqual(generate_sessions(now=self.at(6)), (0, 0, 0))
+
+        Course.objects.filter(id=self.course.id).update(schedule_days=['monday'], schedule_mask=1, end_time=time(10))
+        # Monday the 6th has started: kept as it was
+        self.assertEqual(generate_sessions([self.course.id], now=self.at(7)), (0, 1, 2))
+        self.assertEqual(self.starts(), [self.at(6, 8), self.at(13, 8)])
+        self.assertEqual(ClassSession.objects.get(starts_at=self.at(13, 8)).ends_at, self.at(13, 10))
+
+    def test_next_and_joinable_sessions(self):
+        generate_sessions(now=self.at(6))
+        self.assertEqual(next_session_starts([self.course.id], self.at(8, 8)), {self.course.id: self.at(13, 8)})
+        self.assertEqual(next_session_starts([self.course.id], self.at(15, 8)), {})
+        self.assertEqual(joinable_session(self.course.id, self.at(13, 7, 55)).starts_at, self.at(13, 8))
+        self.assertEqual(joinable_session(self.course.id, self.at(13, 9)).starts_at, self.at(13, 8))
+        self.assertIsNone(joinable_session(self.course.id, self.at(13, 7, 45)))
+        self.assertIsNone(joinable_session(self.course.id, self.at(13, 9, 1)))
+
+
+@override_settings(ATTENDANCE_BATCH_SIZE=3, ATTENDANCE_FLUSH_SECONDS=60)
+class AttendanceTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        course = Course.objects.create(title='Physics', description='Description', price=1000)
+        cls.session = ClassSession.objects.create(course=course, starts_at=timezone.now())
+        cls.users = [User.objects.create(username=f'student{number}') for number in range(3)]
+
+    def setUp(self):
+        self.addCleanup(attendance.flush)
+
+    def test_joins_written_in_one_batch(self):
+        first, second, third = self.users
+        attendance.record_join(self.session.id, first.id)
+        # Clicked twice: only the first join is kept
+        attendance.record_join(self.session.id, first.id, joined_at=timezone.now() + timedelta(minutes=1))
+        attendance.record_join(self.session.id, second.id)
+        self.assertFalse(ClassAttendance.objects.exists())
+        with self.assertNumQueries(1):
+            attendance.record_join(self.session.id, third.id)
+        self.assertEqual(ClassAttendance.objects.count(), 3)
+
+        # Already recorded by another process
+        attendance.record_join(self.session.id, first.id)
+        self.assertEqual(attendance.flush(), 1)
+        self.assertEqual(ClassAttendance.objects.count(), 3)
+
+
+class WeekGridTests(TestCase):
+    KATHMANDU = zoneinfo.ZoneInfo('Asia/Kathmandu')
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.student = User.objects.create_user('student', 'student@example.com', 'password')
+        cls.morning, cls.evening = [
+            Course.objects.create(
+                title=title, description='Description', price=1000, course_type='live',
+                schedule_days=days, start_time=start, end_time=end,
+            )
+            for title, days, start, end in [
+                ('Morning', ['monday'], time(8), time(9)),
+                ('Evening', ['sunday'], time(20), time(21)),
+            ]
+        ]
+        CourseEnrollment.objects.create(
+            user=cls.student, course=cls.morning, amount_paid=900, payment_status='completed',
+            access_expiry=timezone.now() + timedelta(days=30),
+        )
+
+    def build(self, now):
+        # Schedules in UTC, shown in Kathmandu (UTC+05:45)
+        return build_week_grid(
+            [self.morning, self.evening], date(2025, 1, 8), clock=lambda: now,
+            tz=self.KATHMANDU, schedule_tz=dt_timezone.utc,
+        )
+
+    def test_classes_move_to_the_viewers_time(self):
+        grid = self.build(datetime(2025, 1, 6, 8, 30, tzinfo=dt_timezone.utc))
+        self.assertEqual(grid.monday, date(2025, 1, 6))
+        self.assertEqual(grid.status_at(), {self.morning.id: LIVE, self.evening.id: IDLE})
+        self.assertEqual(
+            grid.status_at(datetime(2025, 1, 6, 7, 55, tzinfo=dt_timezone.utc))[self.morning.id], STARTING_SOON,
+        )
+        blocks = [(block['title'], block['day'], block['start_minute'], block['minutes']) for block in grid.blocks()]
+        self.assertEqual(blocks, [
+            # Sunday evening's class of the week before falls on Monday morning
+            ('Evening', date(2025, 1, 6), 1 * 60 + 45, 61),
+            ('Morning', date(2025, 1, 6), 13 * 60 + 45, 61),
+        ])
+
+    def test_out_of_range_weeks_show_the_current_week(self):
+        self.assertEqual(parse_week('2025-01-08'), date(2025, 1, 8))
+        self.client.force_login(self.student)
+        current = self.client.get(reverse('my_timetable')).context['monday']
+        for week in ['0001-01-01', '9999-12-31', '2025-13-01', '']:
+            with self.subTest(week=week):
+                self.assertIsNone(parse_week(week))
+                response = self.client.get(reverse('my_timetable'), {'week': week})
+                self.assertEqual((response.status_code, response.context['monday']), (200, current))
+
+
+class ScheduleConflictTests(TestCase):
+    def course(self, course_id, instructor, days, start, end, dates=(None, None)):
+        return Course(
+            id=course_id, title=f'Course {course_id}', course_type='live', is_active=True, instructor_name=instructor,
+            schedule_days=days, start_time=start, end_time=end, class_start_date=dates[0], class_end_date=dates[1],
+        )
+
+    def test_interval_tree_matches_brute_force(self):
+        rng = random.Random(7)
+        intervals = []
+        for value in range(300):
+            start = rng.randrange(10000)
+            intervals.append((start, start + rng.randrange(1, 500), value))
+        tree = IntervalTree(intervals)
+        for _ in range(200):
+            start = rng.randrange(10000)
+            end = start + rng.randrange(1, 300)
+            expected = sorted(value for first, last, value in intervals if first < end and last > start)
+            self.assertEqual(sorted(tree.overlapping(start, end)), expected)
+
+    def test_conflicts(self):
+        index = ScheduleIndex([
+            self.course(1, 'Ram Thapa', ['monday', 'wednesday'], time(8), time(9)),
+            self.course(2, 'ram  THAPA', ['wednesday'], time(8, 30), time(10)),
+            # Only touches course 1
+            self.course(3, 'Ram Thapa', ['monday'], time(9), time(10)),
+            self.course(4, 'Ram Thapa', ['monday'], time(8), time(9), dates=(date(2020, 1, 1), date(2020, 6, 30))),
+            self.course(5, 'Sita Sharma', ['monday'], time(8, 15), time(8, 45)),
+        ])
+        slots = weekly_slots(['monday'], time(8, 30), time(9, 30))
+        self.assertEqual(index.instructor_conflicts('Ram Thapa', slots), [1, 3, 4])
+        self.assertEqual(index.instructor_conflicts('Ram Thapa', slots, dates=(date(2025, 1, 1), None)), [1, 3])
+        self.assertEqual(index.instructor_conflicts('Hari Karki', slots), [])
+        self.assertEqual(index.course_conflicts(1, among=[2, 3, 4, 5]), [2, 4, 5])
+
+    def test_admin_form_refuses_double_booking(self):
+        Course.objects.create(
+            title='Physics', description='Description', price=1000, course_type='live', instructor_name='Ram Thapa',
+            schedule_days=['monday'], start_time=time(8), end_time=time(9),
+        )
+        data = {
+            'title': 'Chemistry', 'description': 'Description', 'price': 1000, 'discount_percentage': 0,
+            'course_type': 'live', 'instructor_name': 'Ram Thapa', 'schedule_days': ['monday'],
+            'start_time': '08:30', 'end_time': '09:30', 'is_active': True,
+        }
+        form = CourseAdminForm(data)
+        self.assertFalse(form.is_valid())
+        self.assertEqual(form.non_field_errors(), ['Ram Thapa already teaches "Physics" at an overlapping time.'])
+        # Starting as the other class ends
+        form = CourseAdminForm({**data, 'start_time': '09:00', 'end_time': '10:00'})
+        self.assertEqual(form.non_field_errors(), [])
+
+
+@override_settings(MEDIA_ROOT='/tmp/test_media', ATTENDANCE_BATCH_SIZE=1)
+class URLQueryBudgetTests(URLQueryBudgetMixin, TestCase):
+    """Every URL in courses/urls.py has a query budget, and no URL runs a query per row"""
+    urlpatterns = urlpatterns
+    BUDGETS = {
+        'courses': 3,
+        'online_class_extra1': 7,
+        'online_class_extra2': 7,
+        'online_class_extra3': 7,
+        'online_class_extra4': 7,
+        'course_detail': 5,
+        'enroll_now': 4,
+        'confirm_enrollment_payment': 2,
+        'enrollment_success': 5,
+        'current_live_classes': 6,
+        'my_timetable': 4,
+        'join_class': 5,
+        'all_courses': 3,
+        'online_classes': 6,
+        'online_class_extra': 0,
+        'submit_course_review': 5,
+        'delete_course_review': 2,
+    }
+    STATUS = {
+        'enroll_now': 302,  # already enrolled: sent to the profile
+        'confirm_enrollment_payment': 405,  # POST only
+        'join_class': 302,  # to the meeting link
+        'online_class_extra': 302,
+        'submit_course_review': 302,  # already reviewed: back to the course
+        'delete_course_review': 302,  # POST only
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('student', 'student@example.com', 'password')
+        UserProfile.objects.create(user=cls.user, mobile_number='9800000000')
+        # online_class_extra1..4 show the courses with ids 1 to 4
+        courses = [
+            Course.objects.create(
+                id=course_id, title=f'Course {course_id}', description='Description', price=1000,
+                schedule_days=['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday'],
+                start_time=time(0), end_time=time(23, 59), meeting_link='https://meet.example.com/class',
+                image=SimpleUploadedFile('course.gif', GIF, content_type='image/gif'),
+            )
+            for course_id in range(1, 6)
+        ]
+        for i, course in enumerate(courses):
+            for j in range(4):
+                user = cls.user if j == 0 else User.objects.create(username=f'reviewer{i}_{j}')
+                enrollment = CourseEnrollment.objects.create(
+                    user=user, course=course, amount_paid=900, payment_status='completed',
+                    access_expiry=timezone.now() + timedelta(days=30),
+                )
+                CourseReview.objects.create(course=course, user=user, enrollment=enrollment, rating=4)
+        pending = CourseEnrollment.objects.create(
+            user=cls.user, amount_paid=900,
+            course=Course.objects.create(
+                id=6, title='Course 6', description='Description', price=1000,
+                image=SimpleUploadedFile('course.gif', GIF, content_type='image/gif'),
+            ),
+        )
+        cls.url_kwargs = {'pk': courses[0].id, 'course_id': courses[1].id, 'enrollment_id': pending.id}
+
+
+class ClassReminderTests(TestCase):
+    # A Monday, 08:55 (TIME_ZONE is UTC)
+    NOW = datetime(2025, 1, 6, 8, 55, tzinfo=dt_timezone.utc)
+
+    @classmethod
+    def setUpTestData(cls):
+        course = Course.objects.create(
+            title='Physics', description='Description', price=1000, course_type='live',
+            schedule_days=['monday'], start_time=time(9), end_time=time(10), meeting_link='https://meet.example.com/1',
+        )
+        user = User.objects.create_user('student', 'student@example.com', 'password')
+        cls.enrollment = CourseEnrollment.objects.create(
+            user=user, course=course, amount_paid=900, payment_status='completed',
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_reminders_are_queued_once(self):
+        self.assertEqual(queue_due_reminders(self.NOW), (1, 1))
+        email = OutboxEmail.objects.get()
+        self.assertEqual(email.dedup_key, f'reminder:{self.enrollment.id}:2025-01-06')
+        self.assertEqual(email.to, ['student@example.com'])
+        self.assertIn('starts in 5 minutes', email.body)
+        self.assertEqual(queue_due_reminders(self.NOW), (0, 0))
+
+        # Claimed again the same day: the dedup key drops the second email
+        CourseEnrollment.objects.filter(id=self.enrollment.id).update(notified_10min=False)
+        queue_due_reminders(self.NOW)
+        self.assertEqual(OutboxEmail.objects.count(), 1)
+
+    def test_failed_run_leaves_reminders_unclaimed(self):
+        with patch('courses.reminders.queue_emails', side_effect=RuntimeError('database gone')):
+            with self.assertRaises(RuntimeError):
+                queue_due_reminders(self.NOW)
+        self.assertFalse(CourseEnrollment.objects.get(id=self.enrollment.id).notified_10min)
+        self.assertEqual(queue_due_reminders(self.NOW), (1, 1))
+
+    def test_one_instant_per_run(self):
+        # The clock moves on to the class start during the run
+        clock = itertools.chain([self.NOW], itertools.repeat(self.NOW + timedelta(minutes=5)))
+        with patch('django.utils.timezone.now', side_effect=clock):
+            self.assertEqual(queue_due_reminders(), (1, 1))
+        self.assertIn('starts in 5 minutes', OutboxEmail.objects.get().body)
@@ -0,0 +1,230 @@
+"""
+Compiled weekly timetable for live classes.
+
+Every live course's schedule (schedule_days + start_time/end_time) is compiled
+once into sorted minute-of-week interval arrays. Classifying all courses for a
+given instant ("live now", "starting soon", "later today", "upcoming") is then a
+single bisect over today's slice of the week at one frozen "now", instead of
+each course re-reading the clock and re-parsing its schedule.
+
+The compiled timetable is kept per process and rebuilt only after a Course is
+saved or deleted (see courses.signals), which bumps a version number in the
+cache so every worker notices the change. That takes a cache shared by all
+processes (REDIS_URL, see settings.CACHES).
+"""
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+import threading
+
+from django.core.cache import cache
+from django.utils import timezone
+
+
+MINUTES_PER_DAY = 24 * 60
+STARTING_SOON_MINUTES = 10
+
+DAYS_ORDER = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+DAY_INDEX = {day: index for index, day in enumerate(DAYS_ORDER)}
+
+VERSION_CACHE_KEY = 'courses:timetable:version'
+
+_lock = threading.Lock()
+_compiled = None
+
+
+# Course.schedule_mask: bit n set when the course meets on DAYS_ORDER[n]
+ALL_DAYS_MASK = (1 << len(DAYS_ORDER)) - 1
+# Every mask that includes a given day, so "meets on Wednesday" is an indexed
+# schedule_mask IN (...) lookup rather than a bitwise expression over every row
+DAY_MASKS = {
+    day: tuple(mask for mask in range(1, ALL_DAYS_MASK + 1) if mask & (1 << index))
+    for day, index in DAY_INDEX.items()
+}
+
+
+def schedule_mask(schedule_days):
+    """7-bit weekday mask of a schedule_days list; unknown day names are ignored"""
+    mask = 0
+    for day_name in schedule_days or ():
+        if day_name in DAY_INDEX:
+            mask |= 1 << DAY_INDEX[day_name]
+    return mask
+
+
+def minute_of_day(value):
+    """Whole minutes since midnight of a datetime.time, or None"""
+    if value is None:
+        return None
+    return value.hour * 60 + value.minute
+
+
+def time_to_minutes(value):
+    """Convert a datetime.time to (fractional) minutes since midnight"""
+    return value.hour * 60 + value.minute + value.second / 60 + value.microsecond / 60000000
+
+
+class Slot:
+    """One weekly occurrence of a course, in minutes since Monday 00:00"""
+    __slots__ = ('course_id', 'day', 'start', 'end')
+
+    def __init__(self, course_id, day, start, end):
+        self.course_id = course_id
+        self.day = day
+        self.start = start
+        self.end = end
+
+
+class Timetable:
+    """Sorted minute-of-week intervals for every scheduled live course"""
+
+    def __init__(self, courses, version=None):
+        self.version = version
+        courses = list(courses)
+        slots = []
+        for course in courses:
+            if course.course_type != 'live' or not course.start_time or not course.schedule_days:
+                continue
+            start = time_to_minutes(course.start_time)
+            # Without an end time a class is never "live", only "starting soon";
+            # an end before the start never matches either, same as is_live_now()
+            end = time_to_minutes(course.end_time) if course.end_time else -1
+            for day_name in course.schedule_days:
+                day = DAY_INDEX.get(day_name)
+                if day is None:
+                    continue
+                offset = day * MINUTES_PER_DAY
+                slots.append(Slot(course.id, day, offset + start, offset + end if end >= 0 else -1))
+
+        slots.sort(key=lambda slot: (slot.start, slot.course_id))
+        self.slots = slots
+        self.starts = [slot.start for slot in slots]
+        self.course_starts = {}
+        self.start_times = {}
+        for slot in slots:
+            self.course_starts.setdefault(slot.course_id, []).append(slot.start)
+        for course in courses:
+            if course.id in self.course_starts:
+                self.start_times[course.id] = course.start_time
+
+    def __contains__(self, course_id):
+        return course_id in self.course_starts
+
+    def at(self, now=None, soon_minutes=STARTING_SOON_MINUTES):
+        """Classify every course at a single frozen instant"""
+        return TimetableSnapshot(self, now, soon_minutes)
+
+    def last_start_before(self, now=None):
+        """
+        When the most recent class started (any course), as an aware datetime.
+        Every "next class" shown on a page stays the same until the next start.
+        """
+        if not self.starts:
+            return None
+        now = timezone.localtime(now or timezone.now())
+        minute = now.weekday() * MINUTES_PER_DAY + time_to_minutes(now.time())
+        index = bisect_right(self.starts, minute) - 1
+        start = self.starts[index] if index >= 0 else self.starts[-1] - 7 * MINUTES_PER_DAY
+        week_start = datetime.combine(now.date() - timedelta(days=now.weekday()), datetime.min.time())
+        return timezone.make_aware(week_start) + timedelta(minutes=start)
+
+
+class TimetableSnapshot:
+    """Status of every course in a Timetable at one instant"""
+
+    def __init__(self, timetable, now=None, soon_minutes=STARTING_SOON_MINUTES):
+        self.timetable = timetable
+        self.now = timezone.localtime(now or timezone.now())
+        self.weekday = self.now.weekday()
+        self.minute = self.weekday * MINUTES_PER_DAY + time_to_minutes(self.now.time())
+
+        self.live_now = set()
+        self.starting_soon = set()
+        self.today = set()
+        self.minutes_left = {}
+
+        # Only today's slots can be live, starting soon or "later today"
+        day_start = self.weekday * MINUTES_PER_DAY
+        lo = bisect_left(timetable.starts, day_start)
+        hi = bisect_left(timetable.starts, day_start + MINUTES_PER_DAY)
+        for slot in timetable.slots[lo:hi]:
+            course_id = slot.course_id
+            self.today.add(course_id)
+            until_start = slot.start - self.minute
+            if until_start > 0:
+                self.minutes_left[course_id] = int(until_start)
+            if slot.start <= self.minute <= slot.end:
+                self.live_now.add(course_id)
+            elif 0 <= until_start <= soon_minutes:
+                self.starting_soon.add(course_id)
+        self.starting_soon -= self.live_now
+
+    def status(self, course):
+        """Same values as Course.get_class_status()"""
+        if course.course_type != 'live':
+            return 'recorded'
+        if course.id in self.live_now:
+            return 'live_now'
+        if course.id in self.starting_soon:
+            return 'starting_soon'
+        return 'scheduled'
+
+    def is_today(self, course_id):
+        return course_id in self.today
+
+    def minutes_until_class(self, course_id):
+        """Minutes until the course starts today, or None (as Course.minutes_until_class)"""
+        return self.minutes_left.get(course_id)
+
+    def next_class(self, course_id):
+        """Next start strictly after now, as an aware datetime (as Course.get_next_class_datetime)"""
+        starts = self.timetable.course_starts.get(course_id)
+        if not starts:
+            return None
+        index = bisect_right(starts, self.minute)
+        wrapped = index == len(starts)
+        day = int(starts[0 if wrapped else index] // MINUTES_PER_DAY)
+        days_ahead = (day - self.weekday) % 7
+        if wrapped and days_ahead == 0:
+            days_ahead = 7
+        next_date = self.now.date() + timedelta(days=days_ahead)
+        return timezone.make_aware(datetime.combine(next_date, self.timetable.start_times[course_id]))
+
+
+def get_version():
+    version = cache.get(VERSION_CACHE_KEY)
+    if version is None:
+        cache.add(VERSION_CACHE_KEY, 1, timeout=None)
+        version = cache.get(VERSION_CACHE_KEY, 1)
+    return version
+
+
+def bump_version():
+    """Mark the compiled timetable stale in every process"""
+    try:
+        cache.incr(VERSION_CACHE_KEY)
+    except ValueError:
+        cache.set(VERSION_CACHE_KEY, 2, timeout=None)
+
+
+def get_timetable():
+    """Return the compiled timetable, rebuilding it only if a Course changed"""
+    global _compiled
+    version = get_version()
+    compiled = _compiled
+    if compiled is not None and compiled.version == version:
+        return compiled
+
+    with _lock:
+        if _compiled is not None and _compiled.version == version:
+            return _compiled
+        from .models import Course
+        courses = Course.objects.filter(course_type='live').scheduled().only(
+            'id', 'course_type', 'schedule_days', 'start_time', 'end_time'
+        )
+        _compiled = Timetable(courses, version=version)
+        return _compiled
+
+
+def snapshot(now=None):
+    """Shortcut for get_timetable().at(now)"""
+    return get_timetable().at(now)
@@ -1,6 +1,6 @@
 
 from django.urls import path
-from .views import CoursesView, OnlineClassExtraView1, OnlineClassExtraView2,OnlineClassExtraView3,OnlineClassExtraView4,   EnrollmentInitiateView, PaymentConfirmView, EnrollmentSuccessView, live_classes_view,  online_classes_view, course_detail, submit_course_review, delete_course_review, all_courses_view, CourseDetailView, online_class_extra_redirect
+from .views import CoursesView, OnlineClassExtraView1, OnlineClassExtraView2,OnlineClassExtraView3,OnlineClassExtraView4,   EnrollmentInitiateView, PaymentConfirmView, EnrollmentSuccessView, live_classes_view, my_timetable_view, join_class, online_classes_view, course_detail, submit_course_review, delete_course_review, all_courses_view, CourseDetailView, online_class_extra_redirect
 
 
 
@@ -21,6 +21,8 @@ urlpatterns = [
     
     
     path('live-classes/', live_classes_view, name='current_live_classes'),
+    path('live-classes/my-week/', my_timetable_view, name='my_timetable'),
+    path('live-classes/<int:course_id>/join/', join_class, name='join_class'),
     
     # All courses page (with filtering)
     path('courses/', all_courses_view, name='all_courses'),
@@ -14,15 +14,28 @@ from django.utils import timezone
 from django.contrib import messages
 from django.db.models import Q
 from .models import Course, CourseEnrollment
-from datetime import datetime
 
 from accounts.models import UserProfile
 from .models import Course, CourseEnrollment, CoursePaymentLog
-from django.db.models import Avg, Count
+from django.db.models import Avg, Count, Prefetch
 from django.shortcuts import get_object_or_404
 from django.views.generic import DetailView
 from .models import Course, CourseEnrollment
 from .models import CourseReview
+from . import timetable
+from .live_snapshot import get_live_snapshot, personalize
+from .enrollment_cache import get_enrollment_summary
+from .catalog import catalog_entries
+from .recommendations import related_courses
+from .search import search_courses
+from .pagination import paginate_keyset
+from .sessions import joinable_session
+from .attendance import record_join
+from .week_grid import get_week_timetable, parse_week, student_time_zone
+from .conflicts import get_schedule_index
+from pages.page_cache import page_cache
+from my_project import metrics
+from outbox.queue import queue_template_email
 from django.shortcuts import render
 from django.db.models import Avg, Count
 from .models import Course
@@ -36,46 +49,28 @@ class CoursesView(TemplateView):
     template_name = 'courses.html'
 
 
+@page_cache('courses', 'timetable')
 def online_classes_view(request):
     """
     Display all active courses (live, recorded, and hybrid) with ratings.
     Shows all courses from the courses section.
     """
-    # Get all active courses regardless of type
-    courses = Course.objects.filter(
-        is_active=True
-    ).annotate(
-        avg_rating=Avg('reviews__rating'),
-        total_reviews=Count('reviews')
-    ).order_by('-created_at')  # Most recent first
-    
-    # Add user enrollment info if authenticated
-    if request.user.is_authenticated:
-        from .models import CourseEnrollment
-        user_enrolled_ids = CourseEnrollment.objects.filter(
-            user=request.user,
-            payment_status='completed',
-            is_active=True
-        ).values_list('course_id', flat=True)
-        
-        # Add enrollment flag to each course
-        for course in courses:
-            course.is_user_enrolled = course.id in user_enrolled_ids
-    else:
-        for course in courses:
-            course.is_user_enrolled = False
+    # One page of active courses regardless of type, most recent first
+    courses = paginate_keyset(request, catalog_entries())
+    
+    # Add user enrollment info (cached per user, empty when anonymous)
+    user_enrolled_ids = get_enrollment_summary(request).active_course_ids
+    
+    # Add enrollment flag to each course
+    for course in courses:
+        course.is_user_enrolled = course.id in user_enrolled_ids
     
     context = {
         'courses': courses,
-        'total_courses': courses.count(),
     }
     
 
-    featured = (Course.objects
-        .filter(is_active=True,
-        course_type='live')
-        .annotate(avg_rating=Avg('reviews__rating'))
-        .order_by('-created_at')[:4])   # 4 live courses
+    featured = catalog_entries().filter(course_type='live')[:4]   # 4 live courses
 
     context['featured_courses'] = featured
     
@@ -151,13 +146,16 @@ def submit_course_review(request, course_id):
         messages.error(request, 'Please provide a valid rating (1-5 stars).')
         return redirect('course_detail', pk=course_id)
 
-    CourseReview.objects.create(
-        user=request.user,
-        course=course,
-        enrollment=enrollment,
-        rating=int(rating),
-        comment=comment
-    )
+    # The course's rating counters are updated in the same transaction
+    with transaction.atomic():
+        CourseReview.objects.create(
+            user=request.user,
+            course=course,
+            enrollment=enrollment,
+            rating=int(rating),
+            comment=comment
+        )
+    metrics.COURSE_REVIEWS.inc()
     messages.success(request, 'Thank you for your review!')
     return redirect('live_classes/onlineClass.html', pk=course_id)
 
@@ -167,13 +165,14 @@ def submit_course_review(request, course_id):
 def delete_course_review(request, course_id):
     """Delete user's review for a course"""
     if request.method != 'POST':
-        return redirect('course_detail', course_id=course_id)
+        return redirect('course_detail', pk=course_id)
     
     course = get_object_or_404(Course, id=course_id)
     
     try:
         review = CourseReview.objects.get(user=request.user, course=course)
-        review.delete()
+        with transaction.atomic():
+            review.delete()
         messages.success(request, 'Your review has been deleted.')
     except CourseReview.DoesNotExist:
         messages.error(request, 'Review not found.')
@@ -184,38 +183,32 @@ def delete_course_review(request, course_id):
     
 
 
+def course_with_reviews(course_id):
+    """The course with its reviews and their authors, for the reviews tab"""
+    return get_object_or_404(
+        Course.objects.prefetch_related(Prefetch('reviews', queryset=CourseReview.objects.select_related('user'))),
+        id=course_id,
+    )
+
+
 class OnlineClassExtraView1(DetailView):
     model = Course
     template_name = 'live_classes/onlineClass1.html'
     context_object_name = 'course'
 
     def get_object(self):
-        return get_object_or_404(Course, id=1)   # change as needed
+        return course_with_reviews(1)   # change as needed
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
 
         # existing enrolment checks
-        if self.request.user.is_authenticated:
-            enrollment = CourseEnrollment.objects.filter(
-                user=self.request.user,
-                course=self.object,
-                payment_status='completed'
-            ).first()
-            context['is_enrolled'] = enrollment is not None
-            context['enrollment'] = enrollment
-        else:
-            context['is_enrolled'] = False
-            context['enrollment'] = None
+        context['is_enrolled'] = get_enrollment_summary(self.request).is_enrolled(self.object.id)
 
         context['discounted_price'] = self.object.get_discounted_price()
 
-        # related courses with real average
-        from django.db.models import Avg
-        related = (Course.objects
-                        .filter(is_active=True)
-                        .annotate(avg_rating=Avg('reviews__rating'))
-                        .exclude(id=self.object.id))[:3]
+        # related courses: precomputed co-enrollment neighbours
+        related = related_courses(self.object.id)
         context['related_courses'] = related
 
         return context
@@ -226,28 +219,14 @@ class OnlineClassExtraView2(DetailView):
     context_object_name = 'course'
     
     def get_object(self):
-        return get_object_or_404(Course, id=2)  # Update this ID based on your database
+        return course_with_reviews(2)  # Update this ID based on your database
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        if self.request.user.is_authenticated:
-            enrollment = CourseEnrollment.objects.filter(
-                user=self.request.user,
-                course=self.object,
-                payment_status='completed'
-            ).first()
-            context['is_enrolled'] = enrollment is not None
-            context['enrollment'] = enrollment
-        else:
-            context['is_enrolled'] = False
-            context['enrollment'] = None
+        context['is_enrolled'] = get_enrollment_summary(self.request).is_enrolled(self.object.id)
         context['discounted_price'] = self.object.get_discounted_price()
         
-        from django.db.models import Avg
-        related = (Course.objects
-                        .filter(is_active=True)
-                        .annotate(avg_rating=Avg('reviews__rating'))
-                        .exclude(id=self.object.id))[:3]
+        related = related_courses(self.object.id)
         context['related_courses'] = related
         return context
 
@@ -257,59 +236,31 @@ class OnlineClassExtraView3(DetailView):
     context_object_name = 'course'
     
     def get_object(self):
-        return get_object_or_404(Course, id=3)  # Update this ID based on your database
+        return course_with_reviews(3)  # Update this ID based on your database
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        if self.request.user.is_authenticated:
-            enrollment = CourseEnrollment.objects.filter(
-                user=self.request.user,
-                course=self.object,
-                payment_status='completed'
-            ).first()
-            context['is_enrolled'] = enrollment is not None
-            context['enrollment'] = enrollment
-        else:
-            context['is_enrolled'] = False
-            context['enrollment'] = None
+        context['is_enrolled'] = get_enrollment_summary(self.request).is_enrolled(self.object.id)
         context['discounted_price'] = self.object.get_discounted_price()
         
-        from django.db.models import Avg
-        related = (Course.objects
-                        .filter(is_active=True)
-                        .annotate(avg_rating=Avg('reviews__rating'))
-                        .exclude(id=self.object.id))[:3]
+        related = related_courses(self.object.id)
         context['related_courses'] = related
         return context
 
 class OnlineClassExtraView4(DetailView):
     model = Course
-    template_name = 'live_classes/onlineClass4.html'
+    template_name = 'live_classes/onlineclass4.html'
     context_object_name = 'course'
     
     def get_object(self):
-        return get_object_or_404(Course, id=4)  # Update this ID based on your database
+        return course_with_reviews(4)  # Update this ID based on your database
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        if self.request.user.is_authenticated:
-            enrollment = CourseEnrollment.objects.filter(
-                user=self.request.user,
-                course=self.object,
-                payment_status='completed'
-            ).first()
-            context['is_enrolled'] = enrollment is not None
-            context['enrollment'] = enrollment
-        else:
-            context['is_enrolled'] = False
-            context['enrollment'] = None
+        context['is_enrolled'] = get_enrollment_summary(self.request).is_enrolled(self.object.id)
         context['discounted_price'] = self.object.get_discounted_price()
         
-        from django.db.models import Avg
-        related = (Course.objects
-                        .filter(is_active=True)
-                        .annotate(avg_rating=Avg('reviews__rating'))
-                        .exclude(id=self.object.id))[:3]
+        related = related_courses(self.object.id)
         context['related_courses'] = related
         
         return context
@@ -327,77 +278,31 @@ def live_classes_view(request):
     - Upcoming on scheduled days
     """
     now = timezone.localtime(timezone.now())
-    current_time = now.time()
-    current_day = now.strftime('%A').lower()
-    
-    # Get all active live classes
-    all_live_classes = Course.objects.filter(
-        is_active=True,
-        course_type='live'
-    ).order_by('start_time')
-    
-    # Categorize courses
-    live_now = []
-    starting_soon = []
-    today_classes = []
-    upcoming_classes = []
     
     # User's enrollments for notification purposes
-    user_enrolled_course_ids = []
-    if request.user.is_authenticated:
-        user_enrolled_course_ids = list(
-            CourseEnrollment.objects.filter(
-                user=request.user,
-                payment_status='completed',
-                is_active=True
-            ).values_list('course_id', flat=True)
-        )
-    
-    for course in all_live_classes:
-        # Skip if no schedule set
-        if not course.start_time or not course.schedule_days:
-            continue
-        
-        status = course.get_class_status()
-        
-        # Add enrollment info
-        course.is_user_enrolled = course.id in user_enrolled_course_ids
-        course.minutes_left = course.minutes_until_class()
-        
-        if status == 'live_now':
-            live_now.append(course)
-            # Send notification for enrolled users
-            if request.user.is_authenticated and course.is_user_enrolled:
-                messages.info(request, f'🔴 LIVE NOW: "{course.title}" is currently in session!')
-        
-        elif status == 'starting_soon':
-            starting_soon.append(course)
-            # Send 10-minute warning for enrolled users
-            if request.user.is_authenticated and course.is_user_enrolled:
-                minutes = course.minutes_left
-                if minutes:
-                    # Check if we should send notification
-                    try:
-                        enrollment = CourseEnrollment.objects.get(
-                            user=request.user,
-                            course=course
-                        )
-                        enrollment.reset_notification_if_new_day()
-                        
-                        if not enrollment.notified_10min:
-                            messages.warning(
-                                request,
-                                f'⏰ Starting Soon: "{course.title}" starts in {minutes} minutes!'
-                            )
-                            enrollment.notified_10min = True
-                            enrollment.save(update_fields=['notified_10min'])
-                    except CourseEnrollment.DoesNotExist:
-                        pass
-        
-        elif current_day in course.schedule_days:
-            today_classes.append(course)
-        else:
-            upcoming_classes.append(course)
+    user_enrolled_course_ids = get_enrollment_summary(request).active_course_ids
+    
+    # Buckets are shared by every visitor for the current minute
+    snapshot = get_live_snapshot(now)
+    buckets = personalize(snapshot, user_enrolled_course_ids)
+    live_now = buckets['live_now']
+    starting_soon = buckets['starting_soon']
+    today_classes = buckets['today_classes']
+    upcoming_classes = buckets['upcoming_classes']
+    
+    for course in live_now:
+        # Send notification for enrolled users
+        if course.is_user_enrolled:
+            messages.info(request, f'🔴 LIVE NOW: "{course.title}" is currently in session!')
+    
+    for course in starting_soon:
+        # Reminder emails go out from the class-reminders periodic job;
+        # the page only shows the banner and never writes
+        if course.is_user_enrolled and course.minutes_left:
+            messages.warning(
+                request,
+                f'⏰ Starting Soon: "{course.title}" starts in {course.minutes_left} minutes!'
+            )
     
     # Combine all courses in priority order
     courses = live_now + starting_soon + today_classes + upcoming_classes
@@ -414,6 +319,59 @@ def live_classes_view(request):
     return render(request, 'live_classes/current_live_classes.html', context)
 
 
+@login_required
+def my_timetable_view(request):
+    """The student's live classes for one week (?week=YYYY-MM-DD), in their time zone"""
+    now = timezone.now()
+    tz = student_time_zone()
+    week_of = parse_week(request.GET.get('week'))
+
+    summary = get_enrollment_summary(request)
+    week = get_week_timetable(request.user.id, summary.live_course_ids, week_of, clock=lambda: now, tz=tz)
+
+    # Only the "now" parts are worked out per request; the week itself is cached
+    live_now = [block for block in week['blocks'] if block['starts_at'] <= now < block['ends_at'] + timedelta(minutes=1)]
+    next_class = next((block for block in week['blocks'] if block['starts_at'] > now), None)
+    local_now = timezone.localtime(now, tz)
+    day_offset = (local_now.date() - week['monday']).days
+
+    context = {
+        'week_html': week['html'],
+        'monday': week['monday'],
+        'sunday': week['monday'] + timedelta(days=6),
+        'previous_week': week['monday'] - timedelta(days=7),
+        'next_week': week['monday'] + timedelta(days=7),
+        'live_now': live_now,
+        'next_class': next_class,
+        'current_time': local_now,
+        'now_day': day_offset if 0 <= day_offset < 7 else None,
+        'now_minute': local_now.hour * 60 + local_now.minute,
+        'time_zone': tz,
+    }
+    return render(request, 'live_classes/my_timetable.html', context)
+
+
+@login_required
+def join_class(request, course_id):
+    """Record the student's attendance of the current session, then send them to the meeting"""
+    course = get_object_or_404(
+        Course.objects.only('id', 'meeting_link'), id=course_id, is_active=True, course_type='live'
+    )
+    if not get_enrollment_summary(request).has_access(course.id):
+        messages.error(request, 'You need an active enrollment to join this class.')
+        return redirect('course_detail', pk=course.id)
+    if not course.meeting_link:
+        messages.info(request, 'The meeting link for this class has not been shared yet.')
+        return redirect('current_live_classes')
+
+    # Outside a session (too early, or already over) the link still works,
+    # there is just nothing to record
+    session = joinable_session(course.id)
+    if session is not None:
+        record_join(session.id, request.user.id)
+    return redirect(course.meeting_link)
+
+
 
 
 
@@ -442,7 +400,7 @@ def get_user_upcoming_classes(user):
     if not user.is_authenticated:
         return []
     
-    now = timezone.localtime(timezone.now())
+    schedule = timetable.snapshot()
     
     # Get user's enrolled courses
     enrolled_courses = Course.objects.filter(
@@ -455,19 +413,20 @@ def get_user_upcoming_classes(user):
     
     upcoming = []
     for course in enrolled_courses:
-        status = course.get_class_status()
+        status = schedule.status(course)
         if status in ['live_now', 'starting_soon']:
             upcoming.append({
                 'course': course,
                 'status': status,
-                'minutes_left': course.minutes_until_class(),
-                'next_class': course.get_next_class_datetime()
+                'minutes_left': schedule.minutes_until_class(course.id),
+                'next_class': schedule.next_class(course.id)
             })
     
     return sorted(upcoming, key=lambda x: x['minutes_left'] or 999)
 
 
 
+@method_decorator(page_cache('courses'), name='dispatch')
 class CourseDetailView(DetailView):
     """Display course details"""
     model = Course
@@ -477,16 +436,7 @@ class CourseDetailView(DetailView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         
-        # Check if user is already enrolled
-        if self.request.user.is_authenticated:
-            context['is_enrolled'] = CourseEnrollment.objects.filter(
-                user=self.request.user,
-                course=self.object,
-                payment_status='completed'
-            ).exists()
-        else:
-            context['is_enrolled'] = False
-        
+        # Enrollment state is a per-user fragment (course_enroll_box.html)
         context['discounted_price'] = self.object.get_discounted_price()
         return context
 
@@ -510,6 +460,16 @@ class EnrollmentInitiateView(View):
             messages.info(request, 'You are already enrolled in this course.')
             return redirect('profile')
         
+        # Clashing classes don't block the enrollment, the student is just told
+        clashing_ids = get_schedule_index().course_conflicts(
+            course.id, get_enrollment_summary(request).live_course_ids
+        )
+        if clashing_ids:
+            titles = ', '.join(
+                f'"{title}"' for title in Course.objects.filter(id__in=clashing_ids).values_list('title', flat=True)
+            )
+            messages.warning(request, f'⚠️ "{course.title}" clashes with your class {titles}.')
+        
         # Check for pending enrollment
         pending_enrollment = CourseEnrollment.objects.filter(
             user=request.user,
@@ -567,6 +527,15 @@ class PaymentConfirmView(View):
                 status='completed',
                 response_data={'note': 'Payment confirmed'}
             )
+            if request.user.email:
+                queue_template_email(
+                    request.user.email, f'Enrollment confirmed: {enrollment.course.title}', 'enrollment_confirmed',
+                    {'user': request.user, 'course': enrollment.course, 'enrollment': enrollment},
+                    dedup_key=f'enrollment-confirmed:{enrollment.id}',
+                )
+        
+        payment_methods = dict(CourseEnrollment.PAYMENT_METHOD_CHOICES)
+        metrics.ENROLLMENTS_CONFIRMED.labels(payment_method if payment_method in payment_methods else 'other').inc()
         
         messages.success(request, f'Successfully enrolled in {enrollment.course.title}!')
         return redirect('enrollment_success', enrollment_id=enrollment.id)
@@ -632,42 +601,36 @@ def all_courses_view(request):
     """
     course_type = request.GET.get('type', None)
     search_query = request.GET.get('q', None)
+    sort = request.GET.get('sort', None)
+    page_obj = None
     
-    courses = Course.objects.filter(is_active=True)
-    
-    # Filter by course type if specified
-    if course_type:
-        courses = courses.filter(course_type=course_type)
-    
-    # Search functionality
     if search_query:
-        courses = courses.filter(
-            Q(title__icontains=search_query) |
-            Q(description__icontains=search_query) |
-            Q(instructor_name__icontains=search_query)
-        )
+        # Ranked, paged results from the search index (best match first)
+        page_obj = search_courses(search_query, course_type, request.GET.get('page'))
+        courses = page_obj.object_list
+    else:
+        courses = catalog_entries()
+        
+        # Filter by course type if specified
+        if course_type:
+            courses = courses.filter(course_type=course_type)
+        
+        # One page, by Bayesian score for "top rated", newest first otherwise
+        courses = paginate_keyset(request, courses, 'bayesian_rating' if sort == 'top_rated' else 'created_at')
     
-    courses = courses.order_by('-created_at')
+    # Add user enrollment info (cached per user, empty when anonymous)
+    user_enrolled_ids = get_enrollment_summary(request).active_course_ids
     
-    # Add user enrollment info if authenticated
-    if request.user.is_authenticated:
-        user_enrolled_ids = CourseEnrollment.objects.filter(
-            user=request.user,
-            payment_status='completed',
-            is_active=True
-        ).values_list('course_id', flat=True)
-        
-        # Add enrollment flag to each course
-        for course in courses:
-            course.is_user_enrolled = course.id in user_enrolled_ids
-    else:
-        for course in courses:
-            course.is_user_enrolled = False
+    # Add enrollment flag to each course
+    for course in courses:
+        course.is_user_enrolled = course.id in user_enrolled_ids
     
     context = {
         'courses': courses,
         'course_type': course_type,
         'search_query': search_query,
+        'sort': sort,
+        'page_obj': page_obj,
     }
     
     return render(request, 'live_classes/onlineClass.html', context)
\ No newline at end of file
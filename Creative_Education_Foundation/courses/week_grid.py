@@ -0,0 +1,225 @@
+"""
+A student's week of live classes, evaluated over a minute grid with NumPy.
+
+Course.is_live_now() and friends answer for the current instant only. The
+week view instead needs the state of every course at every minute of a week,
+so build_week_grid() evaluates all of them at once: one row per course, one
+column per minute of the viewer's week (7 * 1440), filled with a handful of
+vectorized comparisons using the same rules as the Course methods (a class is
+live from start_time to end_time inclusive on its schedule_days, and
+"starting soon" up to STARTING_SOON_MINUTES before).
+
+Schedules are wall-clock times in the site's time zone (TIME_ZONE), while the
+grid is laid out in the viewer's zone (STUDENT_TIME_ZONE), so a class is
+shown at the right local time and may move to another day. Both the clock and
+the viewer's zone can be passed in.
+
+The rendered week is cached per user (get_week_timetable); the key includes
+the user's live courses and the timetable version, so it changes as soon as
+their enrollments or a course schedule change.
+"""
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+import hashlib
+import zoneinfo
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils import timezone
+import numpy as np
+
+from . import timetable
+
+
+MINUTES_PER_DAY = timetable.MINUTES_PER_DAY
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+EPOCH = date(1970, 1, 1)
+EPOCH_WEEKDAY = EPOCH.weekday()  # a Thursday
+
+# Grid cell states
+IDLE, STARTING_SOON, LIVE = 0, 1, 2
+
+# Weeks that can be shown: time zone shifts and the previous/next week links
+# of the first and last days datetime can represent overflow
+FIRST_DAY = date(2, 1, 1)
+LAST_DAY = date(9998, 12, 31)
+
+WEEK_CACHE_KEY = 'courses:week:{version}:{user_id}:{week}:{tz}:{courses}'
+WEEK_CACHE_TIMEOUT = 7 * 24 * 60 * 60
+
+
+def student_time_zone():
+    return zoneinfo.ZoneInfo(settings.STUDENT_TIME_ZONE)
+
+
+def parse_week(value):
+    """The date of a ?week=YYYY-MM-DD parameter, or None when it is missing, invalid or out of range"""
+    try:
+        day = datetime.strptime(value or '', '%Y-%m-%d').date()
+    except ValueError:
+        return None
+    return day if FIRST_DAY <= day <= LAST_DAY else None
+
+
+def week_start_for(day):
+    """Monday of the week containing day"""
+    return day - timedelta(days=day.weekday())
+
+
+def _schedule_wall_minutes(monday, tz, schedule_tz):
+    """
+    For each minute of the viewer's week starting at monday 00:00 (in tz),
+    the same instant as wall-clock minutes since the epoch in schedule_tz.
+    Offsets are looked up once per hour, which covers DST changes.
+    """
+    start = datetime.combine(monday, time.min)
+    shifts = []
+    for hour in range(7 * 24):
+        local = (start + timedelta(hours=hour)).replace(tzinfo=tz)
+        instant = local.astimezone(dt_timezone.utc)
+        shift = instant.astimezone(schedule_tz).utcoffset() - local.utcoffset()
+        shifts.append(shift.total_seconds() // 60)
+    shift_per_minute = np.repeat(np.array(shifts, dtype=np.int64), 60)
+    return (monday - EPOCH).days * MINUTES_PER_DAY + np.arange(MINUTES_PER_WEEK) + shift_per_minute
+
+
+class WeekGrid:
+    """State of every course at every minute of one week (rows follow courses)"""
+
+    def __init__(self, courses, monday, status, tz, now):
+        self.courses = courses
+        self.monday = monday
+        self.status = status
+        self.tz = tz
+        self.now = now
+
+    @property
+    def days(self):
+        return [self.monday + timedelta(days=offset) for offset in range(7)]
+
+    def minute_index(self, when):
+        """Grid column of an aware datetime, or None outside this week"""
+        local = timezone.localtime(when, self.tz)
+        offset = (local.date() - self.monday).days
+        if not 0 <= offset < 7:
+            return None
+        return offset * MINUTES_PER_DAY + local.hour * 60 + local.minute
+
+    def status_at(self, when=None):
+        """{course_id: IDLE/STARTING_SOON/LIVE} at an instant of this week"""
+        index = self.minute_index(when or self.now)
+        if index is None:
+            return {}
+        return {course.id: int(state) for course, state in zip(self.courses, self.status[:, index])}
+
+    def blocks(self):
+        """
+        Every live stretch as a dict (course, day, start/end minute of the
+        viewer's day, starts_at/ends_at), split at midnight, by start time
+        """
+        live = self.status == LIVE
+        padded = np.zeros((live.shape[0], MINUTES_PER_WEEK + 2), dtype=np.int8)
+        padded[:, 1:-1] = live
+        edges = np.diff(padded, axis=1)
+
+        blocks = []
+        for row, course in enumerate(self.courses):
+            starts = np.flatnonzero(edges[row] == 1)
+            ends = np.flatnonzero(edges[row] == -1)
+            for start, end in zip(starts, ends):
+                # Cut at midnight so every block stays within one day
+                for day_start in range(start - start % MINUTES_PER_DAY, end, MINUTES_PER_DAY):
+                    first = max(start, day_start)
+                    last = min(end, day_start + MINUTES_PER_DAY) - 1
+                    blocks.append(self._block(course, int(first), int(last)))
+        blocks.sort(key=lambda block: (block['starts_at'], block['course_id']))
+        return blocks
+
+    def _block(self, course, first, last):
+        day = self.monday + timedelta(days=first // MINUTES_PER_DAY)
+        start_minute = first % MINUTES_PER_DAY
+        end_minute = last % MINUTES_PER_DAY
+        return {
+            'course_id': course.id,
+            'title': course.title,
+            'instructor_name': course.instructor_name,
+            'day': day,
+            'start_minute': start_minute,
+            'end_minute': end_minute,
+            'minutes': last - first + 1,
+            'starts_at': datetime.combine(day, time(start_minute // 60, start_minute % 60), tzinfo=self.tz),
+            'ends_at': datetime.combine(day, time(end_minute // 60, end_minute % 60), tzinfo=self.tz),
+        }
+
+
+def build_week_grid(courses, week_of=None, clock=timezone.now, tz=None, schedule_tz=None,
+                    soon_minutes=timetable.STARTING_SOON_MINUTES):
+    """
+    Evaluate the courses over the week containing week_of (default: the
+    current week in tz). clock() supplies "now"; tz is the viewer's zone
+    (default STUDENT_TIME_ZONE), schedule_tz the zone the schedules are in
+    (default: the current Django time zone).
+    """
+    tz = tz or student_time_zone()
+    schedule_tz = schedule_tz or timezone.get_current_timezone()
+    now = clock()
+    monday = week_start_for(week_of or timezone.localtime(now, tz).date())
+    courses = list(courses)
+
+    wall = _schedule_wall_minutes(monday, tz, schedule_tz)
+    weekday = (wall // MINUTES_PER_DAY + EPOCH_WEEKDAY) % 7
+    minute = (wall % MINUTES_PER_DAY).astype(np.float64)
+
+    masks, starts, ends = [], [], []
+    for course in courses:
+        scheduled = course.course_type == 'live' and course.start_time
+        masks.append(timetable.schedule_mask(course.schedule_days) if scheduled else 0)
+        starts.append(timetable.time_to_minutes(course.start_time) if scheduled else 0.0)
+        # Without an end time a class is never live, only starting soon
+        ends.append(timetable.time_to_minutes(course.end_time) if scheduled and course.end_time else -1.0)
+    masks = np.array(masks, dtype=np.int64).reshape(-1, 1)
+    starts = np.array(starts).reshape(-1, 1)
+    ends = np.array(ends).reshape(-1, 1)
+
+    on_day = (masks >> weekday) & 1 == 1
+    live = on_day & (starts <= minute) & (minute <= ends)
+    until_start = starts - minute
+    soon = on_day & ~live & (until_start >= 0) & (until_start <= soon_minutes)
+    status = np.where(live, LIVE, np.where(soon, STARTING_SOON, IDLE)).astype(np.int8)
+    return WeekGrid(courses, monday, status, tz, now)
+
+
+def get_week_timetable(user_id, course_ids, week_of=None, clock=timezone.now, tz=None):
+    """
+    The user's week as {'html', 'blocks', 'monday'}, rendered once and cached
+    until their live courses (or any course schedule) change
+    """
+    from .models import Course
+
+    tz = tz or student_time_zone()
+    monday = week_start_for(week_of or timezone.localtime(clock(), tz).date())
+    key = WEEK_CACHE_KEY.format(
+        version=timetable.get_version(),
+        user_id=user_id,
+        week=monday.isoformat(),
+        tz=str(tz),
+        courses=hashlib.md5(','.join(map(str, sorted(course_ids))).encode()).hexdigest(),
+    )
+    week = cache.get(key)
+    if week is None:
+        courses = Course.objects.filter(id__in=course_ids).only(
+            'id', 'title', 'instructor_name', 'course_type', 'schedule_days', 'start_time', 'end_time',
+        )
+        grid = build_week_grid(courses, monday, clock=clock, tz=tz)
+        blocks = grid.blocks()
+        days = [
+            {'date': day, 'blocks': [block for block in blocks if block['day'] == day]}
+            for day in grid.days
+        ]
+        week = {
+            'html': render_to_string('live_classes/week_grid.html', {'days': days, 'tz': tz}),
+            'blocks': blocks,
+            'monday': monday,
+        }
+        cache.set(key, week, timeout=WEEK_CACHE_TIMEOUT)
+    return week
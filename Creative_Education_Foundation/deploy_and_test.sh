@@ -36,10 +36,19 @@ fi
 echo "💾 2. Deploying Application Layers..."
 kubectl apply -f k8s/config-secrets.yaml
 kubectl apply -f k8s/mysql.yaml
+# The cache shared by the web pods and the workers
+kubectl apply -f k8s/redis.yaml
 kubectl apply -f k8s/django.yaml
+kubectl apply -f k8s/django-servicemonitor.yaml
+# Background jobs and the periodic ones (class reminders, sessions, ratings, recommendations)
+kubectl apply -f k8s/jobs-worker.yaml
+# Sends the queued emails (welcome, enrollment, application, reminders)
+kubectl apply -f k8s/outbox-sender.yaml
 
 # Force update to pull new image
 kubectl rollout restart deployment/django-deployment
+kubectl rollout restart deployment/jobs-worker
+kubectl rollout restart deployment/outbox-sender
 
 # --- STEP 3: LOAD TESTING ---
 echo "🧪 3. Running k6 Load Test..."
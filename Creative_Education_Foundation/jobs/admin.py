@@ -0,0 +1,73 @@
+from django.contrib import admin
+from django.utils import timezone
+from django.utils.html import format_html
+
+from .models import DeadJob, Job, PeriodicJob
+from .queue import retry_jobs
+
+
+class JobAdminMixin:
+    list_display = ['id', 'task', 'queue', 'status', 'priority', 'attempts_display', 'run_at', 'finished_at', 'locked_by']
+    search_fields = ['task', 'last_error']
+    readonly_fields = [
+        'task', 'args', 'kwargs', 'queue', 'status', 'attempts', 'locked_by', 'locked_at',
+        'periodic', 'created_at', 'finished_at', 'error_display',
+    ]
+    fields = [
+        'task', ('args', 'kwargs'), ('queue', 'priority', 'status'), ('run_at', 'attempts', 'max_attempts'),
+        ('locked_by', 'locked_at'), 'periodic', ('created_at', 'finished_at'), 'error_display',
+    ]
+    date_hierarchy = 'created_at'
+    actions = ['retry_selected']
+
+    def attempts_display(self, obj):
+        return f'{obj.attempts}/{obj.max_attempts}'
+    attempts_display.short_description = 'Attempts'
+
+    def error_display(self, obj):
+        return format_html('<pre style="white-space: pre-wrap">{}</pre>', obj.last_error) if obj.last_error else '-'
+    error_display.short_description = 'Last error'
+
+    def has_add_permission(self, request):
+        # Jobs come from enqueue()
+        return False
+
+    def retry_selected(self, request, queryset):
+        retried = retry_jobs(queryset)
+        self.message_user(request, f'{retried} job(s) queued again.')
+    retry_selected.short_description = 'Retry selected jobs'
+
+
+@admin.register(Job)
+class JobAdmin(JobAdminMixin, admin.ModelAdmin):
+    list_filter = ['status', 'queue', 'created_at']
+
+
+@admin.register(DeadJob)
+class DeadJobAdmin(JobAdminMixin, admin.ModelAdmin):
+    """Dead letters: jobs out of attempts, to retry or delete once the cause is fixed"""
+    list_display = ['id', 'task', 'queue', 'attempts_display', 'finished_at', 'error_summary']
+    list_filter = ['queue', 'task']
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).filter(status='dead')
+
+    def error_summary(self, obj):
+        # The last line of the traceback names the exception
+        lines = obj.last_error.strip().splitlines()
+        return lines[-1][:120] if lines else '-'
+    error_summary.short_description = 'Error'
+
+
+@admin.register(PeriodicJob)
+class PeriodicJobAdmin(admin.ModelAdmin):
+    list_display = ['name', 'task', 'cron', 'queue', 'is_active', 'next_run_at', 'last_enqueued_at']
+    list_filter = ['is_active', 'queue']
+    search_fields = ['name', 'task']
+    readonly_fields = ['last_enqueued_at']
+    actions = ['run_now']
+
+    def run_now(self, request, queryset):
+        updated = queryset.update(next_run_at=timezone.now())
+        self.message_user(request, f'{updated} periodic job(s) will be enqueued by the next worker pass.')
+    run_now.short_description = 'Run selected jobs now'
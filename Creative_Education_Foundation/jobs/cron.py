@@ -0,0 +1,90 @@
+"""
+Cron expressions for periodic jobs: the classic five fields
+"minute hour day-of-month month day-of-week" with *, lists (1,15), ranges
+(1-5), steps (*/10, 8-18/2) and the @hourly/@daily/@weekly/@monthly/@yearly
+shortcuts. Day of week counts from Sunday = 0 (7 is Sunday too), and as in
+cron, a day matches either day field when both are restricted. Times are in
+the project time zone.
+"""
+from datetime import datetime, timedelta
+
+from django.utils import timezone
+
+
+SHORTCUTS = {
+    '@yearly': '0 0 1 1 *',
+    '@annually': '0 0 1 1 *',
+    '@monthly': '0 0 1 * *',
+    '@weekly': '0 0 * * 0',
+    '@daily': '0 0 * * *',
+    '@midnight': '0 0 * * *',
+    '@hourly': '0 * * * *',
+}
+FIELD_RANGES = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+# Give up on expressions that never match, e.g. "0 0 31 2 *"
+SEARCH_YEARS = 5
+
+
+def _parse_field(text, low, high):
+    values = set()
+    for part in text.split(','):
+        expression, _, step = part.partition('/')
+        step = int(step) if step else 1
+        if expression == '*':
+            start, end = low, high
+        elif '-' in expression:
+            start, end = (int(value) for value in expression.split('-', 1))
+        else:
+            start = end = int(expression)
+            if step > 1:
+                # "5/15" means from 5 to the end, every 15
+                end = high
+        if not low <= start <= end <= high or step < 1:
+            raise ValueError(f'{part!r} is outside {low}-{high}')
+        values.update(range(start, end + 1, step))
+    return values
+
+
+class CronSchedule:
+    def __init__(self, expression):
+        self.expression = expression
+        fields = SHORTCUTS.get(expression.strip(), expression).split()
+        if len(fields) != 5:
+            raise ValueError(f'{expression!r}: expected 5 fields, got {len(fields)}')
+        try:
+            self.minutes, self.hours, self.days, self.months, weekdays = (
+                _parse_field(field, low, high) for field, (low, high) in zip(fields, FIELD_RANGES)
+            )
+        except ValueError as exc:
+            raise ValueError(f'{expression!r}: {exc}') from None
+        self.weekdays = {day % 7 for day in weekdays}
+        self.any_day = fields[2] == '*'
+        self.any_weekday = fields[4] == '*'
+
+    def __str__(self):
+        return self.expression
+
+    def matches_day(self, moment):
+        in_days = moment.day in self.days
+        # datetime counts from Monday = 0, cron from Sunday = 0
+        in_weekdays = (moment.weekday() + 1) % 7 in self.weekdays
+        if self.any_day or self.any_weekday:
+            return in_days and in_weekdays
+        return in_days or in_weekdays
+
+    def next_after(self, moment):
+        """The first matching minute strictly after `moment` (an aware datetime)"""
+        local = timezone.localtime(moment).replace(tzinfo=None, second=0, microsecond=0) + timedelta(minutes=1)
+        limit = local + timedelta(days=366 * SEARCH_YEARS)
+        while local < limit:
+            if local.month not in self.months:
+                local = datetime(local.year + local.month // 12, local.month % 12 + 1, 1)
+            elif not self.matches_day(local):
+                local = datetime(local.year, local.month, local.day) + timedelta(days=1)
+            elif local.hour not in self.hours:
+                local = local.replace(minute=0) + timedelta(hours=1)
+            elif local.minute not in self.minutes:
+                local += timedelta(minutes=1)
+            else:
+                return timezone.make_aware(local)
+        raise ValueError(f'{self.expression!r} never matches')
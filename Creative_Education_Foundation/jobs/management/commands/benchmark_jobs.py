@@ -0,0 +1,77 @@
+import os
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+
+from jobs.models import Job
+from jobs.queue import enqueue, task
+from jobs.worker import Worker
+
+
+@task
+def benchmark_job(sleep):
+    # Stands in for a task waiting on SMTP or an API
+    if sleep:
+        time.sleep(sleep)
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure queue throughput in jobs per second per worker: enqueue no-op jobs on a private queue and '
+        'drain it with workers of each --concurrency. Workers need their own connections, so this runs '
+        'against the real database (rows are deleted afterwards), best against MySQL like production.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--jobs', type=int, default=2000, help='Jobs per measurement')
+        parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 8], help='Threads per worker')
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Workers draining the queue side by side, to measure claim contention')
+        parser.add_argument('--work-ms', type=float, default=0, help='Milliseconds each job sleeps')
+
+    def handle(self, *args, **options):
+        queue = f'benchmark-{os.getpid()}'
+        sleep = options['work_ms'] / 1000
+        try:
+            for concurrency in options['concurrency']:
+                started = time.perf_counter()
+                Job.objects.bulk_create(
+                    Job(task=benchmark_job.task_name, args=[sleep], queue=queue) for _ in range(options['jobs'])
+                )
+                enqueue_rate = options['jobs'] / (time.perf_counter() - started)
+                self.measure(queue, concurrency, options['workers'], options['jobs'], enqueue_rate)
+
+            # One by one, the way requests enqueue
+            started = time.perf_counter()
+            for _ in range(min(options['jobs'], 500)):
+                enqueue(benchmark_job, args=[0], queue=queue)
+            self.stdout.write(
+                f'enqueue(): {min(options["jobs"], 500) / (time.perf_counter() - started):.0f} jobs/s'
+            )
+        finally:
+            Job.objects.filter(queue=queue).delete()
+
+    def measure(self, queue, concurrency, workers, jobs, enqueue_rate):
+        pool = [
+            Worker(queues=[queue], concurrency=concurrency, poll_interval=0.05, name=f'benchmark-{number}', periodic=False)
+            for number in range(workers)
+        ]
+        threads = [threading.Thread(target=worker.run, kwargs={'until_idle': True}) for worker in pool]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        processed = sum(worker.processed for worker in pool)
+        done = Job.objects.filter(queue=queue, status='done').count()
+        self.stdout.write(
+            f'{workers} worker(s) x {concurrency} thread(s): {processed} jobs in {elapsed:.2f}s, '
+            f'{processed / elapsed / workers:.0f} jobs/s per worker '
+            f'({processed / elapsed:.0f} total, bulk enqueue {enqueue_rate:.0f}/s)'
+        )
+        if done != jobs:
+            self.stdout.write(self.style.WARNING(f'{done} of {jobs} jobs done, expected all'))
+        Job.objects.filter(queue=queue).delete()
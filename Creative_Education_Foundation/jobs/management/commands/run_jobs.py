@@ -0,0 +1,56 @@
+import signal
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand, CommandError
+
+from jobs.queue import sync_periodic_jobs
+from jobs.worker import Worker
+
+
+class Command(BaseCommand):
+    help = (
+        'Run background jobs from the database queue with a pool of threads, and enqueue the periodic jobs '
+        '(settings.JOBS_PERIODIC). Run as many workers as needed; SIGTERM finishes the running jobs and exits.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--queue', dest='queues', action='append',
+                            help='Queue to work on, repeat for several (default: default)')
+        parser.add_argument('--concurrency', type=int, default=settings.JOBS_CONCURRENCY,
+                            help='Jobs run at the same time')
+        parser.add_argument('--poll-interval', type=float, default=settings.JOBS_POLL_INTERVAL,
+                            help='Seconds between looks at an empty queue')
+        parser.add_argument('--until-idle', action='store_true', help='Exit once the queue is empty')
+        parser.add_argument('--max-jobs', type=int, help='Exit after this many jobs')
+        parser.add_argument('--no-periodic', action='store_true', help="Don't enqueue periodic jobs")
+        parser.add_argument('--local-cache', action='store_true',
+                            help='Run even though the cache is local to this process')
+
+    def handle(self, *args, **options):
+        if isinstance(caches['default'], LocMemCache) and not options['local_cache']:
+            # What the jobs invalidate would stay cached in the web processes
+            raise CommandError(
+                'The cache is local to each process: set REDIS_URL so the jobs can invalidate what the web '
+                'processes cached, or pass --local-cache.'
+            )
+        periodic = not options['no_periodic']
+        if periodic:
+            sync_periodic_jobs()
+
+        worker = Worker(
+            queues=options['queues'] or ['default'],
+            concurrency=options['concurrency'],
+            poll_interval=options['poll_interval'],
+            periodic=periodic,
+        )
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, lambda *_: worker.stop())
+
+        self.stdout.write(
+            f'Worker {worker.name}: {worker.concurrency} thread(s) on {", ".join(worker.queues)}'
+        )
+        processed = worker.run(until_idle=options['until_idle'], max_jobs=options['max_jobs'])
+        outcomes = ', '.join(f'{count} {status}' for status, count in sorted(worker.outcomes.items()))
+        self.stdout.write(self.style.SUCCESS(f'Ran {processed} job(s){f": {outcomes}" if outcomes else ""}.'))
@@ -0,0 +1,79 @@
+from django.core.exceptions import ValidationError
+from django.db import models
+from django.utils import timezone
+
+from .cron import CronSchedule
+
+
+class PeriodicJob(models.Model):
+    """A task enqueued on a cron schedule; synced from settings.JOBS_PERIODIC when a worker starts"""
+    name = models.CharField(max_length=100, unique=True)
+    task = models.CharField(max_length=200)
+    cron = models.CharField(max_length=100, help_text='minute hour day-of-month month day-of-week, e.g. "30 2 * * *"')
+    args = models.JSONField(default=list, blank=True)
+    kwargs = models.JSONField(default=dict, blank=True)
+    queue = models.CharField(max_length=50, default='default')
+    is_active = models.BooleanField(default=True)
+    next_run_at = models.DateTimeField(default=timezone.now, db_index=True)
+    last_enqueued_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ['name']
+
+    def __str__(self):
+        return f"{self.name} ({self.cron})"
+
+    def clean(self):
+        try:
+            CronSchedule(self.cron)
+        except ValueError as exc:
+            raise ValidationError({'cron': str(exc)})
+
+    def schedule_next(self, now=None):
+        self.next_run_at = CronSchedule(self.cron).next_after(now or timezone.now())
+
+
+class Job(models.Model):
+    """One call of a registered task, run by the run_jobs workers"""
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        # Out of attempts, or the task doesn't exist: kept for inspection in the admin
+        ('dead', 'Dead'),
+    ]
+
+    task = models.CharField(max_length=200)
+    args = models.JSONField(default=list, blank=True)
+    kwargs = models.JSONField(default=dict, blank=True)
+    queue = models.CharField(max_length=50, default='default')
+    # Higher runs first
+    priority = models.SmallIntegerField(default=0)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    run_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    last_error = models.TextField(blank=True)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(blank=True, null=True)
+    periodic = models.ForeignKey(PeriodicJob, on_delete=models.SET_NULL, blank=True, null=True, related_name='jobs')
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ['-id']
+        indexes = [
+            # What workers claim: status='queued' AND queue IN (...) AND run_at <= now
+            models.Index(fields=['status', 'queue', 'run_at'], name='job_claim_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.task} #{self.pk} ({self.status})"
+
+
+class DeadJob(Job):
+    """Dead-letter view of Job for the admin"""
+
+    class Meta:
+        proxy = True
+        verbose_name = 'dead job'
@@ -0,0 +1,206 @@
+"""
+A job queue in the project database, for side effects that shouldn't run
+inside a request and for periodic work.
+
+Tasks are plain functions registered with @task in an app's tasks.py:
+
+    @task(max_attempts=3)
+    def log_payment(enrollment_id, note):
+        ...
+
+    log_payment.enqueue(enrollment.id, 'Payment confirmed')
+    enqueue(log_payment, args=[enrollment.id, 'Later'], delay=timedelta(minutes=5))
+
+Arguments are stored as JSON, so pass ids rather than model instances.
+enqueue() is a plain INSERT in the caller's transaction: a job enqueued in
+an atomic block exists exactly when the block commits.
+
+Workers (manage.py run_jobs) claim due jobs with SELECT ... FOR UPDATE SKIP
+LOCKED, so any number of them share a queue without handing out a job
+twice. A failing job is retried with exponential backoff until max_attempts,
+then marked dead and kept for the dead-letter list in the admin. A worker
+that dies leaves its jobs running; after JOBS_LEASE seconds they are queued
+again. Periodic jobs (settings.JOBS_PERIODIC) are enqueued by whichever
+worker gets to them first, at most one pending run each.
+"""
+from datetime import timedelta
+import logging
+import random
+import traceback
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job, PeriodicJob
+
+
+logger = logging.getLogger(__name__)
+
+_registry = {}
+
+
+def task_name(func):
+    return f'{func.__module__}.{func.__qualname__}'
+
+
+def task(func=None, *, max_attempts=None, queue='default'):
+    """Register a function as a task; adds func.enqueue(*args, **kwargs)"""
+    def register(func):
+        func.task_name = task_name(func)
+        func.max_attempts = max_attempts
+        func.queue = queue
+        func.enqueue = lambda *args, **kwargs: enqueue(func, args=args, kwargs=kwargs)
+        _registry[func.task_name] = func
+        return func
+    return register(func) if func is not None else register
+
+
+def get_task(name):
+    """The registered task called `name`; LookupError when there's none"""
+    if name not in _registry:
+        raise LookupError(f'No task registered as {name!r}')
+    return _registry[name]
+
+
+def enqueue(func, args=(), kwargs=None, delay=None, run_at=None, priority=0, queue=None, max_attempts=None):
+    """Store a call of a task (or a task name) to run now, after `delay` or at `run_at`"""
+    func = get_task(func) if isinstance(func, str) else func
+    if run_at is None:
+        run_at = timezone.now() + (delay or timedelta())
+    return Job.objects.create(
+        task=func.task_name,
+        args=list(args),
+        kwargs=kwargs or {},
+        queue=queue or func.queue,
+        priority=priority,
+        run_at=run_at,
+        max_attempts=max_attempts or func.max_attempts or settings.JOBS_MAX_ATTEMPTS,
+    )
+
+
+def skip_locked(queryset):
+    if connection.features.has_select_for_update_skip_locked:
+        # Rows another worker is claiming are skipped, not waited for
+        return queryset.select_for_update(skip_locked=True)
+    return queryset
+
+
+def claim_jobs(worker, limit, queues=('default',), now=None):
+    """Lock up to `limit` due jobs for `worker` and return them, highest priority first"""
+    now = now or timezone.now()
+    with transaction.atomic():
+        due = skip_locked(
+            Job.objects.filter(status='queued', queue__in=queues, run_at__lte=now).order_by('-priority', 'run_at', 'id')
+        )
+        claimed_ids = list(due.values_list('id', flat=True)[:limit])
+        if claimed_ids:
+            Job.objects.filter(id__in=claimed_ids).update(
+                status='running', locked_by=worker, locked_at=now, attempts=F('attempts') + 1,
+            )
+    if not claimed_ids:
+        return []
+    return list(Job.objects.filter(id__in=claimed_ids).order_by('-priority', 'run_at', 'id'))
+
+
+def backoff(attempt):
+    """Seconds before retry number `attempt`: doubling from JOBS_BACKOFF_BASE, jittered, capped"""
+    delay = min(settings.JOBS_BACKOFF_MAX, settings.JOBS_BACKOFF_BASE * 2 ** (attempt - 1))
+    # Jitter so jobs that failed together don't all come back together
+    return delay * random.uniform(0.5, 1)
+
+
+def _finish(job, **fields):
+    # Only while the job is still ours: after a lease expiry another worker owns it
+    return Job.objects.filter(id=job.id, status='running', locked_by=job.locked_by).update(
+        locked_by='', locked_at=None, **fields,
+    )
+
+
+def run_job(job):
+    """Run a claimed job and record the outcome; returns the new status"""
+    try:
+        func = get_task(job.task)
+    except LookupError as exc:
+        # Retrying won't make it exist
+        _finish(job, status='dead', last_error=str(exc), finished_at=timezone.now())
+        return 'dead'
+
+    try:
+        func(*job.args, **job.kwargs)
+    except Exception:
+        error = traceback.format_exc()
+        if job.attempts >= job.max_attempts:
+            logger.error('Job %s (%s) failed for good after %d attempts', job.id, job.task, job.attempts)
+            _finish(job, status='dead', last_error=error, finished_at=timezone.now())
+            return 'dead'
+        logger.warning('Job %s (%s) failed, attempt %d of %d', job.id, job.task, job.attempts, job.max_attempts)
+        _finish(job, status='queued', last_error=error, run_at=timezone.now() + timedelta(seconds=backoff(job.attempts)))
+        return 'queued'
+
+    _finish(job, status='done', finished_at=timezone.now())
+    return 'done'
+
+
+def requeue_stale_jobs(now=None):
+    """Queue again the jobs of workers that died while running them; returns how many"""
+    now = now or timezone.now()
+    stale = Job.objects.filter(status='running', locked_at__lt=now - timedelta(seconds=settings.JOBS_LEASE))
+    # Out of attempts: a job that keeps killing its worker shouldn't run forever
+    dead = stale.filter(attempts__gte=F('max_attempts')).update(
+        status='dead', locked_by='', locked_at=None, finished_at=now,
+        last_error='The worker running it stopped before it finished',
+    )
+    return dead + stale.update(status='queued', locked_by='', locked_at=None, run_at=now)
+
+
+def enqueue_due_periodic_jobs(now=None):
+    """Enqueue every periodic job that is due, unless its last run is still pending"""
+    now = now or timezone.now()
+    enqueued = []
+    with transaction.atomic():
+        due = skip_locked(PeriodicJob.objects.filter(is_active=True, next_run_at__lte=now))
+        for periodic in due:
+            # Missed runs (no worker was up) collapse into one
+            periodic.schedule_next(now)
+            if not periodic.jobs.filter(status__in=('queued', 'running')).exists():
+                func = _registry.get(periodic.task)
+                enqueued.append(Job.objects.create(
+                    task=periodic.task, args=periodic.args, kwargs=periodic.kwargs, queue=periodic.queue,
+                    periodic=periodic, max_attempts=getattr(func, 'max_attempts', None) or settings.JOBS_MAX_ATTEMPTS,
+                ))
+                periodic.last_enqueued_at = now
+            periodic.save(update_fields=['next_run_at', 'last_enqueued_at'])
+    return enqueued
+
+
+def sync_periodic_jobs(schedules=None):
+    """
+    Make the PeriodicJob rows match settings.JOBS_PERIODIC
+    ({name: (cron, task name)}): add new ones, update cron and task of the
+    others and deactivate those no longer listed. Pausing one (is_active) in
+    the admin sticks.
+    """
+    schedules = settings.JOBS_PERIODIC if schedules is None else schedules
+    for name, (cron, task_path) in schedules.items():
+        get_task(task_path)
+        periodic = PeriodicJob.objects.filter(name=name).first()
+        if periodic is None:
+            periodic = PeriodicJob(name=name, cron=cron, task=task_path)
+            periodic.schedule_next()
+        elif (periodic.cron, periodic.task) != (cron, task_path):
+            periodic.cron, periodic.task = cron, task_path
+            periodic.schedule_next()
+        else:
+            continue
+        periodic.save()
+    PeriodicJob.objects.exclude(name__in=list(schedules)).update(is_active=False)
+
+
+def retry_jobs(queryset):
+    """Queue dead (or any finished) jobs again with a fresh set of attempts"""
+    return queryset.exclude(status__in=('queued', 'running')).update(
+        status='queued', attempts=0, run_at=timezone.now(), finished_at=None, locked_by='', locked_at=None,
+    )
+
@@ -0,0 +1,15 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Job
+from .queue import task
+
+
+@task
+def prune_finished_jobs(days=None):
+    """Delete done jobs older than JOBS_KEEP_DONE_DAYS; dead ones stay until handled in the admin"""
+    days = settings.JOBS_KEEP_DONE_DAYS if days is None else days
+    deleted, _ = Job.objects.filter(status='done', finished_at__lt=timezone.now() - timedelta(days=days)).delete()
+    return deleted
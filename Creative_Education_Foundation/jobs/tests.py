@@ -0,0 +1,148 @@
+from datetime import datetime, timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from .cron import CronSchedule
+from .models import Job, PeriodicJob
+from .queue import (
+    claim_jobs, enqueue, enqueue_due_periodic_jobs, requeue_stale_jobs, retry_jobs, run_job, sync_periodic_jobs, task,
+)
+from .worker import Worker
+
+
+calls = []
+
+
+@task
+def record(value):
+    calls.append(value)
+
+
+@task(max_attempts=2)
+def explode():
+    raise RuntimeError('boom')
+
+
+class CronScheduleTests(TestCase):
+    def at(self, *args):
+        return timezone.make_aware(datetime(*args))
+
+    def test_next_after(self):
+        start = self.at(2025, 3, 10, 8, 7, 30)  # a Monday
+        cases = {
+            '* * * * *': self.at(2025, 3, 10, 8, 8),
+            '*/15 * * * *': self.at(2025, 3, 10, 8, 15),
+            '30 2 * * *': self.at(2025, 3, 11, 2, 30),
+            '0 9-17/4 * * 1-5': self.at(2025, 3, 10, 9, 0),
+            '0 0 * * 0': self.at(2025, 3, 16, 0, 0),
+            '0 0 1 * *': self.at(2025, 4, 1, 0, 0),
+            '@yearly': self.at(2026, 1, 1, 0, 0),
+            # Either day field matches when both are set
+            '0 0 13 * 3': self.at(2025, 3, 12, 0, 0),
+        }
+        for expression, expected in cases.items():
+            with self.subTest(expression):
+                self.assertEqual(CronSchedule(expression).next_after(start), expected)
+
+    def test_invalid_expressions(self):
+        for expression in ('* * * *', '60 * * * *', '* * 0 * *', 'a * * * *', '*/0 * * * *'):
+            with self.subTest(expression), self.assertRaises(ValueError):
+                CronSchedule(expression)
+        with self.assertRaises(ValueError):
+            CronSchedule('0 0 31 2 *').next_after(timezone.now())
+
+
+@override_settings(JOBS_BACKOFF_BASE=10, JOBS_BACKOFF_MAX=60)
+class QueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_enqueue_claim_and_run(self):
+        later = enqueue(record, args=['later'], delay=timedelta(minutes=5))
+        low = record.enqueue('low')
+        high = enqueue(record, args=['high'], priority=5)
+
+        jobs = claim_jobs('worker-1', 10)
+        self.assertEqual([job.id for job in jobs], [high.id, low.id])
+        self.assertEqual(claim_jobs('worker-2', 10), [])
+        for job in jobs:
+            self.assertEqual(run_job(job), 'done')
+        self.assertEqual(calls, ['high', 'low'])
+        self.assertEqual(Job.objects.get(id=later.id).status, 'queued')
+        self.assertEqual(Job.objects.filter(status='done', attempts=1, locked_by='').count(), 2)
+
+    def test_failures_back_off_then_die(self):
+        job = explode.enqueue()
+        self.assertEqual(run_job(claim_jobs('worker', 1)[0]), 'queued')
+        job.refresh_from_db()
+        self.assertIn('RuntimeError: boom', job.last_error)
+        self.assertGreater(job.run_at, timezone.now() + timedelta(seconds=4))
+        self.assertEqual(claim_jobs('worker', 1), [])
+
+        [job] = claim_jobs('worker', 1, now=job.run_at)
+        self.assertEqual(run_job(job), 'dead')
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('dead', 2))
+
+        self.assertEqual(retry_jobs(Job.objects.filter(id=job.id)), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('queued', 0))
+
+    def test_unknown_task_is_dead_at_once(self):
+        Job.objects.create(task='jobs.tests.missing')
+        self.assertEqual(run_job(claim_jobs('worker', 1)[0]), 'dead')
+
+    @override_settings(JOBS_LEASE=60)
+    def test_stale_jobs_are_queued_again(self):
+        record.enqueue('stale')
+        explode.enqueue()
+        claim_jobs('dead-worker', 2)
+        Job.objects.update(locked_at=timezone.now() - timedelta(minutes=5))
+        Job.objects.filter(task=explode.task_name).update(attempts=2)
+
+        self.assertEqual(requeue_stale_jobs(), 2)
+        self.assertEqual(Job.objects.get(task=record.task_name).status, 'queued')
+        self.assertEqual(Job.objects.get(task=explode.task_name).status, 'dead')
+
+    def test_periodic_jobs_run_once_per_slot(self):
+        sync_periodic_jobs({'every-five': ('*/5 * * * *', record.task_name)})
+        periodic = PeriodicJob.objects.get(name='every-five')
+        self.assertEqual(periodic.next_run_at.minute % 5, 0)
+
+        due = periodic.next_run_at
+        self.assertEqual(enqueue_due_periodic_jobs(due - timedelta(seconds=1)), [])
+        self.assertEqual(len(enqueue_due_periodic_jobs(due)), 1)
+        self.assertEqual(enqueue_due_periodic_jobs(due), [])
+        # The next slot comes while the first run is still queued: skipped
+        self.assertEqual(enqueue_due_periodic_jobs(due + timedelta(minutes=5)), [])
+        self.assertEqual(Job.objects.filter(periodic=periodic).count(), 1)
+
+        sync_periodic_jobs({})
+        self.assertFalse(PeriodicJob.objects.get(name='every-five').is_active)
+
+
+class WorkerTests(TransactionTestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_worker_runs_jobs_until_idle(self):
+        for number in range(20):
+            record.enqueue(number)
+        explode.enqueue()
+
+        worker = Worker(concurrency=4, poll_interval=0.01, periodic=False)
+        self.assertEqual(worker.run(until_idle=True), 21)
+        self.assertEqual(sorted(calls), list(range(20)))
+        self.assertEqual(worker.outcomes, {'done': 20, 'queued': 1})
+        self.assertFalse(Job.objects.filter(status='running').exists())
+
+    def test_refuses_a_process_local_cache(self):
+        with self.assertRaisesMessage(CommandError, 'set REDIS_URL'):
+            call_command('run_jobs', '--until-idle', '--no-periodic')
+        record.enqueue('shared')
+        call_command('run_jobs', '--until-idle', '--no-periodic', '--local-cache', stdout=StringIO())
+        self.assertEqual(calls, ['shared'])
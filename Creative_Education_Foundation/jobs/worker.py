@@ -0,0 +1,100 @@
+"""
+The run_jobs worker: one thread claims due jobs and hands them to a pool of
+`concurrency` threads, never claiming more than there are free threads, so
+jobs it holds are always running and jobs it doesn't are left to the other
+workers. Once a second it also enqueues due periodic jobs and queues again
+the jobs of workers that died.
+
+Threads suit the tasks here, which mostly wait on the database or SMTP; for
+CPU-bound work, run more worker processes (pods) instead.
+"""
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import logging
+import os
+import socket
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections, connections
+
+from .queue import claim_jobs, enqueue_due_periodic_jobs, requeue_stale_jobs, run_job
+
+
+logger = logging.getLogger(__name__)
+
+# Seconds between periodic/stale job checks
+MAINTENANCE_EVERY = 1.0
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+class Worker:
+    def __init__(self, queues=('default',), concurrency=None, poll_interval=None, name=None, periodic=True):
+        self.queues = list(queues)
+        self.concurrency = concurrency or settings.JOBS_CONCURRENCY
+        self.poll_interval = settings.JOBS_POLL_INTERVAL if poll_interval is None else poll_interval
+        self.name = name or worker_name()
+        self.periodic = periodic
+        self.processed = 0
+        self.outcomes = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def stop(self):
+        """Finish the running jobs, claim no more"""
+        self._stop.set()
+
+    def execute(self, job):
+        # Pool threads keep their own connections; treat every job like a request
+        close_old_connections()
+        try:
+            status = run_job(job)
+        finally:
+            close_old_connections()
+        with self._lock:
+            self.processed += 1
+            self.outcomes[status] = self.outcomes.get(status, 0) + 1
+        return status
+
+    def maintain(self):
+        requeue_stale_jobs()
+        if self.periodic:
+            enqueue_due_periodic_jobs()
+
+    def run(self, until_idle=False, max_jobs=None):
+        """Work until stop() (or SIGTERM via the command), the queue is empty with until_idle, or max_jobs"""
+        running = set()
+        claimed = 0
+        last_maintenance = 0
+        with ThreadPoolExecutor(self.concurrency, thread_name_prefix='job') as pool:
+            try:
+                while not self._stop.is_set():
+                    if time.monotonic() - last_maintenance >= MAINTENANCE_EVERY:
+                        self.maintain()
+                        last_maintenance = time.monotonic()
+
+                    free = self.concurrency - len(running)
+                    if max_jobs is not None:
+                        free = min(free, max_jobs - claimed)
+                    jobs = claim_jobs(self.name, free, self.queues) if free > 0 else []
+                    claimed += len(jobs)
+                    running.update(pool.submit(self.execute, job) for job in jobs)
+
+                    if running:
+                        # Pool full or queue drained: wait for a thread to come free or the next poll
+                        done, running = wait(running, timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            if future.exception() is not None:
+                                # run_job records task errors itself, this is the database failing
+                                logger.error('Job bookkeeping failed', exc_info=future.exception())
+                    elif until_idle or (max_jobs is not None and claimed >= max_jobs):
+                        break
+                    else:
+                        self._stop.wait(self.poll_interval)
+            finally:
+                wait(running)
+        connections.close_all()
+        return self.processed
@@ -0,0 +1,174 @@
+"""
+Prometheus metrics for the site, scraped from /metrics.
+
+MetricsMiddleware records, labelled by URL name (online_classes,
+current_live_classes, vacancy_apply, ...; admin URLs as admin:<name>):
+
+- request latency and responses by status code,
+- SQL queries and total SQL time per request (connection.execute_wrapper),
+- template render time per request (the outermost template render only, so
+  included templates and fragments aren't counted twice),
+- response size.
+
+The business counters (confirmed enrollments, vacancy applications, course
+reviews) are incremented by the views themselves.
+
+With several worker processes, set PROMETHEUS_MULTIPROC_DIR (k8s/django.yaml
+does) to a directory that is emptied when the server starts: every process
+then writes its samples to memory-mapped files there and /metrics adds them
+up, so whichever worker answers the scrape reports the totals. Recording a
+request costs a handful of counter and histogram updates.
+"""
+import contextvars
+from contextlib import ExitStack
+from functools import wraps
+import os
+import time
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden
+from django.template.backends.django import Template as DjangoTemplate
+from django.utils.crypto import constant_time_compare
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess,
+)
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+REQUEST_LATENCY = Histogram(
+    'django_view_latency_seconds', 'Request latency by URL name',
+    ['view', 'method'], buckets=LATENCY_BUCKETS,
+)
+RESPONSES = Counter(
+    'django_view_responses', 'Responses by URL name and status code',
+    ['view', 'method', 'status'],
+)
+DB_QUERIES = Histogram(
+    'django_view_db_queries', 'SQL queries per request',
+    ['view'], buckets=QUERY_COUNT_BUCKETS,
+)
+DB_TIME = Histogram(
+    'django_view_db_seconds', 'Total SQL time per request',
+    ['view'], buckets=LATENCY_BUCKETS,
+)
+TEMPLATE_TIME = Histogram(
+    'django_view_template_seconds', 'Template render time per request',
+    ['view'], buckets=LATENCY_BUCKETS,
+)
+RESPONSE_SIZE = Histogram(
+    'django_view_response_bytes', 'Response body size',
+    ['view'], buckets=SIZE_BUCKETS,
+)
+
+ENROLLMENTS_CONFIRMED = Counter(
+    'cef_enrollments_confirmed', 'Course enrollments confirmed by PaymentConfirmView',
+    ['payment_method'],
+)
+VACANCY_APPLICATIONS = Counter(
+    'cef_vacancy_applications', 'Vacancy applications submitted with VacancyApplicationView',
+)
+COURSE_REVIEWS = Counter(
+    'cef_course_reviews', 'Course reviews submitted',
+)
+
+_request_stats = contextvars.ContextVar('metrics_request_stats', default=None)
+
+
+class RequestStats:
+    """SQL and template totals of the request being handled"""
+    __slots__ = ('queries', 'query_seconds', 'template_seconds', 'template_depth')
+
+    def __init__(self):
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.template_seconds = 0.0
+        self.template_depth = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        # connection.execute_wrapper() hook
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.query_seconds += time.perf_counter() - started
+
+
+def _timed_render(render):
+    @wraps(render)
+    def wrapper(self, context=None, request=None):
+        stats = _request_stats.get()
+        if stats is None:
+            return render(self, context, request)
+        stats.template_depth += 1
+        started = time.perf_counter()
+        try:
+            return render(self, context, request)
+        finally:
+            stats.template_depth -= 1
+            if not stats.template_depth:
+                stats.template_seconds += time.perf_counter() - started
+    wrapper.timed = True
+    return wrapper
+
+
+def instrument_templates():
+    """Time every render of the Django template backend (once per process)"""
+    if not getattr(DjangoTemplate.render, 'timed', False):
+        DjangoTemplate.render = _timed_render(DjangoTemplate.render)
+
+
+def view_label(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unresolved'
+    return match.view_name or 'unnamed'
+
+
+class MetricsMiddleware:
+    """Per-view latency, SQL, template and size metrics; keep it first in MIDDLEWARE"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        instrument_templates()
+
+    def __call__(self, request):
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(stats))
+                response = self.get_response(request)
+        finally:
+            _request_stats.reset(token)
+
+        view = view_label(request)
+        REQUEST_LATENCY.labels(view, request.method).observe(time.perf_counter() - started)
+        RESPONSES.labels(view, request.method, str(response.status_code)).inc()
+        DB_QUERIES.labels(view).observe(stats.queries)
+        DB_TIME.labels(view).observe(stats.query_seconds)
+        if stats.template_seconds:
+            TEMPLATE_TIME.labels(view).observe(stats.template_seconds)
+        if not response.streaming:
+            RESPONSE_SIZE.labels(view).observe(len(response.content))
+        return response
+
+
+def metrics_view(request):
+    """Prometheus text exposition, summed over all worker processes"""
+    token = settings.METRICS_TOKEN
+    if token and not constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return HttpResponseForbidden()
+
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return HttpResponse(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,234 @@
+"""
+On-demand request profiling.
+
+ProfilingMiddleware profiles a request when a staff user asks for it (an
+"X-Profile: 1" header or ?profile=1) and, with PROFILING_SAMPLE_RATE above
+zero, that fraction of all other requests. A profiled request gets:
+
+- a statistical CPU profile: a thread samples the request thread's stack
+  every PROFILING_INTERVAL seconds, written as collapsed stacks
+  ("outer;inner;leaf count" per line, <name>.folded), which flamegraph.pl,
+  speedscope or inferno read as they are,
+- the metadata of the request (<name>.json) and, when a staff user asked
+  for the profile, a tracemalloc diff: the PROFILING_TOP_ALLOCATIONS source
+  lines that allocated the most memory during the request.
+
+Profiling changes no interpreter-wide setting outside a requested profile's
+tracemalloc, which traces every thread and so slows the requests running
+alongside; sampled requests never start it. Only one request per process is
+profiled at a time, others run normally. Files are kept in PROFILING_DIR, the newest
+PROFILING_KEEP profiles only, and listed at /admin1/profiles/. The directory
+is local to the pod, so the list shows what the pod that answered recorded.
+"""
+from collections import Counter
+from datetime import datetime, timezone as dt_timezone
+from functools import lru_cache
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import tracemalloc
+
+from django.conf import settings
+
+from .metrics import view_label
+
+
+PROFILE_NAME_RE = re.compile(r'^[\w.-]+\.(?:folded|json)$')
+
+_busy = threading.Lock()
+_sequence = 0
+
+
+def profiling_dir():
+    return settings.PROFILING_DIR
+
+
+def wants_profile(request):
+    """'requested' when a staff user asked for a profile, 'sampled' when picked at random, else None"""
+    # The flag first, so request.user is only loaded for flagged requests
+    asked = request.headers.get('X-Profile') == '1' or request.GET.get('profile') == '1'
+    if asked and getattr(request, 'user', None) is not None and request.user.is_staff:
+        return 'requested'
+    if settings.PROFILING_SAMPLE_RATE and random.random() < settings.PROFILING_SAMPLE_RATE:
+        return 'sampled'
+    return None
+
+
+@lru_cache(maxsize=1024)
+def short_filename(filename):
+    """A source file relative to the project or to the sys.path entry it was imported from"""
+    for root in [str(settings.BASE_DIR)] + sorted(filter(None, sys.path), key=len, reverse=True):
+        if filename.startswith(root + os.sep):
+            return os.path.relpath(filename, root)
+    return filename
+
+
+@lru_cache(maxsize=8192)
+def frame_label(code):
+    return f'{code.co_name} ({short_filename(code.co_filename)}:{code.co_firstlineno})'.replace(';', ':')
+
+
+class StackSampler:
+    """Counts the stacks of one thread, below a root frame, sampled from another thread"""
+
+    def __init__(self, thread_id, root, interval):
+        self.thread_id = thread_id
+        self.root = root
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='request-profiler', daemon=True)
+
+    def __enter__(self):
+        # The sampler only runs when the request thread lets go of the GIL, at
+        # least every switch interval (5ms by default), which is left alone:
+        # it is process wide
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None and frame is not self.root:
+                stack.append(frame_label(frame.f_code))
+                frame = frame.f_back
+            # Not once the request is done and __exit__ waits for this thread
+            if stack and not self._stop.is_set():
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    @property
+    def samples(self):
+        return sum(self.stacks.values())
+
+    def collapsed(self):
+        return ''.join(f'{stack} {count}\n' for stack, count in sorted(self.stacks.items()))
+
+
+def allocation_diff(before, after, limit):
+    """The source lines that allocated the most during the request, largest first"""
+    return [
+        {
+            'where': f'{short_filename(stat.traceback[0].filename)}:{stat.traceback[0].lineno}',
+            'size_diff': stat.size_diff,
+            'count_diff': stat.count_diff,
+        }
+        for stat in after.compare_to(before, 'lineno')[:limit]
+        if stat.size_diff > 0
+    ]
+
+
+def _profile_name(request, started):
+    global _sequence
+    _sequence += 1
+    stamp = datetime.fromtimestamp(started, dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+    return re.sub(r'[^\w.-]', '-', f'{stamp}_{view_label(request)}_{os.getpid()}-{_sequence}')
+
+
+def save_profile(name, sampler, meta):
+    directory = profiling_dir()
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, f'{name}.folded'), 'w') as folded:
+        folded.write(sampler.collapsed())
+    with open(os.path.join(directory, f'{name}.json'), 'w') as details:
+        json.dump(meta, details, indent=2)
+    prune_profiles()
+
+
+def prune_profiles(keep=None):
+    """Delete all but the newest `keep` profiles"""
+    keep = settings.PROFILING_KEEP if keep is None else keep
+    for profile in list_profiles()[keep:]:
+        for filename in (profile['folded'], profile['json']):
+            try:
+                os.remove(os.path.join(profiling_dir(), filename))
+            except FileNotFoundError:
+                pass
+
+
+def list_profiles():
+    """Metadata of every saved profile, newest first"""
+    directory = profiling_dir()
+    try:
+        filenames = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+    profiles = []
+    for filename in filenames:
+        if not filename.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(directory, filename)) as details:
+                meta = json.load(details)
+        except (OSError, ValueError):
+            continue
+        name = filename[:-len('.json')]
+        meta.update(name=name, json=filename, folded=f'{name}.folded')
+        profiles.append(meta)
+    profiles.sort(key=lambda profile: profile.get('started', ''), reverse=True)
+    return profiles
+
+
+def profile_path(filename):
+    """Absolute path of a saved profile file, or None for anything else"""
+    if not PROFILE_NAME_RE.match(filename):
+        return None
+    path = os.path.join(profiling_dir(), filename)
+    return path if os.path.isfile(path) else None
+
+
+class ProfilingMiddleware:
+    """Profile requested and sampled requests; keep it after AuthenticationMiddleware"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        trigger = wants_profile(request)
+        if trigger is None or not _busy.acquire(blocking=False):
+            return self.get_response(request)
+        try:
+            return self.profile(request, trigger)
+        finally:
+            _busy.release()
+
+    def profile(self, request, trigger):
+        # Allocations only when asked for: tracemalloc slows every thread
+        trace_allocations = trigger == 'requested'
+        started_tracing = trace_allocations and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        try:
+            before = tracemalloc.take_snapshot() if trace_allocations else None
+            started = time.time()
+            clock = time.perf_counter()
+            with StackSampler(threading.get_ident(), sys._getframe(), settings.PROFILING_INTERVAL) as sampler:
+                response = self.get_response(request)
+            duration = time.perf_counter() - clock
+            after = tracemalloc.take_snapshot() if trace_allocations else None
+        finally:
+            if started_tracing:
+                tracemalloc.stop()
+
+        allocations = allocation_diff(before, after, settings.PROFILING_TOP_ALLOCATIONS) if trace_allocations else []
+        name = _profile_name(request, started)
+        save_profile(name, sampler, {
+            'started': datetime.fromtimestamp(started, dt_timezone.utc).isoformat(),
+            'method': request.method,
+            'path': request.get_full_path(),
+            'view': view_label(request),
+            'status': response.status_code,
+            'duration': round(duration, 4),
+            'samples': sampler.samples,
+            'trigger': trigger,
+            'allocations': allocations,
+        })
+        return response
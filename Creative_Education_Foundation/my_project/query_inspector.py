@@ -0,0 +1,160 @@
+"""
+N+1 query detection and query budgets.
+
+QueryInspector records every SQL statement run while it is active, grouped
+by fingerprint (the SQL with literals, parameters and IN lists normalized
+away) and call site: the innermost line of project code that ran it, plus
+the template file and line when it happened while rendering one. When the
+same fingerprint comes from the same call site NPLUSONE_THRESHOLD or more
+times, that's a per-row query (N+1).
+
+QueryInspectorMiddleware logs those for every request when DEBUG is on (it
+removes itself otherwise). In tests, query_budget(n) fails when the block or
+test runs more than n queries or any N+1 pattern:
+
+    with query_budget(8):
+        self.client.get(url)
+"""
+from collections import Counter
+from contextlib import ContextDecorator, ExitStack
+import logging
+import os
+import re
+import sys
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+
+logger = logging.getLogger(__name__)
+
+IN_LIST_RE = re.compile(r'\bIN \((?:\s*(?:%s|\?|\d+)\s*,?)+\)', re.IGNORECASE)
+STRING_RE = re.compile(r"'(?:[^']|'')*'")
+NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+SPACE_RE = re.compile(r'\s+')
+
+TEMPLATE_BASE = os.path.join('django', 'template', 'base.py')
+# Entry point and request instrumentation wrap every query, they're never the culprit
+IGNORED_MODULES = {'__main__', __name__, 'my_project.metrics'}
+
+
+def fingerprint(sql):
+    """SQL with its values normalized away, so per-row queries compare equal"""
+    sql = IN_LIST_RE.sub('IN (...)', sql)
+    sql = STRING_RE.sub('?', sql)
+    sql = NUMBER_RE.sub('?', sql).replace('%s', '?')
+    return SPACE_RE.sub(' ', sql).strip()
+
+
+def _is_project_code(frame):
+    filename = frame.f_code.co_filename
+    return (
+        filename.startswith(str(settings.BASE_DIR))
+        and 'site-packages' not in filename
+        and frame.f_globals.get('__name__') not in IGNORED_MODULES
+    )
+
+
+def call_site(frame=None):
+    """'file:line in function' of the innermost project code and/or 'template:line' while rendering"""
+    frame = frame or sys._getframe(1)
+    code_site = template_site = None
+    while frame is not None and (code_site is None or template_site is None):
+        code = frame.f_code
+        if template_site is None and code.co_name == 'render_annotated' and code.co_filename.endswith(TEMPLATE_BASE):
+            node = frame.f_locals.get('self')
+            origin = getattr(node, 'origin', None)
+            token = getattr(node, 'token', None)
+            if origin is not None and token is not None:
+                template_site = f'{origin.template_name}:{token.lineno}'
+        if code_site is None and _is_project_code(frame):
+            code_site = f'{os.path.relpath(code.co_filename, settings.BASE_DIR)}:{frame.f_lineno} in {code.co_name}'
+        frame = frame.f_back
+    if code_site and template_site:
+        return f'{code_site} ({template_site})'
+    return code_site or template_site or 'unknown'
+
+
+class QueryInspector:
+    """Records (fingerprint, call site, sql) of every query while active"""
+
+    def __init__(self, using=None):
+        self.aliases = [using] if using else list(connections)
+        self.queries = []
+        self._stack = None
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        for alias in self.aliases:
+            self._stack.enter_context(connections[alias].execute_wrapper(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stack.close()
+
+    def __call__(self, execute, sql, params, many, context):
+        # connection.execute_wrapper() hook
+        self.queries.append((fingerprint(sql), call_site(sys._getframe(1)), sql))
+        return execute(sql, params, many, context)
+
+    def __len__(self):
+        return len(self.queries)
+
+    def repeated(self, threshold=None):
+        """[(count, fingerprint, call site)] run at least threshold times, most frequent first"""
+        threshold = threshold or settings.NPLUSONE_THRESHOLD
+        counts = Counter((shape, site) for shape, site, _ in self.queries)
+        return [
+            (count, shape, site)
+            for (shape, site), count in counts.most_common()
+            if count >= threshold
+        ]
+
+    def report(self):
+        """Every query in order, for assertion messages"""
+        return '\n'.join(f'{number}. {site}: {sql}' for number, (_, site, sql) in enumerate(self.queries, 1))
+
+
+class query_budget(ContextDecorator):
+    """Fail when the block runs more than `budget` queries, or an N+1 pattern unless allow_repeated"""
+
+    def __init__(self, budget, allow_repeated=False, using=None):
+        self.budget = budget
+        self.allow_repeated = allow_repeated
+        self.using = using
+
+    def __enter__(self):
+        self.inspector = QueryInspector(self.using).__enter__()
+        return self.inspector
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.inspector.__exit__(exc_type, exc_value, traceback)
+        if exc_type is not None:
+            return False
+        if len(self.inspector) > self.budget:
+            raise AssertionError(
+                f'{len(self.inspector)} queries, over the budget of {self.budget}:\n{self.inspector.report()}'
+            )
+        repeated = self.inspector.repeated()
+        if repeated and not self.allow_repeated:
+            raise AssertionError('N+1 queries:\n' + '\n'.join(
+                f'{count}x from {site}: {shape}' for count, shape, site in repeated
+            ))
+        return False
+
+
+class QueryInspectorMiddleware:
+    """Log N+1 query patterns of every request (DEBUG only)"""
+
+    def __init__(self, get_response):
+        if not settings.DEBUG:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with QueryInspector() as inspector:
+            response = self.get_response(request)
+        for count, shape, site in inspector.repeated():
+            logger.warning('N+1 on %s: %d queries from %s: %s', request.path, count, site, shape)
+        return response
@@ -0,0 +1,285 @@
+"""
+Synthetic data at realistic volumes: users with profiles, courses with
+weekly schedules, enrollments skewed towards popular courses with their
+payment logs and reviews, vacancies with applications, and FAQ questions.
+
+Rows are written with chunked bulk_create and get explicit ids, counted up
+from the current maximum, so later rows can point at them without reading
+them back (MySQL doesn't return ids from bulk_create). Users are generated
+and written a chunk at a time together with everything hanging off them, so
+millions of rows never sit in memory at once. bulk_create skips save() and
+the signals, so seed() fills in what they would: the schedule columns,
+rating counters, catalog rows, search index, class sessions and
+recommendations.
+
+Everything comes from one random.Random(seed), so the same arguments give
+the same data.
+"""
+from datetime import time, timedelta
+from itertools import accumulate, islice
+import random
+import time as clock
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from accounts.models import UserProfile
+from courses import timetable
+from courses.catalog import refresh_catalog_entries
+from courses.models import Course, CourseEnrollment, CoursePaymentLog, CourseReview
+from courses.ratings import reconcile_course_ratings
+from courses.recommendations import build_recommendations
+from courses.search import index_courses
+from courses.sessions import generate_sessions
+from pages.models import Question, Vacancy, VacancyApplication
+
+
+CHUNK_SIZE = 2000
+# Seconds between progress lines
+PROGRESS_EVERY = 5
+
+SUBJECTS = [
+    'Mathematics', 'Accountancy', 'Economics', 'English', 'Nepali', 'Physics', 'Chemistry', 'Biology',
+    'Computer Science', 'Business Studies', 'Statistics', 'Finance', 'Marketing', 'Management',
+]
+LEVELS = ['Grade 11', 'Grade 12', 'BBS 1st Year', 'BBS 2nd Year', 'BBA', 'Loksewa', 'Bridge Course']
+ROLES = ['Home Tuition Teacher', 'Subject Teacher', 'Content Writer', 'Counsellor', 'Accountant', 'Coordinator']
+FIRST_NAMES = ['Anish', 'Sagar', 'Samir', 'Surya', 'Sita', 'Gita', 'Ram', 'Hari', 'Asmita', 'Prakash', 'Rojina']
+LAST_NAMES = ['Subedi', 'Poudel', 'Timilsina', 'Sharma', 'Adhikari', 'Gurung', 'Thapa', 'Karki', 'Shrestha']
+CITIES = ['Pokhara', 'Kathmandu', 'Butwal', 'Chitwan', 'Remote']
+
+# Course type, and for live/hybrid classes start minutes (06:00-20:00) and lengths
+COURSE_TYPES = (['live'] * 6) + (['recorded'] * 3) + ['hybrid']
+START_MINUTES = range(6 * 60, 20 * 60 + 1, 15)
+DURATIONS = (45, 60, 90, 120)
+# Stars 1-5, skewed positive like real reviews
+RATING_WEIGHTS = (3, 5, 15, 40, 37)
+
+
+def chunked(iterable, size=CHUNK_SIZE):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def bulk_insert(model, objects, chunk_size=CHUNK_SIZE):
+    """bulk_create an iterable of unsaved instances chunk by chunk, return how many were written"""
+    written = 0
+    for chunk in chunked(objects, chunk_size):
+        model.objects.bulk_create(chunk)
+        written += len(chunk)
+    return written
+
+
+def next_id(model):
+    return (model.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+
+
+def _person(rng):
+    return rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+
+
+def _course(rng, course_id, today, instructors, rush):
+    subject, level = rng.choice(SUBJECTS), rng.choice(LEVELS)
+    first, last = instructors[course_id % len(instructors)]
+    course = Course(
+        id=course_id,
+        title=f'{level} {subject} {course_id}',
+        description=f'{subject} for {level} students: lectures, notes and practice sets in {subject.lower()}.',
+        # The name only; the pages need an image URL, not the file
+        image='courses/images/seed.jpg',
+        course_type=rng.choice(COURSE_TYPES),
+        price=rng.randrange(1000, 10001, 500),
+        discount_percentage=rng.choice((0, 0, 10, 20)),
+        instructor_name=f'{first} {last}',
+        duration=f'{rng.choice((1, 3, 6))} months',
+        is_active=rng.random() < 0.95,
+    )
+    if course.course_type != 'recorded':
+        start = rng.choice(START_MINUTES)
+        days = rng.sample(timetable.DAYS_ORDER, rng.randint(2, 6))
+        if rush and rng.random() < rush['share']:
+            # Starts at the rush minute, e.g. for measuring a class-start instant
+            start = rush['minute']
+            days = sorted(set(days) | {rush['day']}, key=timetable.DAYS_ORDER.index)
+        end = min(start + rng.choice(DURATIONS), 23 * 60 + 59)
+        course.schedule_days = days
+        course.start_time = time(start // 60, start % 60)
+        course.end_time = time(end // 60, end % 60)
+        course.schedule_time = f'{course.start_time:%I:%M %p} - {course.end_time:%I:%M %p}'
+        course.meeting_link = f'https://meet.example.com/course-{course_id}'
+        course.class_start_date = today - timedelta(days=rng.randrange(60))
+        course.class_end_date = course.class_start_date + timedelta(days=rng.randrange(90, 181))
+    course.sync_schedule_fields()
+    return course
+
+
+def _enrollment(rng, enrollment_id, user_id, course_id, now):
+    enrollment = CourseEnrollment(
+        id=enrollment_id, user_id=user_id, course_id=course_id,
+        amount_paid=rng.randrange(900, 9001, 100),
+    )
+    roll = rng.random()
+    if roll < 0.9:
+        enrollment.payment_status = 'completed'
+        enrollment.payment_method = rng.choice(('esewa', 'khalti', 'manual'))
+        enrollment.payment_date = now - timedelta(days=rng.randrange(300))
+        enrollment.transaction_id = f'SEED-{enrollment_id}'
+        # A few have run out
+        enrollment.access_expiry = enrollment.payment_date + timedelta(days=365 if roll < 0.85 else 0)
+    elif roll < 0.97:
+        enrollment.payment_status = 'pending'
+    else:
+        enrollment.payment_status = 'failed'
+        enrollment.payment_method = rng.choice(('esewa', 'khalti'))
+    return enrollment
+
+
+def _payment_log(rng, enrollment):
+    """The gateway's answer to a completed or failed payment"""
+    completed = enrollment.payment_status == 'completed'
+    return CoursePaymentLog(
+        enrollment_id=enrollment.id,
+        transaction_id=enrollment.transaction_id or f'SEED-FAILED-{enrollment.id}',
+        amount=enrollment.amount_paid,
+        payment_method=enrollment.payment_method,
+        status='completed' if completed else 'failed',
+        response_data={'note': 'Payment confirmed' if completed else rng.choice(('Cancelled', 'Insufficient balance'))},
+    )
+
+
+def seed(users=1000, courses=100, enrollments=3, review_rate=0.3, vacancies=50, applications=10,
+         questions=50, rush_at=None, rush_share=0.2, password=None, chunk_size=CHUNK_SIZE, seed=0, log=None):
+    """
+    Add the given volumes (enrollments and applications are averages per user
+    and per vacancy) and return {model name: rows written}. With rush_at,
+    rush_share of the live classes start at that minute on that weekday.
+    With a password, every seeded user can log in with it.
+    """
+    rng = random.Random(seed)
+    log = log or (lambda message: None)
+    now = timezone.now()
+    today = timezone.localdate(now)
+    written = {}
+
+    rush = None
+    if rush_at is not None:
+        local = timezone.localtime(rush_at)
+        rush = {
+            'minute': local.hour * 60 + local.minute,
+            'day': timetable.DAYS_ORDER[local.weekday()],
+            'share': rush_share,
+        }
+
+    first_course = next_id(Course)
+    instructors = [_person(rng) for _ in range(max(1, courses // 5))]
+    course_ids = list(range(first_course, first_course + courses))
+    written['courses'] = bulk_insert(Course, (
+        _course(rng, course_id, today, instructors, rush) for course_id in course_ids
+    ), chunk_size)
+    log(f'{written["courses"]} courses')
+
+    # One hash for everyone: PBKDF2 per user would take days at these volumes.
+    # Without a password the accounts can't log in.
+    password_hash = make_password(password)
+    first_user = next_id(User)
+    first_enrollment = next_id(CourseEnrollment)
+    # Enrollments favour popular courses (Zipf-like), at most one per user and course
+    popularity = list(accumulate(1 / (rank + 1) ** 0.8 for rank in range(len(course_ids))))
+    for model in ('users', 'enrollments', 'reviews', 'payment_logs'):
+        written[model] = 0
+
+    # A chunk of users at a time with their profiles, enrollments, payment
+    # logs and reviews, so memory stays flat however many users are asked for
+    last_report = clock.perf_counter()
+    for user_ids in chunked(range(first_user, first_user + users), chunk_size):
+        rows = {model: [] for model in (User, UserProfile, CourseEnrollment, CoursePaymentLog, CourseReview)}
+        for user_id in user_ids:
+            first, last = _person(rng)
+            rows[User].append(User(
+                id=user_id, username=f'seed{user_id}', email=f'seed{user_id}@example.com',
+                password=password_hash, first_name=first, last_name=last,
+            ))
+            rows[UserProfile].append(UserProfile(user_id=user_id, mobile_number=f'98{rng.randrange(10 ** 8):08d}'))
+
+            wanted = min(len(course_ids), rng.randint(0, 2 * enrollments))
+            picked = sorted(set(rng.choices(course_ids, cum_weights=popularity, k=wanted))) if wanted else ()
+            for course_id in picked:
+                enrollment = _enrollment(rng, first_enrollment + written['enrollments'], user_id, course_id, now)
+                written['enrollments'] += 1
+                rows[CourseEnrollment].append(enrollment)
+                if enrollment.payment_status != 'pending':
+                    rows[CoursePaymentLog].append(_payment_log(rng, enrollment))
+                if enrollment.payment_status == 'completed' and rng.random() < review_rate:
+                    rows[CourseReview].append(CourseReview(
+                        course_id=course_id, user_id=user_id, enrollment_id=enrollment.id,
+                        rating=rng.choices(range(1, 6), weights=RATING_WEIGHTS)[0],
+                        comment=rng.choice(('', 'Very helpful classes.', 'Good notes.', 'Too fast for me.')),
+                    ))
+
+        # One transaction per chunk instead of one per INSERT
+        with transaction.atomic():
+            for model, objects in rows.items():
+                model.objects.bulk_create(objects, batch_size=chunk_size)
+        written['users'] += len(user_ids)
+        written['reviews'] += len(rows[CourseReview])
+        written['payment_logs'] += len(rows[CoursePaymentLog])
+
+        if clock.perf_counter() - last_report >= PROGRESS_EVERY or written['users'] == users:
+            last_report = clock.perf_counter()
+            log(
+                f'{written["users"]}/{users} users, {written["enrollments"]} enrollments, '
+                f'{written["payment_logs"]} payment logs, {written["reviews"]} reviews'
+            )
+
+    first_vacancy = next_id(Vacancy)
+    vacancy_ids = list(range(first_vacancy, first_vacancy + vacancies))
+    written['vacancies'] = bulk_insert(Vacancy, (
+        Vacancy(
+            id=vacancy_id, title=f'{rng.choice(ROLES)} ({rng.choice(SUBJECTS)})',
+            location=rng.choice(CITIES), salary=rng.randrange(10000, 60001, 1000), openings=rng.randint(1, 5),
+            employment_type=rng.choice(('full_time', 'part_time')),
+            start_date=today + timedelta(days=rng.randrange(-30, 30)),
+            # Mostly still open
+            deadline=today + timedelta(days=rng.randrange(-20, 60)),
+            description='We are looking for passionate teachers.',
+            requirements='Bachelor degree\n1 year experience', responsibilities='Conduct classes\nPrepare materials',
+            is_active=rng.random() < 0.9,
+        )
+        for vacancy_id in vacancy_ids
+    ), chunk_size)
+    written['applications'] = bulk_insert(VacancyApplication, (
+        VacancyApplication(
+            vacancy_id=vacancy_id, full_name=' '.join(_person(rng)),
+            email=f'applicant{vacancy_id}-{number}@example.com', phone=f'98{rng.randrange(10 ** 8):08d}',
+            cv='applications/cvs/seed/cv.pdf',
+            status=rng.choice(('pending', 'pending', 'under_review', 'shortlisted', 'rejected')),
+            payment_status=rng.choice(('pending', 'completed', 'completed')),
+        )
+        for vacancy_id in vacancy_ids
+        for number in range(rng.randint(0, 2 * applications))
+    ), chunk_size)
+    log(f'{written["vacancies"]} vacancies, {written["applications"]} applications')
+
+    written['questions'] = bulk_insert(Question, (
+        Question(
+            name=' '.join(_person(rng)), email=f'asker{number}@example.com',
+            question=f'How do I join the {rng.choice(SUBJECTS).lower()} classes?',
+            answered=(answered := rng.random() < 0.7),
+            answer='Enroll from the course page and pay online.' if answered else None,
+        )
+        for number in range(questions)
+    ), chunk_size)
+
+    # What save() and the signals would have done
+    reconcile_course_ratings()
+    refresh_catalog_entries(course_ids)
+    index_courses(course_ids)
+    generate_sessions(course_ids)
+    build_recommendations()
+    timetable.bump_version()
+    log('rating counters, catalog, search index, sessions and recommendations rebuilt')
+    return written
@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.0/ref/settings/
 
 import os
 from pathlib import Path
+import tempfile
 
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -42,15 +43,20 @@ INSTALLED_APPS = [
     'accounts',
     'pages',
     'courses',
-    
+    'jobs',
+    'outbox',
+    'blobs',
 ]
 
 MIDDLEWARE = [
+    'my_project.metrics.MetricsMiddleware',
+    'my_project.query_inspector.QueryInspectorMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'my_project.profiling.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -127,6 +133,28 @@ DATABASES = {
     }
 }
 
+# DATABASE_ENGINE=sqlite runs everything against a local SQLite file instead
+# (quick local runs of the benchmarks, no MySQL needed)
+if os.getenv('DATABASE_ENGINE') == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.getenv('SQLITE_PATH', str(BASE_DIR / 'db.sqlite3')),
+        }
+    }
+
+# Shared by every process (web pods, workers): versions and caches that one
+# process invalidates must be dropped for all of them. Without REDIS_URL every
+# process keeps its own memory cache, which only holds up with a single process
+# (runserver, tests); run_jobs refuses to start on it.
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
@@ -183,6 +211,9 @@ MEDIA_ROOT = BASE_DIR / 'media'
 # File upload settings
 FILE_UPLOAD_MAX_MEMORY_SIZE = 4 * 1024 * 1024  # 4MB
 DATA_UPLOAD_MAX_MEMORY_SIZE = 4 * 1024 * 1024  # 4MB
+# Vacancy application CVs are streamed to disk and refused past this size
+# (pages.uploads), whatever FILE_UPLOAD_MAX_MEMORY_SIZE says
+CV_MAX_UPLOAD_SIZE = 4 * 1024 * 1024
 
 
 
@@ -209,6 +240,79 @@ DEFAULT_FROM_EMAIL = 'Creative Education Foundation <noreply@creativeeducation.c
 # Application Fee
 VACANCY_APPLICATION_FEE = 100.00  # Rs. 100
 
+# "Top rated" course ranking: every course starts with this many virtual
+# reviews of the prior mean, so a single 5-star review can't top the catalog
+COURSE_RATING_PRIOR_MEAN = 3.5
+COURSE_RATING_PRIOR_WEIGHT = 5
+
+# Rendered page shells (pages.page_cache) are dropped after this many seconds
+# even if no content version changed
+PAGE_CACHE_TIMEOUT = 15 * 60
+
+# Class sessions (courses.sessions) are generated this many days ahead for
+# courses without a class_end_date
+CLASS_SESSION_HORIZON_DAYS = 90
+
+# Join clicks are buffered per process and written in one batch when this many
+# are pending or the oldest is this many seconds old (courses.attendance)
+ATTENDANCE_BATCH_SIZE = 200
+ATTENDANCE_FLUSH_SECONDS = 5
+
+# Class schedules are wall-clock times in TIME_ZONE; the week timetable
+# (courses.week_grid) shows them in the students' own time zone
+STUDENT_TIME_ZONE = 'Asia/Kathmandu'
+
+# /metrics (my_project.metrics) requires "Authorization: Bearer <token>" when set
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+# The same query shape from the same line this many times in one request is
+# reported as N+1 (my_project.query_inspector)
+NPLUSONE_THRESHOLD = 3
+
+# Request profiles (my_project.profiling): staff add "X-Profile: 1" or
+# ?profile=1, and this fraction of all requests is profiled as well
+PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', '0'))
+PROFILING_DIR = os.getenv('PROFILING_DIR', os.path.join(tempfile.gettempdir(), 'request-profiles'))
+PROFILING_INTERVAL = 0.002  # seconds between stack samples
+PROFILING_TOP_ALLOCATIONS = 25
+PROFILING_KEEP = 200
+
+# Background jobs (jobs app, manage.py run_jobs). Failed jobs are retried after
+# JOBS_BACKOFF_BASE seconds, doubling per attempt up to JOBS_BACKOFF_MAX; a
+# running job whose worker hasn't finished it in JOBS_LEASE seconds is queued again
+JOBS_CONCURRENCY = int(os.getenv('JOBS_CONCURRENCY', '4'))
+JOBS_POLL_INTERVAL = 1.0
+JOBS_MAX_ATTEMPTS = 5
+JOBS_BACKOFF_BASE = 10
+JOBS_BACKOFF_MAX = 60 * 60
+JOBS_LEASE = 30 * 60
+JOBS_KEEP_DONE_DAYS = 7
+# {name: (cron expression in TIME_ZONE, task)}, enqueued by the workers
+JOBS_PERIODIC = {
+    'class-reminders': ('* * * * *', 'courses.tasks.send_class_reminders'),
+    'class-sessions': ('15 0 * * *', 'courses.tasks.generate_class_sessions'),
+    'course-ratings-reconcile': ('30 2 * * *', 'courses.tasks.reconcile_ratings'),
+    'course-recommendations': ('0 3 * * *', 'courses.tasks.build_course_recommendations'),
+    'prune-finished-jobs': ('45 3 * * *', 'jobs.tasks.prune_finished_jobs'),
+    'prune-sent-emails': ('50 3 * * *', 'outbox.tasks.prune_sent_emails'),
+    'collect-blobs': ('0 4 * * *', 'blobs.tasks.collect_blobs'),
+    'sweep-blobs': ('30 4 * * 0', 'blobs.tasks.sweep_blobs'),
+}
+
+# Email outbox (outbox app, manage.py send_outbox): emails are queued with the
+# event they belong to and sent in batches over one SMTP connection
+OUTBOX_BATCH_SIZE = 50
+OUTBOX_RATE_LIMIT = float(os.getenv('OUTBOX_RATE_LIMIT', '5'))  # emails per second per sender
+OUTBOX_POLL_INTERVAL = 2.0
+OUTBOX_MAX_ATTEMPTS = 8
+OUTBOX_LEASE = 10 * 60
+# Sent emails (and with them their dedup keys) are kept this long
+OUTBOX_KEEP_SENT_DAYS = 30
+
+# Files stored by content hash (blobs app): identical files are kept once, and
+# deleted this many seconds after the last row referencing them let go
+BLOBS_GC_GRACE = 24 * 60 * 60
+
 # Add 'requests' to your requirements.txt
 # requests>=2.31.0
 
@@ -0,0 +1,69 @@
+"""
+Helpers shared by the apps' tests.
+
+URLQueryBudgetMixin requests every URL of an app's urlpatterns as a logged-in
+user and checks its status code and query budget (my_project.query_inspector):
+
+    class URLQueryBudgetTests(URLQueryBudgetMixin, TestCase):
+        urlpatterns = urlpatterns
+        BUDGETS = {'home': 8, ...}
+"""
+from django.core.cache import cache
+from django.test import RequestFactory
+from django.urls import resolve, reverse
+
+from my_project.query_inspector import query_budget
+
+
+# Smallest valid GIF, for ImageFields
+GIF = (
+    b'GIF89a\x01\x00\x01\x00\x80\x00\x00\x00\x00\x00\xff\xff\xff!\xf9\x04\x01\x00\x00\x00\x00'
+    b',\x00\x00\x00\x00\x01\x00\x01\x00\x00\x02\x02D\x01\x00;'
+)
+
+
+class URLQueryBudgetMixin:
+    """
+    Every URL in `urlpatterns` has a query budget, answers with its expected
+    status and runs no query per row. Set on the TestCase:
+
+    - BUDGETS: {url name: most queries allowed}, for every URL;
+    - STATUS: {url name: expected status code} where it isn't 200;
+    - KNOWN_BROKEN: {url name: why}, URLs skipped until they're fixed;
+    - url_kwargs and query_params (in setUpTestData), and the logged-in `user`.
+
+    A URL shadowed by an earlier pattern at the same path is never reached
+    through the client, so its view is called with a RequestFactory request.
+    """
+    urlpatterns = ()
+    BUDGETS = {}
+    STATUS = {}
+    KNOWN_BROKEN = {}
+    url_kwargs = {}
+    query_params = {}
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+
+    def get(self, pattern, url):
+        match = resolve(url)
+        if match.url_name == pattern.name:
+            return self.client.get(url, self.query_params)
+        request = RequestFactory().get(url, self.query_params)
+        request.user = self.user
+        return pattern.callback(request, *match.args, **match.kwargs)
+
+    def test_every_url_has_a_budget(self):
+        self.assertEqual({pattern.name for pattern in self.urlpatterns}, set(self.BUDGETS))
+
+    def test_urls_stay_within_budget(self):
+        for pattern in self.urlpatterns:
+            url = reverse(pattern.name, kwargs={name: self.url_kwargs[name] for name in pattern.pattern.converters})
+            cache.clear()
+            with self.subTest(url=url, name=pattern.name):
+                if pattern.name in self.KNOWN_BROKEN:
+                    self.skipTest(self.KNOWN_BROKEN[pattern.name])
+                with query_budget(self.BUDGETS[pattern.name]):
+                    response = self.get(pattern, url)
+                self.assertEqual(response.status_code, self.STATUS.get(pattern.name, 200))
@@ -19,9 +19,11 @@ from django.urls import path
 from django.urls import include
 from django.conf import settings
 from django.conf.urls.static import static
+from my_project.metrics import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics', metrics_view, name='metrics'),
     path('', include('pages.urls')),
     path('', include('accounts.urls')),
     path ('',include('courses.urls')),
@@ -0,0 +1,31 @@
+from django.contrib import admin
+from django.utils import timezone
+
+from .models import OutboxEmail
+
+
+@admin.register(OutboxEmail)
+class OutboxEmailAdmin(admin.ModelAdmin):
+    list_display = ['id', 'subject', 'recipients', 'status', 'attempts', 'next_attempt_at', 'sent_at', 'created_at']
+    list_filter = ['status', 'created_at']
+    search_fields = ['subject', 'dedup_key', 'batch', 'last_error']
+    readonly_fields = [
+        'dedup_key', 'batch', 'to', 'from_email', 'subject', 'body', 'html_body', 'status', 'attempts',
+        'next_attempt_at', 'last_error', 'locked_by', 'locked_at', 'created_at', 'sent_at',
+    ]
+    date_hierarchy = 'created_at'
+    actions = ['retry_emails']
+
+    def recipients(self, obj):
+        return ', '.join(obj.to)
+
+    def has_add_permission(self, request):
+        # Emails come from queue_email()
+        return False
+
+    def retry_emails(self, request, queryset):
+        updated = queryset.filter(status='failed').update(
+            status='pending', attempts=0, next_attempt_at=timezone.now(), last_error='',
+        )
+        self.message_user(request, f'{updated} failed email(s) queued again.')
+    retry_emails.short_description = 'Retry failed emails'
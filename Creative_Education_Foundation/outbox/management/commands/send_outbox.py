@@ -0,0 +1,43 @@
+import signal
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from outbox.sender import OutboxSender
+
+
+class Command(BaseCommand):
+    help = (
+        'Send the queued emails of the outbox in batches over one SMTP connection. '
+        'Exits once the outbox is empty, or keeps polling with --loop; SIGTERM stops after the current email.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep running instead of exiting when empty')
+        parser.add_argument('--batch-size', type=int, default=settings.OUTBOX_BATCH_SIZE)
+        parser.add_argument('--rate', type=float, default=settings.OUTBOX_RATE_LIMIT,
+                            help='Most emails sent per second (0: no limit)')
+        parser.add_argument('--poll-interval', type=float, default=settings.OUTBOX_POLL_INTERVAL,
+                            help='Seconds between looks at an empty outbox with --loop')
+
+    def handle(self, *args, **options):
+        stop = threading.Event()
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, lambda *_: stop.set())
+
+        sender = OutboxSender(batch_size=options['batch_size'], rate=options['rate'])
+        try:
+            while not stop.is_set():
+                if sender.send_batch(stop):
+                    continue
+                if not options['loop']:
+                    break
+                # Nothing to send: don't hold the SMTP connection while idle
+                sender.close()
+                stop.wait(options['poll_interval'])
+        finally:
+            sender.close()
+
+        outcomes = ', '.join(f'{count} {status}' for status, count in sorted(sender.outcomes.items()))
+        self.stdout.write(self.style.SUCCESS(f'Outbox: {outcomes or "nothing to send"}.'))
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 11:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('outbox', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outboxemail',
+            name='batch',
+            field=models.CharField(blank=True, db_index=True, max_length=100),
+        ),
+    ]
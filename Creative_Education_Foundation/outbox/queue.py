@@ -0,0 +1,70 @@
+"""
+Transactional email outbox.
+
+Views don't talk to SMTP: queue_email() adds a row to OutboxEmail in the
+same transaction as the event the email is about, so the email exists
+exactly when the event does and the request pays for one INSERT:
+
+    with transaction.atomic():
+        enrollment.save()
+        queue_email([user.email], 'Enrollment confirmed', body, dedup_key=f'enrollment-confirmed:{enrollment.id}')
+
+send_outbox (outbox.sender) delivers them. A dedup_key makes queueing
+idempotent: a second email with the same key is dropped by the INSERT
+itself, so retried requests and double-clicks don't send twice.
+
+Fan-outs to many recipients render their template once with personalizer()
+and queue the emails in chunks with queue_emails().
+"""
+from django.conf import settings
+from django.template.loader import render_to_string
+
+from .models import OutboxEmail
+
+
+def build_email(to, subject, body, html_body='', from_email=None, dedup_key=None, batch=''):
+    """An unsaved OutboxEmail, for queue_emails()"""
+    return OutboxEmail(
+        dedup_key=dedup_key,
+        to=[to] if isinstance(to, str) else list(to),
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        subject=subject,
+        body=body,
+        html_body=html_body,
+        batch=batch,
+    )
+
+
+def queue_emails(emails):
+    """Queue many build_email()s in one INSERT, skipping those whose dedup_key was used before"""
+    # INSERT IGNORE / ON CONFLICT DO NOTHING on the unique dedup_key: no
+    # SELECT first, and no race between two requests queueing the same key
+    OutboxEmail.objects.bulk_create(emails, ignore_conflicts=True)
+
+
+def queue_email(to, subject, body, html_body='', from_email=None, dedup_key=None):
+    """Queue one email (to: address or list of addresses); one INSERT, none when dedup_key was used before"""
+    queue_emails([build_email(to, subject, body, html_body, from_email, dedup_key)])
+
+
+def queue_template_email(to, subject, template_name, context, dedup_key=None):
+    """Queue an email whose body is rendered from emails/<template_name>.txt"""
+    queue_email(to, subject, render_to_string(f'emails/{template_name}.txt', context), dedup_key=dedup_key)
+
+
+def personalizer(template_name, context, fields):
+    """
+    Render emails/<template_name>.txt once for many recipients. Returns
+    body(**values), which fills in the per-recipient `fields` with plain
+    string replacement: the template uses them as bare {{ field }}, without
+    filters.
+    """
+    markers = {field: f'\x1f{field}\x1f' for field in fields}
+    rendered = render_to_string(f'emails/{template_name}.txt', {**context, **markers})
+
+    def body(**values):
+        text = rendered
+        for field, marker in markers.items():
+            text = text.replace(marker, str(values[field]))
+        return text
+    return body
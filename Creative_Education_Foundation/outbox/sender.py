@@ -0,0 +1,164 @@
+"""
+Delivery of the outbox (manage.py send_outbox).
+
+A sender claims batches of due emails with SELECT ... FOR UPDATE SKIP LOCKED
+(several senders never claim the same email) and sends them one by one over
+a single SMTP connection, kept open for as long as there is mail and
+reopened when the server drops it, so a batch pays for one TCP + TLS
+handshake and login instead of one per email. Sends are spaced to stay
+under OUTBOX_RATE_LIMIT per second.
+
+Temporary failures (4xx replies, network errors) are retried with backoff
+up to OUTBOX_MAX_ATTEMPTS; permanent ones (5xx, e.g. a refused recipient)
+fail at once. Delivery is at least once: if a sender dies between the
+server accepting an email and marking it sent, the email goes out again
+after OUTBOX_LEASE seconds.
+"""
+from datetime import timedelta
+import logging
+import smtplib
+import time
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from jobs.queue import backoff, skip_locked
+from jobs.worker import worker_name
+
+from .models import OutboxEmail
+
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimiter:
+    """Spaces calls of wait() at least 1/rate seconds apart (rate 0: no limit)"""
+
+    def __init__(self, rate, clock=time.monotonic, sleep=time.sleep):
+        self.interval = 1 / rate if rate else 0
+        self.clock = clock
+        self.sleep = sleep
+        self.next_at = 0
+
+    def wait(self):
+        now = self.clock()
+        if now < self.next_at:
+            self.sleep(self.next_at - now)
+            now = self.next_at
+        self.next_at = now + self.interval
+
+
+def claim_emails(sender, limit, now=None):
+    """Lock up to `limit` due emails for `sender`, oldest first"""
+    now = now or timezone.now()
+    with transaction.atomic():
+        due = skip_locked(
+            OutboxEmail.objects.filter(status='pending', next_attempt_at__lte=now).order_by('next_attempt_at', 'id')
+        )
+        claimed_ids = list(due.values_list('id', flat=True)[:limit])
+        if claimed_ids:
+            OutboxEmail.objects.filter(id__in=claimed_ids).update(
+                status='sending', locked_by=sender, locked_at=now, attempts=F('attempts') + 1,
+            )
+    if not claimed_ids:
+        return []
+    return list(OutboxEmail.objects.filter(id__in=claimed_ids).order_by('next_attempt_at', 'id'))
+
+
+def requeue_stale_emails(now=None):
+    """Put back the emails of senders that died mid-batch; returns how many"""
+    now = now or timezone.now()
+    return OutboxEmail.objects.filter(
+        status='sending', locked_at__lt=now - timedelta(seconds=settings.OUTBOX_LEASE),
+    ).update(status='pending', locked_by='', locked_at=None, next_attempt_at=now)
+
+
+def is_permanent(exc):
+    """Whether the server refused for good (5xx), so retrying is pointless"""
+    if isinstance(exc, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in exc.recipients.values())
+    if isinstance(exc, smtplib.SMTPResponseException):
+        return exc.smtp_code >= 500
+    return False
+
+
+def build_message(email):
+    message = EmailMultiAlternatives(
+        subject=email.subject, body=email.body, from_email=email.from_email, to=email.to,
+        headers={'X-Outbox-Id': str(email.id)},
+    )
+    if email.html_body:
+        message.attach_alternative(email.html_body, 'text/html')
+    return message
+
+
+class OutboxSender:
+    def __init__(self, batch_size=None, rate=None, name=None):
+        self.batch_size = batch_size or settings.OUTBOX_BATCH_SIZE
+        self.limiter = RateLimiter(settings.OUTBOX_RATE_LIMIT if rate is None else rate)
+        self.name = name or worker_name()
+        self.connection = get_connection(fail_silently=False)
+        self.outcomes = {}
+
+    def close(self):
+        try:
+            self.connection.close()
+        except (OSError, smtplib.SMTPException):
+            # Closing a connection the server already dropped
+            pass
+
+    def send(self, message):
+        self.limiter.wait()
+        try:
+            # Opens the connection if it isn't, and leaves it open
+            self.connection.open()
+            self.connection.send_messages([message])
+        except smtplib.SMTPServerDisconnected:
+            # Idle connections get dropped by the server: reconnect once
+            self.close()
+            self.connection.open()
+            self.connection.send_messages([message])
+
+    def deliver(self, email):
+        """Send one claimed email and record the outcome; returns the new status"""
+        mine = OutboxEmail.objects.filter(id=email.id, status='sending', locked_by=self.name)
+        try:
+            self.send(build_message(email))
+        except Exception as exc:
+            if not isinstance(exc, (smtplib.SMTPResponseException, smtplib.SMTPRecipientsRefused)):
+                # Network trouble: start the next email on a fresh connection
+                self.close()
+            error = f'{type(exc).__name__}: {exc}'
+            if is_permanent(exc) or email.attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+                logger.error('Outbox email %s failed for good: %s', email.id, error)
+                status = 'failed'
+                mine.update(status=status, last_error=error, locked_by='', locked_at=None)
+            else:
+                logger.warning('Outbox email %s failed, attempt %d: %s', email.id, email.attempts, error)
+                status = 'pending'
+                mine.update(
+                    status=status, last_error=error, locked_by='', locked_at=None,
+                    next_attempt_at=timezone.now() + timedelta(seconds=backoff(email.attempts)),
+                )
+        else:
+            status = 'sent'
+            mine.update(status=status, sent_at=timezone.now(), locked_by='', locked_at=None)
+        self.outcomes[status] = self.outcomes.get(status, 0) + 1
+        return status
+
+    def send_batch(self, stop=None):
+        """Deliver one batch of due emails, return how many were claimed; stops early once `stop` is set"""
+        requeue_stale_emails()
+        emails = claim_emails(self.name, self.batch_size)
+        for number, email in enumerate(emails):
+            if stop is not None and stop.is_set():
+                # Hand the rest back instead of leaving them to the lease
+                OutboxEmail.objects.filter(
+                    id__in=[unsent.id for unsent in emails[number:]], status='sending', locked_by=self.name,
+                ).update(status='pending', locked_by='', locked_at=None, attempts=F('attempts') - 1)
+                break
+            self.deliver(email)
+        return len(emails)
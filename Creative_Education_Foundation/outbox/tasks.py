@@ -0,0 +1,16 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from jobs.queue import task
+
+from .models import OutboxEmail
+
+
+@task
+def prune_sent_emails(days=None):
+    """Delete emails sent more than OUTBOX_KEEP_SENT_DAYS ago; failed ones stay for the admin"""
+    days = settings.OUTBOX_KEEP_SENT_DAYS if days is None else days
+    deleted, _ = OutboxEmail.objects.filter(status='sent', sent_at__lt=timezone.now() - timedelta(days=days)).delete()
+    return deleted
@@ -0,0 +1,159 @@
+import socketserver
+import threading
+
+from django.db import connection, transaction
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from .models import OutboxEmail
+from .queue import queue_email
+from .sender import OutboxSender, RateLimiter
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    """Just enough SMTP for smtplib: no TLS, no auth"""
+
+    def reply(self, line):
+        self.wfile.write(f'{line}\r\n'.encode())
+
+    def handle(self):
+        server = self.server
+        server.connections += 1
+        self.reply('220 stand-in ESMTP')
+        recipients = []
+        delivered = 0
+        while line := self.rfile.readline():
+            command = line.decode().strip()
+            verb = command[:4].upper()
+            if verb in ('EHLO', 'HELO'):
+                self.reply('250 stand-in')
+            elif verb in ('MAIL', 'RSET'):
+                recipients = []
+                self.reply('250 OK')
+            elif verb == 'RCPT':
+                address = command.split(':', 1)[1].strip().strip('<>')
+                if address in server.refuse:
+                    self.reply(server.refuse[address])
+                else:
+                    recipients.append(address)
+                    self.reply('250 OK')
+            elif verb == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                data = b''.join(iter(lambda: self.rfile.readline(), b'.\r\n'))
+                server.messages.append((recipients, data.decode()))
+                self.reply('250 OK queued')
+                delivered += 1
+                if delivered == server.messages_per_connection:
+                    # Hang up like a server with a per-connection limit
+                    return
+            elif verb == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Not implemented')
+
+
+class SMTPStandIn(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), SMTPHandler)
+        self.connections = 0
+        self.messages = []
+        self.refuse = {}
+        self.messages_per_connection = None
+
+
+class QueueEmailTests(TestCase):
+    def test_one_insert_and_dedup(self):
+        with CaptureQueriesContext(connection) as context:
+            queue_email('student@example.com', 'Welcome', 'Hello', dedup_key='welcome:1')
+        self.assertEqual(len(context.captured_queries), 1)
+
+        queue_email(['student@example.com'], 'Welcome again', 'Hello', dedup_key='welcome:1')
+        queue_email('student@example.com', 'No key', 'Hello')
+        queue_email('student@example.com', 'No key', 'Hello')
+        self.assertEqual(OutboxEmail.objects.filter(dedup_key='welcome:1').get().subject, 'Welcome')
+        self.assertEqual(OutboxEmail.objects.filter(dedup_key=None).count(), 2)
+
+    def test_rolled_back_event_sends_nothing(self):
+        with self.assertRaises(ZeroDivisionError), transaction.atomic():
+            queue_email('student@example.com', 'Enrollment confirmed', 'Hello')
+            1 / 0
+        self.assertFalse(OutboxEmail.objects.exists())
+
+
+class SenderTests(TestCase):
+    def setUp(self):
+        self.server = SMTPStandIn()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.enterContext(self.settings(
+            EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+            EMAIL_HOST='127.0.0.1', EMAIL_PORT=self.server.server_address[1],
+            EMAIL_USE_TLS=False, EMAIL_HOST_USER='', EMAIL_HOST_PASSWORD='',
+            OUTBOX_MAX_ATTEMPTS=3,
+        ))
+
+    def send_all(self, count):
+        for number in range(count):
+            queue_email(f'student{number}@example.com', f'Email {number}', 'Hello')
+        sender = OutboxSender(rate=0)
+        sender.send_batch()
+        sender.close()
+        return sender
+
+    def test_batch_over_one_connection(self):
+        sender = self.send_all(5)
+        self.assertEqual(sender.outcomes, {'sent': 5})
+        self.assertEqual(self.server.connections, 1)
+        self.assertEqual([recipients for recipients, _ in self.server.messages],
+                         [[f'student{number}@example.com'] for number in range(5)])
+        self.assertIn('X-Outbox-Id:', self.server.messages[0][1])
+        self.assertFalse(OutboxEmail.objects.exclude(status='sent').exists())
+
+    def test_reconnects_when_the_server_hangs_up(self):
+        self.server.messages_per_connection = 2
+        sender = self.send_all(5)
+        self.assertEqual(sender.outcomes, {'sent': 5})
+        self.assertEqual(len(self.server.messages), 5)
+        self.assertEqual(self.server.connections, 3)
+
+    def test_temporary_failures_retry_and_permanent_ones_fail(self):
+        self.server.refuse = {'later@example.com': '451 Try again later', 'nobody@example.com': '550 No such user'}
+        for address in ('later@example.com', 'nobody@example.com', 'student@example.com'):
+            queue_email(address, 'Hello', 'Hello', dedup_key=address)
+
+        sender = OutboxSender(rate=0)
+        sender.send_batch()
+        self.assertEqual(sender.outcomes, {'pending': 1, 'failed': 1, 'sent': 1})
+        later = OutboxEmail.objects.get(dedup_key='later@example.com')
+        self.assertEqual(later.attempts, 1)
+        self.assertGreater(later.next_attempt_at, timezone.now())
+        self.assertIn('451', later.last_error)
+
+        # Out of attempts, a temporary failure fails for good too
+        OutboxEmail.objects.filter(id=later.id).update(attempts=2, next_attempt_at=timezone.now())
+        sender.send_batch()
+        sender.close()
+        self.assertEqual(OutboxEmail.objects.get(id=later.id).status, 'failed')
+
+
+class RateLimiterTests(TestCase):
+    def test_spaces_sends(self):
+        now = [100.0]
+        slept = []
+
+        def sleep(seconds):
+            slept.append(round(seconds, 3))
+            now[0] += seconds
+
+        limiter = RateLimiter(4, clock=lambda: now[0], sleep=sleep)
+        for _ in range(3):
+            limiter.wait()
+        now[0] += 1
+        limiter.wait()
+        self.assertEqual(slept, [0.25, 0.25])
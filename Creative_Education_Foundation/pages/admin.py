@@ -1,8 +1,13 @@
 from django.contrib import admin
+from django.db.models import Count
 from django.utils.html import format_html
 from django.urls import reverse
 from django.utils.safestring import mark_safe
-from .models import Vacancy, VacancyApplication, PaymentLog
+from . import page_cache
+from django.db import transaction
+from outbox.models import OutboxEmail
+from .models import ApplicantNotification, Vacancy, VacancyApplication, PaymentLog
+from .tasks import notify_applicants
 from courses.models import CoursePaymentLog, CourseEnrollment, Course
 from accounts.models import UserProfile
 from .models import Question
@@ -44,21 +49,27 @@ class VacancyAdmin(admin.ModelAdmin):
         }),
     )
     
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(_applications_count=Count('applications'))
+    
     def applications_count(self, obj):
-        count = obj.applications.count()
         url = reverse('admin:pages_vacancyapplication_changelist') + f'?vacancy__id__exact={obj.id}'
-        return format_html('<a href="{}">{} applications</a>', url, count)
+        return format_html('<a href="{}">{} applications</a>', url, obj._applications_count)
     applications_count.short_description = 'Applications'
+    applications_count.admin_order_field = '_applications_count'
     
     actions = ['activate_vacancies', 'deactivate_vacancies']
     
     def activate_vacancies(self, request, queryset):
         updated = queryset.update(is_active=True)
+        # update() bypasses post_save, so refresh cached vacancy pages by hand
+        page_cache.touch('vacancies')
         self.message_user(request, f'{updated} vacancies activated.')
     activate_vacancies.short_description = 'Activate selected vacancies'
     
     def deactivate_vacancies(self, request, queryset):
         updated = queryset.update(is_active=False)
+        page_cache.touch('vacancies')
         self.message_user(request, f'{updated} vacancies deactivated.')
     deactivate_vacancies.short_description = 'Deactivate selected vacancies'
 
@@ -82,6 +93,7 @@ class VacancyApplicationAdmin(admin.ModelAdmin):
     readonly_fields = ['vacancy', 'full_name', 'email', 'phone', 'cv_link', 'cv_size', 
                        'khalti_transaction_id', 'khalti_payment_token', 'payment_date', 
                        'applied_at', 'updated_at']
+    list_select_related = ['vacancy']
     date_hierarchy = 'applied_at'
     inlines = [PaymentLogInline]
     
@@ -138,27 +150,69 @@ class VacancyApplicationAdmin(admin.ModelAdmin):
     
     actions = ['mark_under_review', 'mark_shortlisted', 'mark_accepted', 'mark_rejected']
     
+    def set_status(self, request, queryset, status, done_message):
+        """Update the applications not yet in `status` and enqueue the emails telling them"""
+        with transaction.atomic():
+            changed_ids = list(queryset.exclude(status=status).values_list('id', flat=True))
+            updated = VacancyApplication.objects.filter(id__in=changed_ids).update(status=status)
+            if changed_ids:
+                notification = ApplicantNotification.objects.create(
+                    status=status, application_ids=changed_ids, total=len(changed_ids), requested_by=request.user,
+                )
+                notify_applicants.enqueue(notification.id)
+        if not changed_ids:
+            self.message_user(request, 'No applications changed, so nobody was notified.')
+            return
+        self.message_user(request, format_html(
+            '{} {} <a href="{}">Track the applicant emails</a>.', updated, done_message,
+            reverse('admin:pages_applicantnotification_change', args=[notification.id]),
+        ))
+    
     def mark_under_review(self, request, queryset):
-        updated = queryset.update(status='under_review')
-        self.message_user(request, f'{updated} applications marked as under review.')
+        self.set_status(request, queryset, 'under_review', 'applications marked as under review.')
     mark_under_review.short_description = 'Mark as Under Review'
     
     def mark_shortlisted(self, request, queryset):
-        updated = queryset.update(status='shortlisted')
-        self.message_user(request, f'{updated} applications shortlisted.')
+        self.set_status(request, queryset, 'shortlisted', 'applications shortlisted.')
     mark_shortlisted.short_description = 'Mark as Shortlisted'
     
     def mark_accepted(self, request, queryset):
-        updated = queryset.update(status='accepted')
-        self.message_user(request, f'{updated} applications accepted.')
+        self.set_status(request, queryset, 'accepted', 'applications accepted.')
     mark_accepted.short_description = 'Mark as Accepted'
     
     def mark_rejected(self, request, queryset):
-        updated = queryset.update(status='rejected')
-        self.message_user(request, f'{updated} applications rejected.')
+        self.set_status(request, queryset, 'rejected', 'applications rejected.')
     mark_rejected.short_description = 'Mark as Rejected'
 
 
+@admin.register(ApplicantNotification)
+class ApplicantNotificationAdmin(admin.ModelAdmin):
+    list_display = ['id', 'status', 'total', 'progress', 'state', 'requested_by', 'created_at', 'finished_at']
+    list_filter = ['status', 'state', 'created_at']
+    list_select_related = ['requested_by']
+    readonly_fields = [
+        'status', 'requested_by', 'state', 'total', 'queued', 'progress', 'delivery', 'created_at', 'finished_at',
+    ]
+    exclude = ['application_ids']
+    date_hierarchy = 'created_at'
+    
+    def progress(self, obj):
+        percent = round(100 * obj.queued / obj.total) if obj.total else 100
+        return f'{obj.queued}/{obj.total} queued ({percent}%)'
+    progress.short_description = 'Progress'
+    
+    def delivery(self, obj):
+        """Where this notification's emails are in the outbox"""
+        counts = dict(
+            OutboxEmail.objects.filter(batch=obj.batch).values_list('status').annotate(count=Count('id')).order_by()
+        )
+        return ', '.join(f'{count} {status}' for status, count in counts.items() if count)
+    delivery.short_description = 'Emails'
+    
+    def has_add_permission(self, request):
+        return False
+
+
 @admin.register(PaymentLog)
 class PaymentLogAdmin(admin.ModelAdmin):
     list_display = ['transaction_id', 'application_name', 'amount', 'status', 
@@ -167,11 +221,13 @@ class PaymentLogAdmin(admin.ModelAdmin):
     search_fields = ['transaction_id', 'application__full_name', 'application__email']
     readonly_fields = ['application', 'transaction_id', 'amount', 'status', 
                        'payment_method', 'response_data', 'created_at']
+    list_select_related = ['application']
     date_hierarchy = 'created_at'
     
     def application_name(self, obj):
         return obj.application.full_name
     application_name.short_description = 'Applicant'
+    application_name.admin_order_field = 'application__full_name'
     
     def has_add_permission(self, request):
         return False
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 11:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pages', '0004_applicantnotification'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vacancyapplication',
+            name='cv_sha256',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.7 on 2026-10-18 11:09
+
+import blobs.storage
+import django.core.validators
+import pages.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pages', '0005_vacancyapplication_cv_sha256'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='vacancyapplication',
+            name='cv',
+            field=models.FileField(storage=blobs.storage.ContentAddressedStorage(), upload_to='applications/cvs/', validators=[django.core.validators.FileExtensionValidator(allowed_extensions=['pdf']), pages.models.validate_cv_size]),
+        ),
+    ]
@@ -3,6 +3,8 @@ from django.core.validators import FileExtensionValidator
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 
+from blobs.storage import ContentAddressedStorage
+
 
 
 # models.py
@@ -72,6 +74,9 @@ class Vacancy(models.Model):
     class Meta:
         ordering = ['-created_at']
         verbose_name_plural = 'Vacancies'
+        indexes = [
+            models.Index(fields=['-created_at', '-id', 'is_active'], name='vacancy_active_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.title} - {self.company_name}"
@@ -105,13 +110,17 @@ class VacancyApplication(models.Model):
     full_name = models.CharField(max_length=200)
     email = models.EmailField()
     phone = models.CharField(max_length=20)
+    # Stored once per content: applications/cvs/<sha256 sharded>.pdf
     cv = models.FileField(
-        upload_to='applications/cvs/%Y/%m/',
+        upload_to='applications/cvs/',
+        storage=ContentAddressedStorage(),
         validators=[
             FileExtensionValidator(allowed_extensions=['pdf']),
             validate_cv_size,
         ]
     )
+    # SHA-256 of the CV, computed while it was uploaded (pages.uploads)
+    cv_sha256 = models.CharField(max_length=64, blank=True, editable=False)
     
     # Application status
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
@@ -162,4 +171,43 @@ class PaymentLog(models.Model):
         ordering = ['-created_at']
     
     def __str__(self):
-        return f"{self.transaction_id} - {self.status}"
\ No newline at end of file
+        return f"{self.transaction_id} - {self.status}"
+
+class ApplicantNotification(models.Model):
+    """
+    One status change of a set of applications from the admin, and the
+    progress of telling those applicants (pages.tasks.notify_applicants)
+    """
+    STATE_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+    ]
+
+    status = models.CharField(max_length=20, choices=VacancyApplication.STATUS_CHOICES)
+    application_ids = models.JSONField(default=list)
+    requested_by = models.ForeignKey(
+        'auth.User', on_delete=models.SET_NULL, blank=True, null=True, related_name='applicant_notifications'
+    )
+    state = models.CharField(max_length=10, choices=STATE_CHOICES, default='queued')
+    total = models.PositiveIntegerField(default=0)
+    # Emails handed to the outbox so far
+    queued = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.get_status_display()} notice to {self.total} applicant(s)"
+
+    @property
+    def batch(self):
+        """OutboxEmail.batch of this notification's emails"""
+        return f'applicant-notification:{self.pk}'
+
+    def dedup_key(self, application_id):
+        # One email per application and notification: a retried job skips
+        # those already queued, while every later status change is sent
+        return f'application-status:{self.pk}:{application_id}'
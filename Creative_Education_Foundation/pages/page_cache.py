@@ -0,0 +1,211 @@
+"""
+Shared page cache with per-user fragment hole-punching.
+
+Public pages (home, online classes, course detail, vacancies) are rendered
+once as a user-independent "shell" and cached under the URL and the current
+content versions. Everything that depends on the visitor (nav and account
+menu, messages, CSRF-protected forms, the enrollment box) is wrapped in
+{% user_fragment %} in the templates; in a shell it becomes a placeholder, and
+on every request the placeholders are filled by rendering just those small
+fragment templates for the real user. Anonymous and logged-in visitors
+therefore share one cached shell.
+
+Content versions are last-modified timestamps kept in the cache and moved
+forward from signals (pages.signals): 'courses' from Course.updated_at and
+catalog refreshes, 'vacancies' from Vacancy.updated_at, 'questions' from
+answered Questions. Two are computed on the fly: 'timetable' (when the most
+recent class started, so "next class" times refresh) and 'date' (local
+midnight, for deadlines). A change moves the version, which changes the shell
+key; old shells simply expire.
+
+Responses carry an ETag (the spliced page minus CSRF tokens) and, for
+anonymous visitors without pending messages, a Last-Modified header, and
+conditional GETs are answered with 304.
+"""
+import base64
+from functools import wraps
+import hashlib
+import json
+import re
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Max
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+
+SHELL_CACHE_KEY = 'pages:shell:{versions}:{url}'
+VERSION_CACHE_KEY = 'pages:content:{scope}'
+
+FRAGMENT_RE = re.compile(r'<!--user-fragment:([A-Za-z0-9_\-]+=*)-->')
+CSRF_INPUT_RE = re.compile(r'<input type="hidden" name="csrfmiddlewaretoken" value="[^"]*">')
+
+
+def _latest(queryset, field):
+    latest = queryset.aggregate(latest=Max(field))['latest']
+    return latest.timestamp() if latest else 0.0
+
+
+def _stored_version(scope):
+    """Last-modified timestamp of a stored scope, from the database"""
+    from courses.models import Course
+    from .models import Question, Vacancy
+
+    if scope == 'courses':
+        return _latest(Course.objects.all(), 'updated_at')
+    if scope == 'vacancies':
+        return _latest(Vacancy.objects.all(), 'updated_at')
+    if scope == 'questions':
+        return _latest(Question.objects.filter(answered=True), 'updated_at')
+    raise ValueError(f'Unknown page cache scope: {scope}')
+
+
+def _computed_version(scope, now):
+    if scope == 'timetable':
+        from courses import timetable
+        last_start = timetable.get_timetable().last_start_before(now)
+        return last_start.timestamp() if last_start else 0.0
+    if scope == 'date':
+        midnight = timezone.localtime(now).replace(hour=0, minute=0, second=0, microsecond=0)
+        return midnight.timestamp()
+    return None
+
+
+def content_versions(scopes, now=None):
+    """Current last-modified timestamp of every scope"""
+    now = now or timezone.now()
+    versions = {}
+    stored = []
+    for scope in scopes:
+        version = _computed_version(scope, now)
+        if version is None:
+            stored.append(scope)
+        else:
+            versions[scope] = version
+
+    keys = {VERSION_CACHE_KEY.format(scope=scope): scope for scope in stored}
+    cached = cache.get_many(keys)
+    for key, scope in keys.items():
+        if key in cached:
+            versions[scope] = cached[key]
+        else:
+            versions[scope] = _stored_version(scope)
+            cache.add(key, versions[scope], timeout=None)
+    return versions
+
+
+def touch(scope, when=None):
+    """Move a scope's version forward (never backwards) to when/now"""
+    key = VERSION_CACHE_KEY.format(scope=scope)
+    version = (when or timezone.now()).timestamp()
+    cache.set(key, max(version, cache.get(key, 0.0)), timeout=None)
+
+
+def fragment_kwargs(kwargs):
+    """
+    Fragment arguments as they come out of a placeholder (Decimals and dates
+    become strings), so a fragment renders the same with or without the cache
+    """
+    return json.loads(json.dumps(kwargs, cls=DjangoJSONEncoder))
+
+
+def fragment_placeholder(template_name, kwargs):
+    payload = json.dumps([template_name, kwargs], cls=DjangoJSONEncoder, separators=(',', ':'))
+    return f'<!--user-fragment:{base64.urlsafe_b64encode(payload.encode()).decode()}-->'
+
+
+def splice(html, request):
+    """Fill a shell's placeholders by rendering each fragment for this request"""
+    def render_fragment(match):
+        template_name, kwargs = json.loads(base64.urlsafe_b64decode(match.group(1)))
+        return render_to_string(template_name, kwargs, request=request)
+    return FRAGMENT_RE.sub(render_fragment, html)
+
+
+def _render_shell(view, request, args, kwargs):
+    """Render the view as an anonymous visitor with fragments left as placeholders"""
+    user = request.user
+    summary = request.__dict__.pop('_enrollment_summary', None)
+    request.user = AnonymousUser()
+    request.page_cache_shell = True
+    try:
+        response = view(request, *args, **kwargs)
+        if hasattr(response, 'render') and callable(response.render):
+            response = response.render()
+    finally:
+        request.user = user
+        request.page_cache_shell = False
+        request.__dict__.pop('_enrollment_summary', None)
+        if summary is not None:
+            request._enrollment_summary = summary
+    return response
+
+
+def _is_cacheable(response):
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+        and response.get('Content-Type', '').startswith('text/html')
+        # A CSRF token outside a fragment would be shared between visitors
+        and b'csrfmiddlewaretoken' not in response.content
+    )
+
+
+def page_cache(*scopes):
+    """
+    Serve a view from a cached shell that is re-rendered when one of the
+    given content scopes changes. Use with method_decorator(..., name='dispatch')
+    on class-based views.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            # Without AuthenticationMiddleware there is no visitor to splice for
+            if request.method not in ('GET', 'HEAD') or not hasattr(request, 'user'):
+                return view(request, *args, **kwargs)
+
+            versions = content_versions(scopes)
+            key = SHELL_CACHE_KEY.format(
+                versions=hashlib.md5(repr(sorted(versions.items())).encode()).hexdigest(),
+                url=hashlib.md5(request.build_absolute_uri().encode()).hexdigest(),
+            )
+            shell = cache.get(key)
+            cache_status = 'HIT'
+            if shell is None:
+                cache_status = 'MISS'
+                response = _render_shell(view, request, args, kwargs)
+                if not _is_cacheable(response):
+                    # Render it properly for this visitor instead
+                    return view(request, *args, **kwargs)
+                shell = {
+                    'content': response.content.decode(response.charset),
+                    'content_type': response['Content-Type'],
+                }
+                cache.set(key, shell, timeout=settings.PAGE_CACHE_TIMEOUT)
+
+            body = splice(shell['content'], request)
+            etag = quote_etag(hashlib.md5(CSRF_INPUT_RE.sub('', body).encode()).hexdigest())
+            last_modified = None
+            if not request.user.is_authenticated and not len(get_messages(request)):
+                last_modified = int(max(versions.values(), default=0)) or None
+
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = HttpResponse(body, content_type=shell['content_type'])
+            response['ETag'] = etag
+            if last_modified:
+                response['Last-Modified'] = http_date(last_modified)
+            response['X-Page-Cache'] = cache_status
+            patch_cache_control(response, private=True, no_cache=True)
+            patch_vary_headers(response, ['Cookie'])
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,46 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from courses.models import Course, CourseCatalogEntry
+from . import page_cache
+from .models import Question, Vacancy
+
+
+@receiver(post_save, sender=Course)
+def course_saved(sender, instance, **kwargs):
+    """Cached course pages are stale from the course's updated_at on"""
+    page_cache.touch('courses', instance.updated_at)
+
+
+@receiver(post_save, sender=CourseCatalogEntry)
+def catalog_entry_saved(sender, instance, **kwargs):
+    """Ratings and admin bulk actions only reach the catalog rows"""
+    page_cache.touch('courses', instance.refreshed_at)
+
+
+@receiver(post_delete, sender=Course)
+def course_deleted(sender, instance, **kwargs):
+    page_cache.touch('courses')
+
+
+@receiver(post_save, sender=Vacancy)
+def vacancy_saved(sender, instance, **kwargs):
+    page_cache.touch('vacancies', instance.updated_at)
+
+
+@receiver(post_delete, sender=Vacancy)
+def vacancy_deleted(sender, instance, **kwargs):
+    page_cache.touch('vacancies')
+
+
+@receiver(post_save, sender=Question)
+def question_saved(sender, instance, created, **kwargs):
+    """Only answered questions are shown (new questions are unanswered)"""
+    if instance.answered or not created:
+        page_cache.touch('questions', instance.updated_at)
+
+
+@receiver(post_delete, sender=Question)
+def question_deleted(sender, instance, **kwargs):
+    if instance.answered:
+        page_cache.touch('questions')
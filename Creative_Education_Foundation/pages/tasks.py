@@ -0,0 +1,54 @@
+"""
+Background jobs of the pages app (see jobs.queue).
+
+notify_applicants() tells the applicants of an ApplicantNotification about
+their new status. It renders the email once per vacancy and fills in each
+name by string replacement. Emails go to the outbox CHUNK_SIZE at a time,
+as one INSERT each, and send_outbox delivers them over a reused connection.
+The dedup keys (one per notification and application) make a retried job
+skip anyone already told.
+"""
+from django.utils import timezone
+
+from jobs.queue import task
+from outbox.queue import build_email, personalizer, queue_emails
+
+from .models import ApplicantNotification, VacancyApplication
+
+
+CHUNK_SIZE = 500
+
+
+@task
+def notify_applicants(notification_id):
+    notification = ApplicantNotification.objects.get(id=notification_id)
+    if notification.state == 'done':
+        return notification.queued
+    ApplicantNotification.objects.filter(id=notification.id).update(state='running')
+
+    bodies = {}
+    application_ids = notification.application_ids
+    for start in range(0, len(application_ids), CHUNK_SIZE):
+        applications = VacancyApplication.objects.filter(
+            id__in=application_ids[start:start + CHUNK_SIZE],
+        ).select_related('vacancy').only('id', 'full_name', 'email', 'vacancy__title', 'vacancy__start_date')
+
+        emails = []
+        for application in applications:
+            vacancy = application.vacancy
+            if vacancy.id not in bodies:
+                bodies[vacancy.id] = personalizer(
+                    'application_status', {'vacancy': vacancy, 'status': notification.status}, ['full_name'],
+                )
+            emails.append(build_email(
+                application.email, f'Your application for {vacancy.title}',
+                bodies[vacancy.id](full_name=application.full_name),
+                dedup_key=notification.dedup_key(application.id),
+                batch=notification.batch,
+            ))
+        queue_emails(emails)
+        notification.queued = min(start + CHUNK_SIZE, len(application_ids))
+        ApplicantNotification.objects.filter(id=notification.id).update(queued=notification.queued)
+
+    ApplicantNotification.objects.filter(id=notification.id).update(state='done', finished_at=timezone.now())
+    return notification.queued
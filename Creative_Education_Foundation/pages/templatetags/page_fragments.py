@@ -0,0 +1,23 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from pages.page_cache import fragment_kwargs, fragment_placeholder
+
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def user_fragment(context, template_name, **kwargs):
+    """
+    Include a per-visitor fragment. While a cached page shell is being rendered
+    (pages.page_cache) this leaves a placeholder that is filled per request, so
+    kwargs must be JSON serializable (ids, strings, numbers).
+    """
+    request = context.get('request')
+    if getattr(request, 'page_cache_shell', False):
+        return mark_safe(fragment_placeholder(template_name, kwargs))
+
+    fragment = context.template.engine.get_template(template_name)
+    with context.push(**fragment_kwargs(kwargs)):
+        return fragment.render(context)
@@ -1,3 +1,372 @@
-from django.test import TestCase
+from datetime import timedelta
+import hashlib
+from unittest.mock import patch
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from prometheus_client import REGISTRY
+
+from accounts.models import UserProfile
+from courses.models import Course, CourseEnrollment
+from jobs.models import Job
+from jobs.queue import claim_jobs, run_job
+from my_project.testing import GIF, URLQueryBudgetMixin
+from outbox.models import OutboxEmail
+from outbox.queue import personalizer
+from .models import ApplicantNotification, PaymentLog, Question, Vacancy, VacancyApplication
+from .tasks import notify_applicants
+from .uploads import CVUploadHandler
+from .urls import urlpatterns
+
 
 # Create your tests here.
+
+@override_settings(MEDIA_ROOT='/tmp/test_media')
+class AdminChangelistQueryTests(TestCase):
+    """Changelists must run a fixed number of queries, however many rows they show"""
+    MAX_QUERIES = 12
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin_user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+
+    def setUp(self):
+        self.client.force_login(self.admin_user)
+
+    def add_rows(self, count):
+        today = timezone.now().date()
+        start = Vacancy.objects.count()
+        for i in range(start, start + count):
+            vacancy = Vacancy.objects.create(
+                title=f'Vacancy {i}', salary=10000, start_date=today, deadline=today + timedelta(days=30),
+                description='Description', requirements='Requirements', responsibilities='Responsibilities',
+            )
+            application = VacancyApplication.objects.create(
+                vacancy=vacancy, full_name=f'Applicant {i}', email=f'applicant{i}@example.com',
+                phone='9800000000', cv=SimpleUploadedFile(f'cv{i}.pdf', b'%PDF-1.4'),
+            )
+            PaymentLog.objects.create(
+                application=application, transaction_id=f'TX{i}', amount=100, status='completed',
+            )
+            Question.objects.create(name=f'Asker {i}', email=f'asker{i}@example.com', question='Question?')
+
+    def count_queries(self, url):
+        self.client.get(url)  # warm the per-user caches the admin header reads
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+    def assert_constant_queries(self, url_name):
+        url = reverse(url_name)
+        self.add_rows(2)
+        few = self.count_queries(url)
+        self.add_rows(20)
+        many = self.count_queries(url)
+        self.assertEqual(few, many, f'{url} runs queries per row')
+        self.assertLessEqual(many, self.MAX_QUERIES)
+
+    def test_vacancy_changelist(self):
+        self.assert_constant_queries('admin:pages_vacancy_changelist')
+
+    def test_application_changelist(self):
+        self.assert_constant_queries('admin:pages_vacancyapplication_changelist')
+
+    def test_payment_log_changelist(self):
+        self.assert_constant_queries('admin:pages_paymentlog_changelist')
+
+    def test_question_changelist(self):
+        self.assert_constant_queries('admin:pages_question_changelist')
+
+
+class PageCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            'sita', 'sita@example.com', 'password', first_name='Sita', last_name='Sharma',
+        )
+        today = timezone.now().date()
+        cls.vacancy = Vacancy.objects.create(
+            title='Science Teacher', salary=10000, start_date=today, deadline=today + timedelta(days=30),
+            description='Description', requirements='Requirements', responsibilities='Responsibilities',
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_shell_shared_between_visitors(self):
+        anonymous = self.client.get(reverse('vacancies'))
+        self.assertEqual(anonymous['X-Page-Cache'], 'MISS')
+        self.assertContains(anonymous, 'Science Teacher')
+        self.assertNotContains(anonymous, 'Sita Sharma')
+        self.assertIn('Last-Modified', anonymous)
+
+        self.client.force_login(self.user)
+        # The same shell, with the account menu filled in for this user: only the
+        # session, the user and their enrollment summary are queried
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('vacancies'))
+        self.assertEqual(response['X-Page-Cache'], 'HIT')
+        self.assertContains(response, 'Sita Sharma')
+        self.assertNotIn('Last-Modified', response)
+        self.assertNotEqual(response['ETag'], anonymous['ETag'])
+
+    def test_conditional_get(self):
+        etag = self.client.get(reverse('vacancies'))['ETag']
+        response = self.client.get(reverse('vacancies'), headers={'If-None-Match': etag})
+        self.assertEqual((response.status_code, response.content), (304, b''))
+
+    def test_content_change_renders_a_new_shell(self):
+        self.client.get(reverse('vacancies'))
+        self.vacancy.title = 'Maths Teacher'
+        self.vacancy.save()
+        response = self.client.get(reverse('vacancies'))
+        self.assertEqual(response['X-Page-Cache'], 'MISS')
+        self.assertContains(response, 'Maths Teacher')
+
+
+class MetricsTests(TestCase):
+    def sample(self, name, **labels):
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    def setUp(self):
+        cache.clear()
+
+    def test_request_metrics(self):
+        responses = self.sample('django_view_responses_total', view='vacancies', method='GET', status='200')
+        queries = self.sample('django_view_db_queries_sum', view='vacancies')
+        renders = self.sample('django_view_template_seconds_count', view='vacancies')
+
+        with CaptureQueriesContext(connection) as captured:
+            self.client.get(reverse('vacancies'))
+        self.assertEqual(
+            self.sample('django_view_responses_total', view='vacancies', method='GET', status='200'), responses + 1,
+        )
+        self.assertEqual(self.sample('django_view_db_queries_sum', view='vacancies'), queries + len(captured))
+        # One observation per request, however many templates it renders
+        self.assertEqual(self.sample('django_view_template_seconds_count', view='vacancies'), renders + 1)
+
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'django_view_responses_total{method="GET",status="200",view="vacancies"}')
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_token(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        response = self.client.get(reverse('metrics'), headers={'Authorization': 'Bearer secret'})
+        self.assertEqual(response.status_code, 200)
+
+
+@override_settings(MEDIA_ROOT='/tmp/test_media')
+class URLQueryBudgetTests(URLQueryBudgetMixin, TestCase):
+    """Every URL in pages/urls.py has a query budget, and no URL runs a query per row"""
+    urlpatterns = urlpatterns
+    BUDGETS = {
+        'home': 8,
+        'submit_question': 2,
+        'admin': 3,
+        'request_profiles': 2,
+        'request_profile_download': 2,
+        'base': 3,
+        'mock_test': 3,
+        'profile': 4,
+        'my_courses': 4,
+        'vacancies': 5,
+        'vacancies_description': 5,
+        'vacancy_apply': 4,
+        'khalti_payment': 2,
+        'confirm_payment': 0,
+        'application_success': 3,
+        'my_applications': 3,
+    }
+    STATUS = {
+        'submit_question': 405,  # POST only
+        'request_profiles': 302,  # staff only: to the login page
+        'request_profile_download': 302,
+        'confirm_payment': 405,  # POST only
+    }
+    KNOWN_BROKEN = {
+        'vacancy_apply': 'vacancies_apply.html reverses confirm_enrollment_payment without an enrollment',
+        'khalti_payment': 'vacancies/simple_payment.html is missing',
+        'application_success': 'vacancies/application_success.html is missing',
+        'my_applications': 'vacancies/my_applications.html is missing',
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('student', 'student@example.com', 'password')
+        UserProfile.objects.create(user=cls.user, mobile_number='9800000000')
+        today = timezone.now().date()
+        for i in range(5):
+            course = Course.objects.create(
+                title=f'Course {i}', description='Description', price=1000,
+                image=SimpleUploadedFile('course.gif', GIF, content_type='image/gif'),
+            )
+            CourseEnrollment.objects.create(
+                user=cls.user, course=course, amount_paid=900, payment_status='completed',
+                access_expiry=timezone.now() + timedelta(days=30),
+            )
+            vacancy = Vacancy.objects.create(
+                title=f'Vacancy {i}', salary=10000, start_date=today, deadline=today + timedelta(days=30),
+                description='Description', requirements='Requirements', responsibilities='Responsibilities',
+            )
+            application = VacancyApplication.objects.create(
+                vacancy=vacancy, full_name=f'Applicant {i}', email='student@example.com',
+                phone='9800000000', cv=SimpleUploadedFile(f'cv{i}.pdf', b'%PDF-1.4'),
+            )
+            Question.objects.create(
+                name=f'Asker {i}', email=f'asker{i}@example.com', question='Question?', answered=True, answer='Answer',
+            )
+        cls.url_kwargs = {
+            'pk': vacancy.id, 'vacancy_id': vacancy.id, 'application_id': application.id,
+            'filename': 'missing.folded',
+        }
+        cls.query_params = {'email': 'student@example.com'}
+
+
+@override_settings(MEDIA_ROOT='/tmp/test_media')
+class ApplicantNotificationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin_user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        today = timezone.now().date()
+        cls.vacancies = [
+            Vacancy.objects.create(
+                title=f'Physics Teacher {i}', salary=10000, start_date=today, deadline=today + timedelta(days=30),
+                description='Description', requirements='Requirements', responsibilities='Responsibilities',
+            )
+            for i in range(2)
+        ]
+        for i in range(6):
+            VacancyApplication.objects.create(
+                vacancy=cls.vacancies[i % 2], full_name=f'Applicant {i}', email=f'applicant{i}@example.com',
+                phone='9800000000', cv=SimpleUploadedFile(f'cv{i}.pdf', b'%PDF-1.4'),
+            )
+
+    def setUp(self):
+        self.client.force_login(self.admin_user)
+
+    def run_action(self, action, applications):
+        return self.client.post(reverse('admin:pages_vacancyapplication_changelist'), {
+            'action': action, '_selected_action': [application.pk for application in applications],
+        })
+
+    def run_jobs(self):
+        while jobs := claim_jobs('test', 10):
+            for job in jobs:
+                self.assertEqual(run_job(job), 'done')
+
+    def test_status_change_notifies_each_applicant_once(self):
+        applications = list(VacancyApplication.objects.order_by('id'))
+        with patch('pages.tasks.CHUNK_SIZE', 4), patch('pages.tasks.personalizer', wraps=personalizer) as render:
+            self.run_action('mark_shortlisted', applications)
+            self.run_jobs()
+        # Once per vacancy, not per applicant
+        self.assertEqual(render.call_count, 2)
+
+        notification = ApplicantNotification.objects.get()
+        self.assertEqual((notification.state, notification.total, notification.queued), ('done', 6, 6))
+        emails = OutboxEmail.objects.filter(batch=notification.batch).order_by('id')
+        self.assertEqual(len(emails), 6)
+        for email in emails:
+            application = VacancyApplication.objects.get(email=email.to[0])
+            self.assertEqual(application.status, 'shortlisted')
+            self.assertIn(f'Dear {application.full_name},', email.body)
+            self.assertIn(f'shortlisted for "{application.vacancy.title}"', email.body)
+
+        # A retried job queues nothing twice
+        ApplicantNotification.objects.filter(pk=notification.pk).update(state='queued')
+        notify_applicants.enqueue(notification.pk)
+        self.run_jobs()
+        self.assertEqual(OutboxEmail.objects.count(), 6)
+
+        # Put back and shortlisted again: a real status change, told again
+        VacancyApplication.objects.filter(pk=applications[0].pk).update(status='pending')
+        self.run_action('mark_shortlisted', applications)
+        self.run_jobs()
+        latest = ApplicantNotification.objects.first()
+        self.assertEqual((ApplicantNotification.objects.count(), latest.total), (2, 1))
+        self.assertEqual(OutboxEmail.objects.filter(batch=latest.batch).get().to, [applications[0].email])
+
+        response = self.client.get(reverse('admin:pages_applicantnotification_change', args=[latest.pk]))
+        self.assertContains(response, '1 pending')
+
+    def test_nothing_changed_nothing_sent(self):
+        VacancyApplication.objects.update(status='rejected')
+        self.run_action('mark_rejected', VacancyApplication.objects.all())
+        self.assertFalse(ApplicantNotification.objects.exists())
+        self.assertFalse(Job.objects.exists())
+
+
+@override_settings(MEDIA_ROOT='/tmp/test_media', CV_MAX_UPLOAD_SIZE=200 * 1024)
+class VacancyApplicationUploadTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        today = timezone.now().date()
+        cls.vacancy = Vacancy.objects.create(
+            title='Physics Teacher', salary=10000, start_date=today, deadline=today + timedelta(days=30),
+            description='Description', requirements='Requirements', responsibilities='Responsibilities',
+        )
+        cls.url = reverse('vacancy_apply', args=[cls.vacancy.id])
+
+    def apply(self, cv, email='sita@example.com', client=None, **fields):
+        # Fields in the form's order: the CSRF token and the email before the CV
+        return (client or self.client).post(self.url, {
+            **fields, 'full_name': 'Sita Sharma', 'email': email, 'phone': '9800000000',
+            'cv': SimpleUploadedFile('cv.pdf', cv, content_type='application/pdf'),
+        })
+
+    def assertRefused(self, response, message):
+        self.assertRedirects(
+            response, reverse('vacancies_description', args=[self.vacancy.id]), fetch_redirect_response=False,
+        )
+        self.assertEqual([str(m) for m in get_messages(response.wsgi_request)][-1], message)
+
+    def test_cv_is_streamed_and_hashed(self):
+        cv = b'%PDF-1.4\n' + b'x' * (150 * 1024)
+        response = self.apply(cv)
+        application = VacancyApplication.objects.get()
+        self.assertRedirects(
+            response, reverse('khalti_payment', args=[application.id]), fetch_redirect_response=False,
+        )
+        self.assertEqual(application.cv_sha256, hashlib.sha256(cv).hexdigest())
+        with application.cv.open('rb') as stored:
+            self.assertEqual(stored.read(), cv)
+
+    def test_too_large_and_not_pdf_are_refused(self):
+        too_large = 'CV file size must not exceed 200.0\xa0KB.'
+        # Found out while streaming, and from Content-Length alone
+        self.assertRefused(self.apply(b'%PDF-1.4\n' + b'x' * (210 * 1024)), too_large)
+        self.assertRefused(self.apply(b'%PDF-1.4\n' + b'x' * (300 * 1024)), too_large)
+        self.assertRefused(self.apply(b'PK\x03\x04 a zip'), 'Only PDF files are allowed.')
+        self.assertRefused(self.apply(b'%PD'), 'Only PDF files are allowed.')
+        self.assertFalse(VacancyApplication.objects.exists())
+
+    def test_duplicate_refused_before_the_cv_is_read(self):
+        self.apply(b'%PDF-1.4', email='Sita@Example.com')
+        with patch.object(CVUploadHandler, 'receive_data_chunk') as receive:
+            self.assertRefused(self.apply(b'%PDF-1.4'), 'You have already applied for this position.')
+        receive.assert_not_called()
+        self.assertEqual(VacancyApplication.objects.count(), 1)
+
+    def test_csrf_is_checked_before_the_cv(self):
+        self.apply(b'%PDF-1.4')
+        client = Client(enforce_csrf_checks=True)
+        # Not even told it's a duplicate
+        with patch.object(CVUploadHandler, 'receive_data_chunk') as receive:
+            self.assertEqual(self.apply(b'%PDF-1.4', client=client).status_code, 403)
+        receive.assert_not_called()
+
+        secret = 'a' * 32
+        client.cookies[settings.CSRF_COOKIE_NAME] = secret
+        response = self.apply(b'%PDF-1.4', email='ram@example.com', client=client, csrfmiddlewaretoken=secret)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(VacancyApplication.objects.count(), 2)
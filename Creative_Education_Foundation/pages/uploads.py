@@ -0,0 +1,143 @@
+"""
+Streaming CV uploads for vacancy applications.
+
+Left to itself Django reads a whole upload (up to FILE_UPLOAD_MAX_MEMORY_SIZE
+of it into memory) before the view can look at it; so does CsrfViewMiddleware,
+looking for the CSRF token. VacancyApplicationView parses the form with
+parse_application() instead, and CVUploadHandler:
+
+- checks the CSRF token when the CV starts, before anything else: the form
+  sends the token and the other fields ahead of the CV, and the parser hands
+  the fields read so far to the handler (CVFormParser);
+- refuses an application from an email that already applied to the vacancy,
+  and a CV that Content-Length already says is too big, before its bytes are
+  read;
+- writes the CV to a temporary file in 64 KB chunks, so an upload costs the
+  same memory whatever its size;
+- stops reading as soon as the file passes CV_MAX_UPLOAD_SIZE or doesn't
+  start like a PDF;
+- hashes the CV while it streams (cv.sha256).
+
+A rejected upload leaves the rest of the request body unread and sets
+handler.error for the view to show (or, for a bad CSRF token, nothing: the
+view's csrf_protect rejects the request again from the fields read).
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, StopUpload
+from django.http import QueryDict
+from django.http.multipartparser import MultiPartParser
+from django.middleware.csrf import CsrfViewMiddleware
+from django.template.defaultfilters import filesizeformat
+
+from .models import VacancyApplication
+
+
+PDF_MAGIC = b'%PDF-'
+
+# Room in Content-Length for the other fields and the multipart framing
+FORM_OVERHEAD = 64 * 1024
+
+
+class CVUploadHandler(FileUploadHandler):
+    """Streams the `cv` file of an application to disk; see the module docstring"""
+    field_name = 'cv'
+
+    def __init__(self, request, vacancy, max_size=None):
+        super().__init__(request)
+        self.vacancy = vacancy
+        self.max_size = max_size or settings.CV_MAX_UPLOAD_SIZE
+        # The form fields parsed so far, set by CVFormParser
+        self.fields = QueryDict()
+        self.error = None
+        self.skipping = False
+        self.body_length = 0
+
+    def reject(self, error):
+        self.error = error
+        # Don't read the rest of the body just to throw it away
+        raise StopUpload(connection_reset=True)
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        self.body_length = content_length
+
+    def new_file(self, field_name, file_name, content_type, content_length, charset=None, content_type_extra=None):
+        # First of all, with the token sent ahead of the files; passing sets csrf_processing_done
+        if not getattr(self.request, 'csrf_processing_done', False) and csrf_rejected(self.request, self.fields):
+            raise StopUpload(connection_reset=True)
+        # Other files are dropped unread (SkipFile would close the CV too)
+        self.skipping = field_name != self.field_name
+        if self.skipping:
+            return
+        super().new_file(field_name, file_name, content_type, content_length, charset, content_type_extra)
+        email = self.fields.get('email', '').strip()
+        if email and VacancyApplication.objects.filter(vacancy=self.vacancy, email__iexact=email).exists():
+            self.reject('You have already applied for this position.')
+        if self.body_length > self.max_size + FORM_OVERHEAD or (content_length or 0) > self.max_size:
+            self.reject(self.too_large_error())
+        self.file = TemporaryUploadedFile(file_name, content_type, 0, charset, content_type_extra)
+        self.sha256 = hashlib.sha256()
+        self.head = b''
+
+    def receive_data_chunk(self, raw_data, start):
+        if self.skipping:
+            return None
+        if start + len(raw_data) > self.max_size:
+            self.reject(self.too_large_error())
+        if len(self.head) < len(PDF_MAGIC):
+            self.head += raw_data[:len(PDF_MAGIC) - len(self.head)]
+            if not PDF_MAGIC.startswith(self.head):
+                self.reject('Only PDF files are allowed.')
+        self.sha256.update(raw_data)
+        self.file.write(raw_data)
+
+    def file_complete(self, file_size):
+        if self.skipping:
+            return None
+        if len(self.head) < len(PDF_MAGIC):
+            # Shorter than the magic itself, empty included
+            self.file.close()
+            self.error = 'Only PDF files are allowed.'
+            return None
+        self.file.seek(0)
+        self.file.size = file_size
+        self.file.sha256 = self.sha256.hexdigest()
+        return self.file
+
+    def upload_interrupted(self):
+        if hasattr(self, 'file'):
+            self.file.close()
+
+    def too_large_error(self):
+        return f'CV file size must not exceed {filesizeformat(self.max_size)}.'
+
+
+def csrf_rejected(request, fields):
+    """Whether CsrfViewMiddleware rejects `request`, its token read from the form `fields` parsed so far"""
+    # Where the middleware looks for the token, without parsing the body itself
+    request._post = fields
+    try:
+        return CsrfViewMiddleware(lambda request: None).process_view(request, None, (), {}) is not None
+    finally:
+        del request._post
+
+
+class CVFormParser(MultiPartParser):
+    def sanitize_file_name(self, file_name):
+        # Called for each file just before the handlers' new_file(): hand
+        # them the fields that came before it
+        for handler in self._upload_handlers:
+            handler.fields = self._post
+        return super().sanitize_file_name(file_name)
+
+
+def parse_application(request, handler):
+    """Parse the application form of `request` through `handler` (its POST and FILES)"""
+    if request.content_type != 'multipart/form-data':
+        # Not an upload: nothing to stream
+        return
+    parser = CVFormParser(request.META, request, [handler], request.encoding)
+    # What request.POST does on first access, with our parser and handler
+    request._post, request._files = parser.parse()
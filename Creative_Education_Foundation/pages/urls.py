@@ -1,6 +1,6 @@
 from django.urls import path
 from .views import (
-    AdminView, BaseView, HomeView, MockTestView,ProfileView,
+    AdminView, RequestProfilesView, download_request_profile, BaseView, HomeView, MockTestView,ProfileView,
     VacancyListView, VacancyDetailView, VacancyApplicationView,
     SimplePaymentView, ConfirmPaymentView, ApplicationSuccessView, MyApplicationsView, MyCourses, submit_question
 )
@@ -10,6 +10,8 @@ urlpatterns = [
     path('', HomeView.as_view(), name='home'),
     path('submit_question/', submit_question, name='submit_question'),
     path('admin1/', AdminView.as_view(), name='admin'),
+    path('admin1/profiles/', RequestProfilesView.as_view(), name='request_profiles'),
+    path('admin1/profiles/<str:filename>', download_request_profile, name='request_profile_download'),
     path('base/', BaseView.as_view(), name='base'),
 
     path('mock-test/', MockTestView.as_view(), name='mock_test'),
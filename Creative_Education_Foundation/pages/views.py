@@ -9,42 +9,67 @@ from django.shortcuts import render
 from django.views import View
 from django.utils.decorators import method_decorator
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import FileResponse, Http404
 from accounts.models import UserProfile  # Adjust import if needed
 from courses.models import CourseEnrollment  # Adjust import if needed
 
 from .models import Vacancy, VacancyApplication, PaymentLog
 from .forms import VacancyApplicationForm
+from .uploads import CVUploadHandler, parse_application
 
 from courses.views import online_classes_view
+from outbox.queue import queue_template_email
 from courses.models import Course
+from courses.catalog import catalog_entries
+from courses.pagination import KeysetPaginator
+from .page_cache import page_cache
+from my_project import metrics, profiling
 
 from django.contrib import messages
 from .models import Question
 from django.views.decorators.http import require_http_methods
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
 
 
 
 # ============= BASIC VIEWS =============
 class AdminView(TemplateView):
     template_name = 'admin.html'
-    
+
+
+@method_decorator(staff_member_required, name='dispatch')
+class RequestProfilesView(TemplateView):
+    """Request profiles recorded by this pod (my_project.profiling)"""
+    template_name = 'admin_profiles.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['profiles'] = profiling.list_profiles()
+        context['sample_rate'] = settings.PROFILING_SAMPLE_RATE * 100
+        return context
+
+
+@staff_member_required
+def download_request_profile(request, filename):
+    path = profiling.profile_path(filename)
+    if path is None:
+        raise Http404('No such profile')
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename=filename)
+
 class BaseView(TemplateView):
     template_name = 'base.html'
     
 from django.db.models import Avg   # put at top with other imports
 
+@method_decorator(page_cache('courses', 'questions', 'timetable'), name='dispatch')
 class HomeView(TemplateView):
     template_name = 'home.html'
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # live courses + real average rating
-        context['featured_courses'] = (
-            Course.objects
-            .filter(is_active=True, course_type='live')
-            .annotate(avg_rating=Avg('reviews__rating'))
-            .order_by('-created_at')[:4]
-        )
+        context['featured_courses'] = catalog_entries().filter(course_type='live')[:4]
         context['faqs'] = Question.objects.filter(answered=True).order_by('-created_at')[:10]
         return context
 
@@ -111,6 +136,7 @@ def submit_question(request):
 
 
 # ============= VACANCY VIEWS =============
+@method_decorator(page_cache('vacancies'), name='dispatch')
 class VacancyListView(ListView):
     """List all active vacancies"""
     model = Vacancy
@@ -120,8 +146,14 @@ class VacancyListView(ListView):
     
     def get_queryset(self):
         return Vacancy.objects.filter(is_active=True).order_by('-created_at')
+    
+    def paginate_queryset(self, queryset, page_size):
+        """Keyset pages over (created_at, id) instead of OFFSET pages"""
+        page = KeysetPaginator(queryset, 'created_at', page_size).page(self.request.GET.get('cursor'))
+        return None, page, page.object_list, page.has_other_pages()
 
 
+@method_decorator(page_cache('vacancies', 'date'), name='dispatch')
 class VacancyDetailView(DetailView):
     """Display single vacancy details"""
     model = Vacancy
@@ -134,6 +166,11 @@ class VacancyDetailView(DetailView):
         return context
 
 
+# The CV is parsed by the view (pages.uploads), so the CSRF check can't run
+# in the middleware, which would read the whole body first: the parser runs it
+# as soon as it has read the token, before the CV, and csrf_protect on
+# apply() runs it for a form without a file
+@method_decorator(csrf_exempt, name='dispatch')
 class VacancyApplicationView(View):
     """Handle vacancy application form"""
     template_name = 'vacancies/vacancies_apply.html'
@@ -156,23 +193,43 @@ class VacancyApplicationView(View):
     
     def post(self, request, vacancy_id):
         vacancy = get_object_or_404(Vacancy, id=vacancy_id, is_active=True)
-        
+        # Streams the CV to disk, refusing it early when too big, not a PDF
+        # or from an email that already applied
+        upload = CVUploadHandler(request, vacancy)
+        parse_application(request, upload)
+        return self.apply(request, vacancy, upload)
+    
+    @method_decorator(csrf_protect)
+    def apply(self, request, vacancy, upload):
         if vacancy.is_deadline_passed():
             messages.error(request, 'The application deadline has passed.')
-            return redirect('vacancies_description', pk=vacancy_id)
+            return redirect('vacancies_description', pk=vacancy.id)
+        
+        if upload.error:
+            messages.error(request, upload.error)
+            return redirect('vacancies_description', pk=vacancy.id)
         
         form = VacancyApplicationForm(request.POST, request.FILES)
         
         if form.is_valid():
             email = form.cleaned_data['email']
-            if VacancyApplication.objects.filter(vacancy=vacancy, email=email).exists():
+            # The upload handler checked already, unless the email came after the CV
+            if VacancyApplication.objects.filter(vacancy=vacancy, email__iexact=email).exists():
                 messages.error(request, 'You have already applied for this position.')
-                return redirect('vacancies_description', pk=vacancy_id)
+                return redirect('vacancies_description', pk=vacancy.id)
             
             application = form.save(commit=False)
             application.vacancy = vacancy
             application.payment_status = 'pending'
-            application.save()
+            application.cv_sha256 = form.cleaned_data['cv'].sha256
+            with transaction.atomic():
+                application.save()
+                queue_template_email(
+                    application.email, f'Application received: {vacancy.title}', 'application_received',
+                    {'application': application, 'vacancy': vacancy},
+                    dedup_key=f'application-received:{application.id}',
+                )
+            metrics.VACANCY_APPLICATIONS.inc()
             
             messages.success(request, 'Application saved. Please complete the payment.')
             return redirect('khalti_payment', application_id=application.id)